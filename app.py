@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit_authenticator as stauth
 from db import init_db
+from utils.jobs import ensure_workers
 
 # -------------------------------------------------
 # 1. PAGE CONFIG — HARUS JADI STREAMLIT COMMAND PERTAMA
@@ -12,9 +13,10 @@ st.set_page_config(
 )
 
 # -------------------------------------------------
-# 2. INIT DB
+# 2. INIT DB + WORKER BACKGROUND (OCR/AI, lanjut job yang tertunda saat restart)
 # -------------------------------------------------
 init_db()
+ensure_workers()
 
 # -------------------------------------------------
 # 3. AMBIL KONFIGURASI AUTH DARI SECRETS
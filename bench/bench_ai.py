@@ -0,0 +1,174 @@
+"""
+Benchmark analisa AI terhadap Groq tiruan lokal (bench/stub_servers.py):
+
+- sequential : analyse_text_with_groq satu per satu (seperti halaman upload lama)
+- concurrent : analyse_many (AsyncGroq, N request in-flight)
+- cached     : analyse_many ulang atas teks yang sama (LRU / tabel llm_cache)
+
+    python bench/bench_ai.py --texts 30 --latency 0.3 --concurrency 8
+
+--check menjalankan uji lulus/gagal cache respons, client factory, dan rate
+limit GROQ_RPM (keluar dengan kode 1 kalau ada yang gagal):
+
+    python bench/bench_ai.py --check
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from groq import AsyncGroq, Groq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import start_groq_stub  # noqa: E402
+
+import db  # noqa: E402
+from utils import ai  # noqa: E402
+
+
+# -------------------------------------------------
+# Uji perilaku (--check)
+# -------------------------------------------------
+def _letter(i: int) -> str:
+    return f"Nomor: {i}/UND/2025 Hal: Undangan rapat ke-{i} ... " * 20
+
+
+def check_cache(server):
+    """Panggilan kedua dengan teks sama dilayani cache (LRU lalu llm_cache), tidak sampai ke endpoint."""
+    teks = _letter(1001)
+    first = ai.analyse_text_with_groq(teks)
+    sent = server.stub_stats["requests"]
+    assert ai.analyse_text_with_groq(teks) == first, "hasil dari cache berbeda"
+    ai._lru.clear()
+    assert ai.analyse_text_with_groq(teks) == first, "hasil dari llm_cache berbeda"
+    assert ai.analyse_many([teks])[0] == first, "hasil async dari cache berbeda"
+    extra = server.stub_stats["requests"] - sent
+    assert extra == 0, f"{extra} request ke endpoint untuk teks yang sudah di-cache"
+
+
+def check_client_factory(server):
+    """Client dari set_client_factory benar-benar dipakai (sinkron & async)."""
+    other, other_url = start_groq_stub(latency=0.0)
+    made = []
+
+    def factory():
+        made.append("sync")
+        return Groq(api_key="lain", base_url=other_url)
+
+    def async_factory():
+        made.append("async")
+        return AsyncGroq(api_key="lain", base_url=other_url)
+
+    sent = server.stub_stats["requests"]
+    ai.set_client_factory(factory, async_factory)
+    try:
+        ai.analyse_text_with_groq(_letter(2001), use_cache=False)
+        ai.analyse_text_with_groq(_letter(2002), use_cache=False)
+        results = ai.analyse_many([_letter(2003)], use_cache=False)
+        assert not isinstance(results[0], Exception), f"async gagal: {results[0]!r}"
+    finally:
+        ai.set_client_factory()
+        other.shutdown()
+    assert made == ["sync", "async"], f"factory dipanggil: {made} (client sinkron harus dipakai ulang)"
+    assert other.stub_stats["requests"] == 3, f"{other.stub_stats['requests']} request ke client injeksi, harusnya 3"
+    assert server.stub_stats["requests"] == sent, "request bocor ke client default"
+
+
+def check_rate_limit(server, rpm=60, calls=13):
+    """GROQ_RPM=60 → burst 10, lalu 1 request/detik: 13 request butuh ±3 detik."""
+    os.environ["GROQ_RPM"] = str(rpm)
+    ai._limits = None
+    try:
+        burst = ai._rate_limits()["requests"].capacity
+        t0 = time.perf_counter()
+        results = ai.analyse_many([_letter(3000 + i) for i in range(calls)], concurrency=8, use_cache=False)
+        elapsed = time.perf_counter() - t0
+    finally:
+        os.environ["GROQ_RPM"] = "100000"
+        ai._limits = None
+    assert not any(isinstance(r, Exception) for r in results), "ada request gagal"
+    expected = (calls - burst) * 60.0 / rpm
+    assert elapsed >= expected * 0.9, f"{calls} request selesai {elapsed:.2f} dtk, harusnya ≥ {expected:.1f} dtk"
+    assert elapsed <= expected + 1.5, f"{calls} request butuh {elapsed:.2f} dtk, terlalu lambat (±{expected:.1f} dtk)"
+
+
+CHECKS = {
+    "panggilan kedua dari cache, tanpa request": check_cache,
+    "client injeksi dari set_client_factory dipakai": check_client_factory,
+    "token bucket membatasi ke GROQ_RPM": check_rate_limit,
+}
+
+
+def run_checks(server) -> bool:
+    ok = True
+    for name, fn in CHECKS.items():
+        try:
+            fn(server)
+            print(f"  OK    {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"  GAGAL {name}: {e}")
+        except Exception as e:
+            ok = False
+            print(f"  GAGAL {name}: {type(e).__name__}: {e}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--texts", type=int, default=30)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--check", action="store_true", help="uji cache/client factory/rate limit, bukan benchmark")
+    args = ap.parse_args()
+
+    server, base_url = start_groq_stub(latency=0.0 if args.check else args.latency)
+    os.environ.update(GROQ_API_KEY="stub", GROQ_BASE_URL=base_url,
+                      GROQ_RPM="100000", GROQ_TPM="100000000", AI_LOCAL_CLASSIFIER="0")
+
+    texts = [_letter(i) for i in range(args.texts)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        if args.check:
+            ok = run_checks(server)
+            db.get_pool().close_all()
+            server.shutdown()
+            sys.exit(0 if ok else 1)
+
+        t0 = time.perf_counter()
+        for t in texts:
+            ai.analyse_text_with_groq(t, use_cache=False)
+        seq = time.perf_counter() - t0
+
+        ai._lru.clear()
+        with db.get_conn() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+        t0 = time.perf_counter()
+        results = ai.analyse_many(texts, concurrency=args.concurrency)
+        conc = time.perf_counter() - t0
+        errors = sum(isinstance(r, Exception) for r in results)
+
+        t0 = time.perf_counter()
+        ai.analyse_many(texts, concurrency=args.concurrency)
+        cached = time.perf_counter() - t0
+
+        db.get_pool().close_all()
+
+    n = len(texts)
+    print(f"sequential: {seq:6.2f} dtk ({n / seq:6.1f} teks/dtk)")
+    print(f"concurrent: {conc:6.2f} dtk ({n / conc:6.1f} teks/dtk), {errors} error")
+    print(f"    cached: {cached:6.3f} dtk ({n / cached:6.1f} teks/dtk)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
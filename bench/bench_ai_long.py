@@ -0,0 +1,80 @@
+"""
+Benchmark analisa surat panjang: sekali kirim vs map-reduce per chunk
+(utils/ai.analyse_long_text) terhadap Groq tiruan lokal. Latency stub dibuat
+sebanding panjang prompt (--sec-per-1k), jadi chunk paralel terlihat efeknya.
+
+Dilaporkan per panjang surat: waktu, request, token prompt/balasan, dan
+apakah nomor surat akhir benar-benar ada di teks (stub sengaja selalu
+menjawab nomor yang sama → harus dikoreksi kandidat regex).
+
+    python bench/bench_ai_long.py --tokens 1000 5000 20000 60000 --latency 0.3 --sec-per-1k 0.4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import KOSAKATA, synthetic_letter  # noqa: E402
+from stub_servers import start_groq_stub  # noqa: E402
+
+import db  # noqa: E402
+from utils import ai  # noqa: E402
+
+
+def long_letter(rng: random.Random, tokens: int) -> tuple:
+    """Surat sintetis + lampiran acak sampai ±tokens token. Kembalikan (teks, nomor asli)."""
+    letter = synthetic_letter(rng, rng.randint(0, 10_000))
+    parts = [letter["ocr_text"]]
+    while ai.count_tokens("\n".join(parts)) < tokens:
+        parts.append(" ".join(rng.choice(KOSAKATA) for _ in range(rng.randint(12, 25))).capitalize() + ".")
+    return "\n".join(parts), letter["ai_nomor_pengirim"]
+
+
+def run(teks: str, chunk_tokens: int) -> tuple:
+    os.environ["GROQ_CHUNK_TOKENS"] = str(chunk_tokens)
+    usage = ai.TokenUsage()
+    t0 = time.perf_counter()
+    result = ai.analyse_text_with_groq(teks, use_cache=False, usage=usage)
+    return time.perf_counter() - t0, result, usage.as_dict()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--tokens", type=int, nargs="*", default=[1000, 5000, 20000, 60000])
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--sec-per-1k", type=float, default=0.4, help="detik tambahan per 1000 token prompt")
+    args = ap.parse_args()
+
+    server, base_url = start_groq_stub(latency=args.latency, sec_per_1k_tokens=args.sec_per_1k)
+    os.environ.update(GROQ_API_KEY="stub", GROQ_BASE_URL=base_url,
+                      GROQ_RPM="100000", GROQ_TPM="100000000")
+    rng = random.Random(18)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        print(f"{'token':>7} {'mode':<11} {'dtk':>6} {'req':>4} {'chunk':>7} "
+              f"{'prompt':>8} {'balasan':>8} {'nomor ok':>9}")
+        for tokens in args.tokens:
+            teks, nomor = long_letter(rng, tokens)
+            for mode, budget in (("single", 10**9), ("map_reduce", ai.DEFAULT_CHUNK_TOKENS)):
+                seconds, result, usage = run(teks, budget)
+                chunks = f"{usage['chunks']}+{usage['skipped_chunks']}" if usage["skipped_chunks"] else usage["chunks"]
+                print(f"{ai.count_tokens(teks):>7} {mode:<11} {seconds:>6.2f} {usage['calls']:>4} {chunks:>7} "
+                      f"{usage['prompt_tokens']:>8} {usage['completion_tokens']:>8} "
+                      f"{str(result['nomor_surat_pengirim'] == nomor):>9}")
+
+        db.get_pool().close_all()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
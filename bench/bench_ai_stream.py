@@ -0,0 +1,102 @@
+"""
+Benchmark analisa AI streaming vs tunggu balasan penuh terhadap Groq tiruan lokal
+(stream=True → server-sent events, --sec-per-token per token balasan).
+
+Dilaporkan per mode: waktu sampai field pertama tampil, waktu sampai hasil
+lengkap, dan berapa request yang butuh repair. --trailing menambah teks
+penjelasan setelah JSON (seperti model yang "cerewet"): mode streaming berhenti
+di "}" penutup, mode biasa harus menunggu semuanya. --malformed-rate membuat
+sebagian balasan kehilangan koma → diuji satu kali repair otomatis.
+
+    python bench/bench_ai_stream.py --letters 20 --latency 0.3 --sec-per-token 0.02 --trailing 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import KOSAKATA, synthetic_letter  # noqa: E402
+from stub_servers import start_groq_stub  # noqa: E402
+
+import db  # noqa: E402
+from utils import ai  # noqa: E402
+
+
+def run(teks: str, stream: bool) -> dict:
+    usage = ai.TokenUsage()
+    first = []
+    t0 = time.perf_counter()
+
+    def on_field(key, value):
+        if not first:
+            first.append(time.perf_counter() - t0)
+
+    try:
+        ai.analyse_text_with_groq(teks, use_cache=False, usage=usage,
+                                  on_field=on_field if stream else None)
+        error = None
+    except Exception as e:
+        error = e
+    total = time.perf_counter() - t0
+    return {
+        "first": first[0] if first else total,
+        "total": total,
+        "calls": usage.calls,
+        "error": error,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--letters", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.3, help="latency stub sebelum token pertama (detik)")
+    ap.add_argument("--sec-per-token", type=float, default=0.02)
+    ap.add_argument("--trailing", type=int, default=0, help="jumlah karakter teks tambahan setelah JSON")
+    ap.add_argument("--malformed-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    rng = random.Random(20)
+    trailing = "\n\nPenjelasan: " + " ".join(rng.choice(KOSAKATA) for _ in range(args.trailing // 6))
+    server, base_url = start_groq_stub(
+        latency=args.latency,
+        sec_per_token=args.sec_per_token,
+        trailing=trailing[:args.trailing] if args.trailing else "",
+        malformed_rate=args.malformed_rate,
+    )
+    os.environ.update(GROQ_API_KEY="stub", GROQ_BASE_URL=base_url,
+                      GROQ_RPM="100000", GROQ_TPM="100000000", AI_LOCAL_CLASSIFIER="0")
+    texts = [synthetic_letter(rng, i)["ocr_text"] for i in range(args.letters)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        print(f"{len(texts)} surat, latency {args.latency}s + {args.sec_per_token * 1000:.0f} ms/token, "
+              f"trailing {args.trailing} karakter, malformed {args.malformed_rate:.0%}\n")
+        print(f"{'mode':<8} {'field pertama p50':>18} {'p95':>7} {'lengkap p50':>12} {'p95':>7} "
+              f"{'req':>5} {'gagal':>6}")
+        for mode, stream in (("penuh", False), ("stream", True)):
+            results = [run(t, stream) for t in texts]
+            ok = [r for r in results if r["error"] is None]
+            firsts = sorted(r["first"] for r in ok) or [0.0]
+            totals = sorted(r["total"] for r in ok) or [0.0]
+            p95 = max(0, round(0.95 * (len(firsts) - 1)))
+            print(f"{mode:<8} {statistics.median(firsts):>17.2f}s {firsts[p95]:>6.2f}s "
+                  f"{statistics.median(totals):>11.2f}s {totals[p95]:>6.2f}s "
+                  f"{sum(r['calls'] for r in results):>5} {len(results) - len(ok):>6}")
+
+        print(f"\nstream diputus lebih awal oleh client: {server.stub_stats.get('aborted_streams', 0)}")
+        db.get_pool().close_all()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
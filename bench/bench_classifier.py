@@ -0,0 +1,49 @@
+"""
+Evaluasi classifier divisi lokal (utils/classifier.py) pada arsip sintetis
+bench/corpus.py: akurasi, porsi surat yang dijawab lokal per ambang
+confidence, porsi panggilan LLM yang dilewati total, dan latency prediksi.
+
+Label sintetis ditentukan perihal surat, jadi terlalu mudah; --noise
+mengacak sebagian label (disposisi "tidak biasa") supaya ambang confidence
+ada artinya.
+
+    python bench/bench_classifier.py --letters 20000 --noise 0.1
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import DIVISI, letters  # noqa: E402
+from utils import classifier  # noqa: E402
+from utils.ai import local_fields  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--letters", type=int, default=20_000)
+    ap.add_argument("--noise", type=float, default=0.1, help="porsi label yang diacak")
+    ap.add_argument("--test-frac", type=float, default=0.2)
+    args = ap.parse_args()
+
+    rng = random.Random(19)
+    texts, labels = [], []
+    for row in letters(args.letters, seed=19):
+        texts.append(row["ocr_text"])
+        labels.append(rng.choice(DIVISI) if rng.random() < args.noise else row["_label"])
+
+    t0 = time.perf_counter()
+    report = classifier.evaluate(texts, labels, test_frac=args.test_frac,
+                                 local_complete=lambda t: local_fields(t) is not None)
+    print(f"{args.letters} surat sintetis, noise label {args.noise:.0%} "
+          f"(latih + evaluasi {time.perf_counter() - t0:.1f} dtk)\n")
+    classifier.print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark lapisan data: koneksi baru per query (cara lama) vs pool + WAL.
+
+Simulasi beberapa "staf" yang upload surat bersamaan dengan beberapa
+"viewer" yang me-refresh dashboard.
+
+    python bench/bench_db.py --writers 4 --readers 8 --seconds 5
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def legacy_conn():
+    """Meniru get_conn() lama: connect baru tiap query, tanpa WAL."""
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_insert(i):
+    conn = legacy_conn()
+    conn.execute(
+        "INSERT INTO letters (nomor_internal, uploader, status, timestamp, ocr_text) "
+        "VALUES (?, ?, ?, datetime('now'), ?)",
+        (f"BENCH/{i}", "bench", "Pending", "lorem ipsum " * 200),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_dashboard():
+    conn = legacy_conn()
+    conn.execute("SELECT * FROM letters").fetchall()
+    conn.execute("SELECT * FROM dispositions").fetchall()
+    conn.close()
+
+
+def pooled_insert(i):
+    db.insert_letter(
+        nomor_internal=f"BENCH/{i}",
+        uploader="bench",
+        status="Pending",
+        ocr_text="lorem ipsum " * 200,
+    )
+
+
+def pooled_dashboard():
+    with db.get_conn() as conn:
+        conn.execute("SELECT * FROM letters").fetchall()
+        conn.execute("SELECT * FROM dispositions").fetchall()
+
+
+def run(mode, writers, readers, seconds):
+    insert_fn, read_fn = {
+        "legacy": (legacy_insert, legacy_dashboard),
+        "pooled": (pooled_insert, pooled_dashboard),
+    }[mode]
+
+    counts = {"insert": 0, "read": 0, "locked": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def loop(kind, fn):
+        n = 0
+        while time.perf_counter() < stop:
+            try:
+                fn(n) if kind == "insert" else fn()
+                key = kind
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                key = "locked"
+            with lock:
+                counts[key] += 1
+            n += 1
+
+    threads = [threading.Thread(target=loop, args=("insert", insert_fn)) for _ in range(writers)]
+    threads += [threading.Thread(target=loop, args=("read", read_fn)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {k: v / seconds for k, v in counts.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    for mode in ("legacy", "pooled"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_DIR = tmp
+            db.DB_PATH = os.path.join(tmp, "bench.db")
+            db.init_db()
+            if mode == "legacy":
+                # DB lama masih journal_mode=DELETE
+                db.get_pool().close_all()
+                conn = sqlite3.connect(db.DB_PATH)
+                conn.execute("PRAGMA journal_mode = DELETE;")
+                conn.close()
+
+            res = run(mode, args.writers, args.readers, args.seconds)
+            db.get_pool().close_all()
+
+        print(
+            f"{mode:>7}: {res['insert']:8.1f} upload/s  "
+            f"{res['read']:8.1f} dashboard/s  "
+            f"{res['locked']:6.1f} 'database is locked'/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark klien OCR terhadap stub server lokal (bench/stub_servers.py):
+
+- legacy : requests.post baru per surat (tanpa session, tanpa retry)
+- pooled : OCRSpaceClient (keep-alive + retry/backoff + circuit breaker), N thread
+- async  : ocr_many_async (httpx.AsyncClient), N request in-flight
+
+    python bench/bench_ocr.py --files 60 --latency 0.2 --fail-rate 0.1 --concurrency 8
+
+--check menjalankan uji lulus/gagal perilaku retry, circuit breaker, dan pesan
+timeout (keluar dengan kode 1 kalau ada yang gagal):
+
+    python bench/bench_ocr.py --check
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import start_ocr_stub  # noqa: E402
+from utils.ocr import (  # noqa: E402
+    AsyncOCRSpaceClient,
+    CircuitBreaker,
+    CircuitOpenError,
+    OCRSpaceClient,
+    ocr_many_async,
+)
+
+
+def legacy_ocr(url, path):
+    with open(path, "rb") as f:
+        res = requests.post(url, files={"file": f}, headers={"apikey": "x"}, timeout=30)
+    data = res.json()
+    return "\n".join(r.get("ParsedText", "") for r in data.get("ParsedResults") or [])
+
+
+def run_threads(fn, paths, concurrency):
+    ok = 0
+    with ThreadPoolExecutor(concurrency) as ex:
+        for fut in [ex.submit(fn, p) for p in paths]:
+            try:
+                ok += bool(fut.result())
+            except Exception:
+                pass
+    return ok
+
+
+# -------------------------------------------------
+# Uji perilaku (--check)
+# -------------------------------------------------
+def _stub_client(timeout=2.0, max_retries=3, breaker=None, **stub):
+    server, url = start_ocr_stub(latency=0.0, **stub)
+    client = OCRSpaceClient("x", url=url, timeout=timeout, max_retries=max_retries,
+                            backoff_base=0.01, backoff_max=0.05,
+                            breaker=breaker or CircuitBreaker(failure_threshold=50))
+    return server, client
+
+
+def check_retry(kind, timeout=2.0):
+    """2 request pertama gagal (`kind`) → request ke-3 sukses, total 3 request."""
+    server, client = _stub_client(timeout=timeout, fail_first=2, fail_kind=kind, hang=timeout + 1)
+    try:
+        text = client.ocr_bytes(b"x", "a.jpg")
+        n = server.stub_stats["requests"]
+        assert text, "teks kosong"
+        assert n == 3, f"{n} request, harusnya 3"
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def check_breaker():
+    """N kegagalan beruntun → open (request berikutnya tidak dikirim) → half-open setelah cooldown."""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+    server, client = _stub_client(max_retries=0, breaker=breaker, fail_rate=1.0, fail_kind="503")
+    try:
+        for i in range(3):
+            assert breaker.state == "closed", f"sudah {breaker.state} setelah {i} kegagalan"
+            try:
+                client.ocr_bytes(b"x", "a.jpg")
+            except CircuitOpenError:
+                raise AssertionError(f"circuit open setelah {i} kegagalan, harusnya 3")
+            except RuntimeError:
+                pass
+        assert breaker.state == "open", f"state {breaker.state} setelah 3 kegagalan"
+        sent = server.stub_stats["requests"]
+        try:
+            client.ocr_bytes(b"x", "a.jpg")
+            raise AssertionError("request lolos saat circuit open")
+        except CircuitOpenError:
+            pass
+        assert server.stub_stats["requests"] == sent, "request terkirim saat circuit open"
+
+        time.sleep(0.6)
+        assert breaker.state == "half-open", f"state {breaker.state} setelah cooldown"
+        server.stub_cfg["fail_rate"] = 0.0
+        assert client.ocr_bytes(b"x", "a.jpg"), "request percobaan half-open gagal"
+        assert breaker.state == "closed", f"state {breaker.state} setelah percobaan sukses"
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def check_breaker_error_kinds():
+    """Halaman error HTML dihitung gagal oleh breaker; error OCR.Space sendiri tidak."""
+    for kind, expect_open in (("html", True), ("ocr_error", False)):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        server, client = _stub_client(max_retries=0, breaker=breaker, fail_rate=1.0, fail_kind=kind)
+        try:
+            for _ in range(2):
+                try:
+                    client.ocr_bytes(b"x", "a.jpg")
+                    raise AssertionError(f"{kind}: tidak error")
+                except CircuitOpenError:
+                    raise AssertionError(f"{kind}: circuit open terlalu cepat")
+                except RuntimeError:
+                    pass
+            state = breaker.state
+            assert (state == "open") == expect_open, f"{kind}: state {state} setelah 2 error"
+        finally:
+            client.close()
+            server.shutdown()
+
+
+def check_timeout_message():
+    """Timeout yang dikonfigurasi muncul di pesan error (klien sinkron & async)."""
+    expected = "OCR timeout (melewati 0.3 detik)."
+    server, client = _stub_client(timeout=0.3, max_retries=1, fail_rate=1.0, fail_kind="hang", hang=1.0)
+    try:
+        try:
+            client.ocr_bytes(b"x", "a.jpg")
+            raise AssertionError("tidak timeout")
+        except RuntimeError as e:
+            assert str(e) == expected, f"sinkron: {e!r}"
+
+        async def run_async():
+            async with AsyncOCRSpaceClient("x", url=client.url, timeout=0.3, max_retries=1,
+                                           backoff_base=0.01, breaker=CircuitBreaker(50)) as ac:
+                await ac.ocr_bytes(b"x", "a.jpg")
+
+        try:
+            asyncio.run(run_async())
+            raise AssertionError("async tidak timeout")
+        except RuntimeError as e:
+            assert str(e) == expected, f"async: {e!r}"
+    finally:
+        client.close()
+        server.shutdown()
+
+
+CHECKS = {
+    "retry setelah HTTP 503": lambda: check_retry("503"),
+    "retry setelah koneksi diputus": lambda: check_retry("reset"),
+    "retry setelah timeout": lambda: check_retry("hang", timeout=0.3),
+    "circuit breaker open → half-open → closed": check_breaker,
+    "breaker: HTML proxy = gagal, error OCR.Space = bukan": check_breaker_error_kinds,
+    "pesan timeout sesuai konfigurasi": check_timeout_message,
+}
+
+
+def run_checks() -> bool:
+    ok = True
+    for name, fn in CHECKS.items():
+        try:
+            fn()
+            print(f"  OK    {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"  GAGAL {name}: {e}")
+        except Exception as e:
+            ok = False
+            print(f"  GAGAL {name}: {type(e).__name__}: {e}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--files", type=int, default=60)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--fail-rate", type=float, default=0.1)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--check", action="store_true", help="uji retry/breaker/timeout, bukan benchmark")
+    args = ap.parse_args()
+
+    if args.check:
+        sys.exit(0 if run_checks() else 1)
+
+    server, url = start_ocr_stub(latency=args.latency, fail_rate=args.fail_rate)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            p = os.path.join(tmp, f"surat_{i}.jpg")
+            with open(p, "wb") as f:
+                f.write(os.urandom(200 * 1024))
+            paths.append(p)
+
+        retry_kwargs = dict(max_retries=4, backoff_base=0.05, backoff_max=0.5,
+                            breaker=CircuitBreaker(failure_threshold=50))
+        pooled = OCRSpaceClient("x", url=url, pool_size=args.concurrency, **retry_kwargs)
+
+        runs = {
+            "legacy": lambda: run_threads(lambda p: legacy_ocr(url, p), paths, args.concurrency),
+            "pooled": lambda: run_threads(pooled.ocr_file, paths, args.concurrency),
+            "async": lambda: sum(
+                isinstance(r, str) and bool(r)
+                for r in asyncio.run(ocr_many_async(
+                    paths, "x", concurrency=args.concurrency, url=url, **retry_kwargs
+                ))
+            ),
+        }
+
+        for name, fn in runs.items():
+            t0 = time.perf_counter()
+            ok = fn()
+            dt = time.perf_counter() - t0
+            print(f"{name:>7}: {ok}/{len(paths)} sukses, {dt:6.2f} dtk, {len(paths) / dt:6.1f} surat/dtk")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Bandingkan backend OCR (utils/ocr_backends.py) pada set sampel yang sama:
+latency per gambar (p50/p95), throughput dengan N thread, panjang teks, error.
+
+Sampel: scan sintetis (bench_preprocess.render_scan) yang sudah dipra-proses
+seperti di pipeline + data/letters/*.jpg. Backend yang diuji:
+  fake           : FakeBackend (tanpa I/O, batas bawah overhead)
+  ocrspace-stub  : OCRSpaceBackend ke stub lokal (latency --stub-latency)
+  ocrspace       : OCR.Space sungguhan, hanya kalau OCR_SPACE_API_KEY diset
+  tesseract      : hanya kalau binary tesseract ada di PATH
+  fallback       : rantai [backend yang selalu gagal, fake] → biaya fallback
+
+    python bench/bench_ocr_backends.py --samples 8 --concurrency 4
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_preprocess import render_scan  # noqa: E402
+from stub_servers import start_ocr_stub  # noqa: E402
+from utils import preprocess  # noqa: E402
+from utils.config import get_secret  # noqa: E402
+from utils.ocr import MAX_OCR_SIZE  # noqa: E402
+from utils.ocr_backends import (  # noqa: E402
+    FakeBackend,
+    FallbackBackend,
+    OCRSpaceBackend,
+    create_backend,
+)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, round(p / 100 * (len(values) - 1))))]
+
+
+def load_samples(n: int, dpi: int):
+    """[(nama, bytes)] — sudah dipra-proses (grayscale + deskew + <1MB) seperti pipeline."""
+    import io
+
+    from PIL import Image
+
+    options = {"grayscale": True, "deskew": True, "binarize": False}
+    rng = random.Random(17)
+    raw = [(f"scan_{i}.jpg", render_scan(rng, i, dpi)[0]) for i in range(n)]
+    for path in sorted(glob.glob("data/letters/*.jpg")):
+        with open(path, "rb") as f:
+            raw.append((os.path.basename(path), f.read()))
+
+    samples = []
+    for name, data in raw:
+        with Image.open(io.BytesIO(data)) as img:
+            out, _ = preprocess.preprocess_image(img, MAX_OCR_SIZE, options)
+        samples.append((name, out))
+    return samples
+
+
+def run_backend(backend, samples, concurrency: int) -> dict:
+    latencies, lengths, errors = [], [], 0
+
+    def one(sample):
+        name, data = sample
+        t0 = time.perf_counter()
+        try:
+            text = backend.ocr_bytes(data, name)
+        except Exception:
+            return time.perf_counter() - t0, None
+        return time.perf_counter() - t0, text
+
+    # latency: berurutan (tanpa antre)
+    for sample in samples:
+        seconds, text = one(sample)
+        latencies.append(seconds)
+        if text is None:
+            errors += 1
+        else:
+            lengths.append(len(text))
+
+    # throughput: concurrency thread sekaligus
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        list(ex.map(one, samples))
+    wall = time.perf_counter() - t0
+
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "per_s": len(samples) / wall,
+        "chars": statistics.median(lengths) if lengths else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--samples", type=int, default=8, help="jumlah scan sintetis")
+    ap.add_argument("--dpi", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--stub-latency", type=float, default=0.5)
+    args = ap.parse_args()
+
+    samples = load_samples(args.samples, args.dpi)
+    print(f"{len(samples)} sampel, median {statistics.median(len(d) for _, d in samples) / 1024:,.0f} KB")
+
+    server, url = start_ocr_stub(latency=args.stub_latency)
+    os.environ["OCR_SPACE_URL"] = url
+    backends = {
+        "fake": FakeBackend(),
+        "ocrspace-stub": OCRSpaceBackend("stub"),
+        "fallback": FallbackBackend([FakeBackend(fail=True), FakeBackend()]),
+    }
+    tesseract = create_backend("tesseract")
+    if tesseract.available():
+        backends["tesseract"] = tesseract
+    else:
+        print("tesseract dilewati: binary tidak ada di PATH")
+
+    print(f"\n{'backend':<15} {'p50':>9} {'p95':>9} {'gambar/dtk':>11} {'teks':>7} {'error':>6}")
+
+    def show(name, r):
+        print(f"{name:<15} {r['p50_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms {r['per_s']:>11.1f} "
+              f"{r['chars']:>7.0f} {r['errors']:>6}")
+
+    for name, backend in backends.items():
+        show(name, run_backend(backend, samples, args.concurrency))
+    server.shutdown()
+
+    api_key = get_secret("OCR_SPACE_API_KEY")
+    if api_key:
+        os.environ.pop("OCR_SPACE_URL")
+        show("ocrspace", run_backend(OCRSpaceBackend(api_key), samples, args.concurrency))
+    else:
+        print("ocrspace (sungguhan) dilewati: OCR_SPACE_API_KEY tidak diset")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark OCR PDF per halaman (utils/pdf.py) terhadap stub OCR.Space lokal:
+PDF sintetis campuran halaman ber-text-layer dan halaman scan (gambar saja),
+diproses dengan concurrency 1 (≈ berurutan) dan N. Dengan latency OCR tetap,
+waktu total paralel harus mendekati ceil(halaman_scan / N) × latency.
+
+Butuh pypdfium2.
+
+    python bench/bench_pdf.py --pages 20 --scan-ratio 0.6 --latency 1.0 --concurrency 8
+"""
+
+import argparse
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from corpus import synthetic_letter  # noqa: E402
+from stub_servers import start_ocr_stub  # noqa: E402
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages) -> bytes:
+    """
+    PDF minimal tanpa library. pages: list ("text", [baris]) atau ("image", bytes JPEG).
+    Ukuran halaman A4 (595 × 842 pt).
+    """
+    objects = []   # isi objek ke-(i+1)
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")            # diisi belakangan
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for kind, content in pages:
+        if kind == "text":
+            ops = ["BT /F1 10 Tf 14 TL 60 790 Td"]
+            ops += [f"({_pdf_escape(line)}) Tj T*" for line in content]
+            ops.append("ET")
+            stream = "\n".join(ops).encode("latin-1", "replace")
+            resources = f"<< /Font << /F1 {font} 0 R >> >>".encode()
+        else:
+            with Image.open(io.BytesIO(content)) as im:
+                w, h = im.size
+            img = add(
+                f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(content)} >>\nstream\n".encode()
+                + content + b"\nendstream"
+            )
+            stream = b"q 595 0 0 842 0 0 cm /Im0 Do Q"
+            resources = f"<< /XObject << /Im0 {img} 0 R >> >>".encode()
+        contents = add(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 595 842] "
+            f"/Contents {contents} 0 R /Resources ".encode() + resources + b" >>"
+        ))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode()
+    objects[pages_obj - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for off in offsets:
+        out.write(f"{off:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\n"
+              f"startxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def scan_page(lines, dpi=150) -> bytes:
+    w, h = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("L", (w, h), 250)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=dpi // 8)
+    for n, line in enumerate(lines):
+        draw.text((dpi, dpi + n * dpi // 5), line, fill=25, font=font)
+    buf = io.BytesIO()
+    page.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+def synthetic_pdf(n_pages: int, scan_ratio: float, seed: int = 16):
+    rng = random.Random(seed)
+    pages, kinds = [], []
+    for i in range(n_pages):
+        lines = [f"HALAMAN {i + 1}"] + synthetic_letter(rng, i)["ocr_text"].splitlines()
+        lines = [ln[:90] for ln in lines]
+        if rng.random() < scan_ratio:
+            pages.append(("image", scan_page(lines)))
+            kinds.append("scan")
+        else:
+            pages.append(("text", lines))
+            kinds.append("text")
+    return build_pdf(pages), kinds
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--scan-ratio", type=float, default=0.6)
+    ap.add_argument("--latency", type=float, default=1.0, help="latency stub OCR per request (detik)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    from utils import pdf
+    from utils.ocr_backends import OCRSpaceBackend
+    if not pdf.available():
+        sys.exit("pypdfium2 tidak terpasang (pip install pypdfium2)")
+
+    server, url = start_ocr_stub(latency=args.latency)
+    os.environ["OCR_SPACE_URL"] = url
+
+    data, kinds = synthetic_pdf(args.pages, args.scan_ratio)
+    n_scan = kinds.count("scan")
+    print(f"PDF {args.pages} halaman ({n_scan} scan, {args.pages - n_scan} text layer), "
+          f"{len(data) / 1024:,.0f} KB — {'melebihi' if len(data) > 1024 * 1024 else 'di bawah'} batas 1 MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "surat.pdf")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        for concurrency in sorted({1, args.concurrency}):
+            os.environ["PDF_OCR_CONCURRENCY"] = str(concurrency)
+            requests_before = server.stub_stats["requests"]
+            t0 = time.perf_counter()
+            text, stats = pdf.extract_text(path, OCRSpaceBackend("stub"), 1024 * 1024)
+            elapsed = time.perf_counter() - t0
+            ideal = math.ceil(n_scan / concurrency) * args.latency
+            order_ok = [int(p.split()[1]) for p in text.split("\n\n") if p.startswith("HALAMAN")]
+            print(f"\nconcurrency {concurrency:>2}: {elapsed:6.2f} dtk "
+                  f"(ideal ≈ {ideal:.2f} dtk, {server.stub_stats['requests'] - requests_before} request OCR)")
+            print(f"  {stats}")
+            print(f"  urutan halaman text layer terjaga: {order_ok == sorted(order_ok)}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark pra-proses gambar sebelum OCR (utils/preprocess.py) dibanding loop
+kompres lama (turun kualitas 10 demi 10, encode penuh tiap langkah):
+waktu, jumlah encode, ukuran output, dan sudut deskew yang ditemukan.
+
+Scan sintetis dirender dari teks bench/corpus.py (kertas kekuningan, noise,
+miring beberapa derajat, sebagian dengan tag orientasi EXIF) + contoh di
+data/letters/. Dengan --ocr dan OCR_SPACE_API_KEY, panjang teks OCR
+sebelum/sesudah ikut dibandingkan.
+
+    python bench/bench_preprocess.py --scans 12 --dpi 300 --workers 4
+"""
+
+import argparse
+import glob
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from corpus import synthetic_letter  # noqa: E402
+from utils import preprocess  # noqa: E402
+from utils.pipeline import MAX_OCR_SIZE  # noqa: E402
+
+EXIF_ORIENTATION = 0x0112
+
+
+def render_scan(rng: random.Random, i: int, dpi: int) -> tuple:
+    """Surat sintetis A4 sebagai JPEG 'hasil scan/foto HP'. Kembalikan (bytes, sudut miring)."""
+    w, h = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("L", (w, h), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=max(12, dpi // 9))
+    margin, y, line_h = dpi, dpi, int(dpi / 5)
+    max_chars = int((w - 2 * margin) / (font.getlength("a") or 1))
+    for para in synthetic_letter(rng, i)["ocr_text"].splitlines():
+        words, line = para.split(), ""
+        for word in words + [None]:
+            if word is not None and len(line) + len(word) + 1 <= max_chars:
+                line = f"{line} {word}".strip()
+                continue
+            draw.text((margin, y), line, fill=20, font=font)
+            y += line_h
+            line = word or ""
+        y += line_h // 2
+
+    angle = rng.uniform(-4, 4)
+    page = page.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    # kertas kekuningan + noise sensor
+    arr = np.asarray(page, dtype=np.float32)
+    noise = np.random.default_rng(i).normal(0, 12, arr.shape)
+    rgb = np.stack([arr * 0.98, arr * 0.95, arr * 0.82], axis=-1) + noise[..., None]
+    img = Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8), "RGB")
+
+    exif = Image.Exif()
+    if i % 3 == 0:
+        # foto HP: piksel tersimpan miring, tag EXIF bilang "putar 90°"
+        img = img.transpose(Image.Transpose.ROTATE_90)
+        exif[EXIF_ORIENTATION] = 6
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92, exif=exif.tobytes())
+    return buf.getvalue(), angle
+
+
+def legacy_compress(path: str, limit: int) -> dict:
+    """Salinan prepare_ocr_input lama (sebelum utils/preprocess.py)."""
+    started = time.perf_counter()
+    img = Image.open(path).convert("RGB")
+    if max(img.size) > 1500:
+        img.thumbnail((1500, 1500))
+    quality, encodes = 85, 1
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    while buffer.tell() > limit and quality > 30:
+        quality -= 10
+        encodes += 1
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality)
+    return {"seconds": time.perf_counter() - started, "encodes": encodes,
+            "bytes": buffer.tell(), "quality": quality, "data": buffer.getvalue()}
+
+
+def ocr_length(path: str) -> int:
+    from utils.config import get_secret
+    from utils.ocr import ocr_space_file
+
+    return len(ocr_space_file(path, get_secret("OCR_SPACE_API_KEY")).strip())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--scans", type=int, default=12, help="jumlah scan sintetis")
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--workers", type=int, default=4, help="ukuran process pool")
+    ap.add_argument("--binarize", action="store_true")
+    ap.add_argument("--limit-kb", type=int, default=MAX_OCR_SIZE // 1024,
+                    help="batas ukuran output (kecilkan untuk menguji pencarian kualitas)")
+    ap.add_argument("--ocr", action="store_true", help="bandingkan panjang teks OCR (butuh API key)")
+    args = ap.parse_args()
+
+    options = {**preprocess.preprocess_config(), "grayscale": True, "deskew": True,
+               "binarize": args.binarize, "workers": args.workers}
+    rng = random.Random(15)
+    limit = args.limit_kb * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, angles = [], []
+        for i in range(args.scans):
+            data, angle = render_scan(rng, i, args.dpi)
+            path = os.path.join(tmp, f"scan_{i}.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+            angles.append(angle)
+        for path in sorted(glob.glob("data/letters/*.jpg")):
+            paths.append(path)
+            angles.append(None)
+        sizes = [os.path.getsize(p) for p in paths]
+        print(f"{len(paths)} gambar, input median {statistics.median(sizes) / 1024:,.0f} KB "
+              f"(maks {max(sizes) / 1024:,.0f} KB)")
+
+        legacy = [legacy_compress(p, limit) for p in paths]
+
+        new = []
+        for p in paths:
+            dst = os.path.join(tmp, os.path.basename(p) + "." + preprocess.output_suffix(options))
+            t0 = time.perf_counter()
+            info = preprocess.preprocess_file(p, dst, limit, options)
+            new.append({**info, "seconds": time.perf_counter() - t0, "path": dst})
+
+        t0 = time.perf_counter()
+        for p in paths:
+            preprocess.run(p, os.path.join(tmp, "pool_" + os.path.basename(p)), limit, options)
+        serial_pool = time.perf_counter() - t0
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as ex:
+            list(ex.map(
+                lambda p: preprocess.run(p, os.path.join(tmp, "par_" + os.path.basename(p)),
+                                         limit, options),
+                paths,
+            ))
+        parallel_pool = time.perf_counter() - t0
+
+        def row(name, results):
+            print(f"{name:<12} "
+                  f"{statistics.median(r['seconds'] for r in results) * 1000:>8.0f} ms "
+                  f"{statistics.mean(r['encodes'] for r in results):>8.1f} "
+                  f"{statistics.median(r['bytes'] for r in results) / 1024:>9,.0f} KB "
+                  f"{sum(r['bytes'] > limit for r in results):>8}")
+
+        print(f"\n{'':<12} {'median':>11} {'encode':>8} {'output':>12} {'>batas':>8}")
+        row("lama", legacy)
+        row("pra-proses", new)
+
+        errors = [abs(n["skew"] + a) for n, a in zip(new, angles) if a is not None]
+        if errors:
+            print(f"\ndeskew: galat sudut median {statistics.median(errors):.2f}° "
+                  f"(maks {max(errors):.2f}°) pada {len(errors)} scan sintetis")
+        print(f"process pool {args.workers} worker: {len(paths) / serial_pool:.1f} gambar/dtk berurutan, "
+              f"{len(paths) / parallel_pool:.1f} gambar/dtk paralel")
+
+        if args.ocr:
+            from utils.config import get_secret
+
+            if not get_secret("OCR_SPACE_API_KEY"):
+                print("\n--ocr dilewati: OCR_SPACE_API_KEY tidak diset")
+                return
+            before, after = [], []
+            for p, old, n in zip(paths, legacy, new):
+                old_path = p + ".legacy.jpg"
+                with open(old_path, "wb") as f:
+                    f.write(old["data"])
+                before.append(ocr_length(old_path))
+                after.append(ocr_length(n["path"]))
+            print(f"\npanjang teks OCR: lama median {statistics.median(before):.0f} karakter, "
+                  f"pra-proses median {statistics.median(after):.0f} karakter")
+
+
+if __name__ == "__main__":
+    main()
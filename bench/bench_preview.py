@@ -0,0 +1,79 @@
+"""
+Benchmark backfill thumbnail + pratinjau (utils/preview.py): arsip sintetis
+scan JPEG (bench_preprocess.render_scan) + PDF (bench_pdf.synthetic_pdf,
+kalau pypdfium2 ada) disimpan lewat blob store, lalu `preview.backfill`
+dijalankan dengan 1 dan N worker proses.
+
+Dilaporkan: waktu, surat/detik, dan ukuran rata-rata turunan dibanding file
+asli (= byte yang diambil browser per surat saat menjelajah daftar).
+
+    python bench/bench_preview.py --letters 40 --workers 4
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pdf import synthetic_pdf  # noqa: E402
+from bench_preprocess import render_scan  # noqa: E402
+
+import db  # noqa: E402
+from utils import pdf, preview, storage  # noqa: E402
+
+
+def build_archive(n: int, dpi: int):
+    rng = random.Random(23)
+    for i in range(n):
+        if pdf.available() and i % 4 == 3:
+            data, _ = synthetic_pdf(3, 1.0, seed=i)
+            name, mime = f"surat_{i}.pdf", pdf.PDF_MIME
+        else:
+            data, _ = render_scan(rng, i, dpi)
+            name, mime = f"surat_{i}.jpg", "image/jpeg"
+        digest = storage.put_bytes(data, mime=mime)
+        db.insert_letter(uploader="bench", filename=name, content_hash=digest, ocr_text="")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--letters", type=int, default=40)
+    ap.add_argument("--dpi", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.BLOB_DIR = storage.Path(tmp) / "blobs"
+        storage.DERIVED_DIR = storage.BLOB_DIR / "derived"
+        db.init_db()
+        build_archive(args.letters, args.dpi)
+        print(f"{args.letters} surat sintetis ({'dengan' if pdf.available() else 'tanpa'} PDF), "
+              f"{os.cpu_count()} CPU\n")
+
+        print(f"{'worker':>6} {'dtk':>7} {'surat/dtk':>10} {'asli KB':>9} {'turunan KB':>11} {'rasio':>7}")
+        for workers in sorted({1, args.workers}):
+            shutil.rmtree(storage.DERIVED_DIR, ignore_errors=True)
+            preview._reset_executor()
+            stats = preview.backfill(workers=workers)
+            n = max(1, stats["generated"])
+            src_kb = stats["source_bytes"] / n / 1024
+            out_kb = stats["bytes"] / n / 1024
+            print(f"{workers:>6} {stats['seconds']:>7.2f} {stats['generated'] / stats['seconds']:>10.1f} "
+                  f"{src_kb:>9.0f} {out_kb:>11.1f} {out_kb / src_kb:>6.1%}")
+
+        thumbs = list(storage.DERIVED_DIR.glob("*/*.thumb.webp"))
+        print(f"\nthumbnail rata-rata {sum(p.stat().st_size for p in thumbs) / max(1, len(thumbs)) / 1024:.1f} KB "
+              f"({len(thumbs)} file) — yang diambil per baris tabel Dashboard")
+        print(f"backfill ulang (semua sudah ada): {preview.backfill(workers=args.workers)}")
+        db.get_pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark pencarian full-text (FTS5): waktu build index dan latency query
+pada arsip sintetis berbagai ukuran. Gagal (exit 1) kalau p95 query melewati
+--budget-ms pada ukuran terbesar.
+
+    python bench/bench_search.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db  # noqa: E402
+from corpus import fill_letters  # noqa: E402
+from utils.search import search  # noqa: E402
+
+QUERIES = [
+    "pengaduan air keruh",
+    "undangan rapat koordinasi",
+    "tagihan pembayaran",
+    "kebocoran pipa Cibinong",
+    "mengajukan permohonan sambungan",
+    '"kerja sama"',
+    "somasi",
+    "Budi Santoso",
+    "perbaikan",          # sangat umum → uji terburuk untuk bm25
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def query_latency(repeat, division=None):
+    per_query = {}
+    for q in QUERIES:
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            search(q, division, limit=21)
+            times.append((time.perf_counter() - t0) * 1000)
+        per_query[q] = times
+    return per_query
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[10_000, 50_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--budget-ms", type=float, default=50.0)
+    args = ap.parse_args()
+
+    worst_p95 = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "search.db")
+        db.init_db()
+
+        filled = 0
+        for size in sorted(args.sizes):
+            # insert lewat trigger (index ikut terisi per baris)
+            t0 = time.perf_counter()
+            fill_letters(size - filled, seed=size, start=filled)
+            insert_s = time.perf_counter() - t0
+            per_row_ms = insert_s / max(size - filled, 1) * 1000
+            filled = size
+
+            t0 = time.perf_counter()
+            db.rebuild_search_index()
+            rebuild_s = time.perf_counter() - t0
+
+            with db.get_conn() as conn:
+                conn.execute("UPDATE letters SET assigned_division = 'IT' WHERE id % 7 = 0")
+
+            print(f"\n== {size} surat ==")
+            print(f"insert + trigger FTS : {per_row_ms:.3f} ms/surat")
+            print(f"rebuild index penuh  : {rebuild_s:.2f} s")
+
+            for label, division in (("semua", None), ("divisi IT", "IT")):
+                per_query = query_latency(args.repeat, division)
+                all_times = [t for ts in per_query.values() for t in ts]
+                p95 = percentile(all_times, 95)
+                if size == max(args.sizes):
+                    worst_p95 = max(worst_p95, p95)
+                print(
+                    f"query ({label:9}) : p50 {statistics.median(all_times):6.2f} ms · "
+                    f"p95 {p95:6.2f} ms · max {max(all_times):6.2f} ms"
+                )
+                slowest = max(per_query, key=lambda q: statistics.median(per_query[q]))
+                print(f"  paling lambat: {slowest!r} ({statistics.median(per_query[slowest]):.2f} ms)")
+
+        db.get_pool().close_all()
+
+    ok = worst_p95 <= args.budget_ms
+    print(f"\np95 terburuk {worst_p95:.2f} ms (budget {args.budget_ms:g} ms): {'OK' if ok else 'GAGAL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
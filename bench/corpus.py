@@ -0,0 +1,189 @@
+"""
+Generator arsip surat sintetis (Bahasa Indonesia) untuk benchmark.
+Deterministik untuk seed yang sama.
+
+    from corpus import fill_dispositions, fill_letters
+    fill_letters(100_000, seed=1)   # isi tabel letters di db.DB_PATH aktif
+    fill_dispositions(seed=1)       # rantai disposisi 0–4 langkah per surat
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+DIVISI = ["Operasi", "Hubungan Pelanggan", "Finance", "Hukum", "IT", "SDM", "Umum"]
+
+PERIHAL = [
+    ("Undangan rapat koordinasi", "Umum"),
+    ("Pengaduan air keruh di wilayah", "Hubungan Pelanggan"),
+    ("Permohonan pemasangan sambungan baru", "Hubungan Pelanggan"),
+    ("Pemberitahuan pemadaman listrik pompa", "Operasi"),
+    ("Tagihan pembayaran rekening", "Finance"),
+    ("Laporan kebocoran pipa distribusi", "Operasi"),
+    ("Somasi sengketa lahan reservoir", "Hukum"),
+    ("Permintaan data pelanggan untuk audit", "Finance"),
+    ("Pengajuan cuti dan mutasi pegawai", "SDM"),
+    ("Gangguan jaringan server billing", "IT"),
+    ("Penawaran kerja sama pengadaan meter air", "Umum"),
+    ("Pemeriksaan kualitas air baku", "Operasi"),
+]
+
+KALIMAT = [
+    "Dengan hormat, bersama surat ini kami menyampaikan {perihal} {tempat}.",
+    "Sehubungan dengan hal tersebut, mohon kiranya Bapak/Ibu dapat menindaklanjuti.",
+    "Kegiatan akan dilaksanakan pada hari {hari}, {tgl} pukul {jam} WIB.",
+    "Bertempat di {tempat}, dihadiri oleh perwakilan {divisi}.",
+    "Pelanggan atas nama {nama} dengan nomor sambungan {sambungan} menyampaikan keluhan.",
+    "Terlampir kami sampaikan dokumen pendukung sebagai bahan pertimbangan.",
+    "Demikian surat ini kami sampaikan, atas perhatian dan kerja samanya diucapkan terima kasih.",
+    "Pembayaran dilakukan paling lambat tanggal {tgl} melalui rekening perusahaan.",
+    "Debit air menurun sejak {hari} pagi sehingga distribusi ke pelanggan terganggu.",
+    "Mohon segera dilakukan perbaikan agar pelayanan kepada masyarakat tidak terhambat.",
+]
+
+TEMPAT = ["Kecamatan Cibinong", "Kelurahan Sukamaju", "Jalan Merdeka", "Kantor Pusat",
+          "Perumahan Griya Asri", "Desa Tanjungsari", "Aula Bappeda", "IPA Cikuray"]
+# kosakata isi bebas: tiap surat mendapat paragraf acak sendiri supaya surat
+# yang berbeda tidak terlalu mirip (penting untuk benchmark deteksi kembar)
+KOSAKATA = """
+air bersih pelanggan meter pipa distribusi tekanan debit reservoir pompa sumur
+bor instalasi pengolahan klorin kekeruhan kualitas sampel laboratorium hasil
+uji baku mutu wilayah kecamatan kelurahan desa dusun blok rumah tangga niaga
+sosial industri tarif golongan rekening tunggakan denda pembayaran loket bank
+transfer kwitansi bukti tanda terima berita acara serah terima pekerjaan
+kontrak addendum rencana anggaran biaya pelaksanaan pengawasan konsultan
+kontraktor vendor penyedia barang jasa lelang tender evaluasi dokumen teknis
+spesifikasi gambar lokasi survei lapangan jadwal tahap termin progres laporan
+bulanan triwulan tahunan audit keuangan neraca aset persediaan gudang material
+suku cadang kendaraan operasional perawatan perbaikan penggantian pemasangan
+sambungan baru penutupan sementara pembukaan kembali mutasi balik nama
+pengaduan keluhan tanggapan penyelesaian tindak lanjut koordinasi rapat
+undangan narasumber peserta pelatihan sosialisasi penyuluhan masyarakat tokoh
+ketua rukun tetangga warga lingkungan sekolah puskesmas rumah sakit kantor
+pemerintah daerah dinas pekerjaan umum perumahan badan perencanaan kepolisian
+kejaksaan pengadilan kuasa hukum gugatan perjanjian kerja sama nota kesepahaman
+pegawai karyawan cuti izin sakit lembur tunjangan gaji kenaikan pangkat jabatan
+pensiun rekrutmen seleksi wawancara orientasi disiplin sanksi penghargaan
+jaringan server aplikasi basis data cadangan gangguan pemeliharaan lisensi
+perangkat komputer printer internet keamanan akun kata sandi pengguna
+""".split()
+
+HARI = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat"]
+NAMA = ["Budi Santoso", "Siti Aminah", "Agus Salim", "Dewi Lestari", "Rudi Hartono",
+        "Sri Wahyuni", "Andi Pratama", "Nur Hasanah"]
+
+
+def nomor_pengirim(rng: random.Random) -> str:
+    return f"{rng.randint(0, 999):03d}.{rng.randint(1, 9)}.{rng.randint(1, 9)}/{rng.randint(1, 9999)}"
+
+
+def synthetic_letter(rng: random.Random, i: int) -> dict:
+    """Satu surat sintetis: kolom letters + label divisi 'benar' (_label)."""
+    perihal, divisi = rng.choice(PERIHAL)
+    tempat = rng.choice(TEMPAT)
+    fill = {
+        "perihal": perihal.lower(), "tempat": tempat, "hari": rng.choice(HARI),
+        "tgl": f"{rng.randint(1, 28)} {rng.choice(['Januari', 'Maret', 'Juni', 'Agustus', 'Oktober'])} 2025",
+        "jam": f"{rng.randint(7, 16):02d}.00", "divisi": rng.choice(DIVISI),
+        "nama": rng.choice(NAMA), "sambungan": f"{rng.randint(10_000, 99_999)}",
+    }
+    nomor = nomor_pengirim(rng)
+    body = [f"Nomor: {nomor}", f"Hal: {perihal}"]
+    body += [rng.choice(KALIMAT).format(**fill) for _ in range(rng.randint(3, 6))]
+    for _ in range(rng.randint(3, 6)):
+        body.append(" ".join(rng.choice(KOSAKATA) for _ in range(rng.randint(10, 18))).capitalize() + ".")
+
+    year = 2015 + i % 11
+    return {
+        "nomor_internal": f"SIM/{i}",
+        "uploader": "bench",
+        "division": "Umum",
+        "status": "Analisa Selesai",
+        "ai_nomor_pengirim": nomor,
+        "ai_maksud": f"{perihal} {tempat}.",
+        "ai_rekomendasi": divisi,
+        "timestamp": f"{year}-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00",
+        "filename": f"surat_{i}.pdf",
+        "ocr_text": "\n".join(body),
+        "_label": divisi,
+    }
+
+
+def letters(n: int, seed: int = 1, start: int = 0):
+    rng = random.Random(seed)
+    for i in range(start, start + n):
+        yield synthetic_letter(rng, i)
+
+
+COLUMNS = ["nomor_internal", "uploader", "division", "status", "ai_nomor_pengirim",
+           "ai_maksud", "ai_rekomendasi", "timestamp", "filename", "ocr_text"]
+
+
+def fill_letters(n: int, seed: int = 1, start: int = 0, chunk: int = 5000):
+    """Masukkan n surat sintetis langsung ke tabel letters (trigger tetap jalan)."""
+    sql = (
+        f"INSERT INTO letters ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(COLUMNS))})"
+    )
+    batch = []
+    for row in letters(n, seed, start):
+        batch.append([row[c] for c in COLUMNS])
+        if len(batch) >= chunk:
+            with db.get_conn() as conn:
+                conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        with db.get_conn() as conn:
+            conn.executemany(sql, batch)
+
+
+# alur disposisi seperti di Dashboard: Bagian Umum → Direksi → Manager divisi → Staf
+CHAIN_WEIGHTS = [15, 25, 30, 20, 10]     # peluang rantai 0, 1, 2, 3, 4 langkah
+CATATAN = ["Mohon ditindaklanjuti.", "Untuk diketahui.", "Segera koordinasikan.",
+           "Siapkan jawaban tertulis.", "Agendakan rapat.", ""]
+
+
+def disposition_chain(rng: random.Random, letter_id: int, timestamp: str, divisi: str):
+    """Baris dispositions (urut waktu) untuk satu surat; panjang acak 0–4."""
+    hops = [("BAGIAN_UMUM", "Umum"), ("DIREKTUR", "Direksi"),
+            ("MANAGER", divisi or "Umum"), ("STAFF", divisi or "Umum")]
+    n = rng.choices(range(len(CHAIN_WEIGHTS)), weights=CHAIN_WEIGHTS)[0]
+    at = datetime.fromisoformat(timestamp)
+    rows = []
+    for (from_role, from_div), (to_role, to_div) in zip(hops, hops[1:n + 1]):
+        at += timedelta(hours=rng.randint(1, 48))
+        rows.append((letter_id, from_role, from_div, to_role, to_div,
+                     rng.choice(CATATAN), "bench", at.isoformat(timespec="seconds")))
+    return rows
+
+
+def fill_dispositions(seed: int = 1, chunk: int = 5000) -> int:
+    """
+    Rantai disposisi untuk semua surat di tabel letters (trigger assigned_*
+    tetap jalan). Surat dibaca per chunk (keyset) → memori konstan. Kembalikan
+    jumlah baris disposisi.
+    """
+    sql = (
+        "INSERT INTO dispositions (letter_id, from_role, from_division, to_role, "
+        "to_division, note, created_by, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    rng = random.Random(seed)
+    last, total = 0, 0
+    while True:
+        with db.get_conn() as conn:
+            letters = conn.execute(
+                "SELECT id, timestamp, ai_rekomendasi FROM letters WHERE id > ? ORDER BY id LIMIT ?",
+                (last, chunk),
+            ).fetchall()
+            if not letters:
+                return total
+            rows = [row for lid, ts, divisi in letters
+                    for row in disposition_chain(rng, lid, ts, divisi)]
+            conn.executemany(sql, rows)
+        total += len(rows)
+        last = letters[-1][0]
@@ -0,0 +1,139 @@
+"""
+Regression check untuk query plan: gagal (exit 1) kalau ada query "panas"
+yang jatuh ke full table scan.
+
+SQL yang diperiksa tidak disalin tangan: fungsi db.py dipanggil sungguhan
+terhadap DB kecil, statement yang dijalankannya ditangkap lewat
+set_trace_callback, lalu masing-masing di-EXPLAIN QUERY PLAN.
+
+    python bench/query_plans.py
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from utils.search import build_match_query  # noqa: E402
+
+# nama → (pemanggilan fungsi db.py[, SCAN yang boleh])
+# SCAN yang boleh: tabel yang memang dibaca berurutan rowid lalu berhenti di
+# LIMIT (paginasi / chunk pertama keyset), bukan full scan sungguhan.
+HOT_QUERIES = {
+    "get_letter_by_id": (lambda: db.get_letter_by_id(1),),
+    "get_dispositions_for_letter": (lambda: db.get_dispositions_for_letter(1),),
+    "dashboard_page_all": (lambda: db.query_dashboard(limit=50), ("SCAN l",)),
+    "dashboard_page_oldest": (lambda: db.query_dashboard(limit=50, sort="terlama"), ("SCAN l",)),
+    "dashboard_page_by_timestamp": (lambda: db.query_dashboard(limit=50, sort="waktu_masuk"),),
+    "dashboard_page_division": (lambda: db.query_dashboard("IT", limit=50),),
+    "dashboard_count_division": (lambda: db.count_dashboard("IT"),),
+    "list_assigned_divisions": (db.list_assigned_divisions,),
+    "list_letter_labels": (lambda: db.list_letter_labels(20), ("SCAN letters",)),
+    "search_letters": (lambda: db.search_letters(build_match_query("rapat")),),
+    "search_letters_division": (lambda: db.search_letters(build_match_query("rapat"), "IT"),),
+    "export_chunk_by_id": (
+        lambda: [*db.iter_letters(["nomor_internal"], chunk=1)],
+        ("SCAN letters",),
+    ),
+    "export_chunk_by_time": (
+        lambda: [*db.iter_letters(["nomor_internal"], "2025-01-01", "2025-12-31", chunk=1)],
+    ),
+    "export_chunk_division": (
+        lambda: [*db.iter_letters(["nomor_internal"], assigned_division="IT", chunk=1)],
+    ),
+}
+
+# subquery di trigger assignment (migrasi 7) tidak lewat trace statement;
+# diperiksa lewat UPDATE yang sama dengan isi trigger
+TRIGGER_QUERIES = {
+    "latest_disposition_for_letter": (
+        "UPDATE letters SET (assigned_role, assigned_division, assigned_at) = "
+        f"({db._LATEST_ASSIGNMENT_SQL}) WHERE id = 1"
+    ),
+}
+
+_CHECKED = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def _app_statement(sql: str) -> bool:
+    """Statement dari kode kita; query internal FTS5 ke tabel bayangan selalu ber-prefix 'main'."""
+    return sql.lstrip().upper().startswith(_CHECKED) and "'main'." not in sql
+
+
+@contextmanager
+def traced_statements():
+    """Semua koneksi pool mencatat statement (parameter sudah disisipkan) ke list."""
+    statements = []
+    pool = db.get_pool()
+    conns = [pool.acquire() for _ in range(pool.size)]
+    for conn in conns:
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+    try:
+        yield statements
+    finally:
+        conns = [pool.acquire() for _ in range(pool.size)]
+        for conn in conns:
+            conn.set_trace_callback(None)
+            pool.release(conn)
+
+
+def seed():
+    for i, ts in enumerate(("2025-03-01T08:00:00", "2025-03-02T09:00:00", "2025-04-01T10:00:00")):
+        letter_id, _ = db.insert_letter(
+            uploader="bench", division="Umum", status="Baru", ai_maksud=f"Undangan rapat {i}",
+            timestamp=ts, filename=f"surat_{i}.pdf", ocr_text="Undangan rapat koordinasi",
+        )
+        db.add_disposition(letter_id, "ADMIN", "Umum", "STAFF", "IT", "", "bench")
+
+
+def full_scans(conn, sql, allowed=()):
+    """Kembalikan baris EXPLAIN QUERY PLAN yang berupa SCAN tanpa index."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    details = [row["detail"] for row in plan]
+    return [
+        d for d in details
+        if d.startswith("SCAN") and "USING" not in d and "VIRTUAL TABLE" not in d
+        and d not in allowed
+    ]
+
+
+def report(name, scans) -> bool:
+    status = "FULL SCAN" if scans else "ok"
+    print(f"{status:>9}  {name}" + (f"  ({'; '.join(scans)})" if scans else ""))
+    return bool(scans)
+
+
+def main():
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "plans.db")
+        db.init_db()
+        seed()
+
+        for name, (call, *allowed) in HOT_QUERIES.items():
+            with traced_statements() as statements:
+                call()
+            checked = [s for s in statements if _app_statement(s)]
+            if not checked:
+                failed = report(name, ["tidak ada statement tertangkap"]) or failed
+                continue
+            with db.get_conn() as conn:
+                scans = [d for sql in checked for d in full_scans(conn, sql, *allowed)]
+            failed = report(f"{name} ({len(checked)} statement)", scans) or failed
+
+        with db.get_conn() as conn:
+            for name, sql in TRIGGER_QUERIES.items():
+                failed = report(name, full_scans(conn, sql)) or failed
+
+        db.get_pool().close_all()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Stress test nomor_internal: banyak proses upload bersamaan, lalu pastikan
+tidak ada nomor kembar dan urutan per bulan tanpa lubang. Juga mengukur
+latency insert_letter saat arsip makin besar (harus tetap datar).
+
+    python bench/stress_nomor.py --procs 8 --per-proc 200 --archive 0 100000 300000
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+TIMESTAMP = "2025-11-20T09:00:00"
+
+
+def _worker(db_path, n):
+    db.DB_PATH = db_path
+    issued = []
+    for _ in range(n):
+        _, nomor = db.insert_letter(uploader=f"proc-{os.getpid()}", timestamp=TIMESTAMP)
+        issued.append(nomor)
+    return issued
+
+
+def stress(db_path, procs, per_proc):
+    with mp.Pool(procs) as pool:
+        results = pool.starmap(_worker, [(db_path, per_proc)] * procs)
+
+    issued = [n for chunk in results for n in chunk]
+    expected = {f"2025/11/{i:03d}" for i in range(1, procs * per_proc + 1)}
+    dupes = len(issued) - len(set(issued))
+    gaps = expected - set(issued)
+
+    print(f"stress: {len(issued)} nomor dari {procs} proses, {dupes} kembar, {len(gaps)} lubang")
+    return dupes == 0 and not gaps
+
+
+def prefill(start, stop):
+    """Isi arsip palsu tersebar di 2015–2024 (tidak menyentuh counter bulan uji)."""
+    with db.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO letters (nomor_internal, timestamp, ocr_text) VALUES (?, ?, ?)",
+            (
+                (f"ARSIP/{i}", f"{2015 + i % 10}-{1 + i % 12:02d}-01T08:00:00", "arsip")
+                for i in range(start, stop)
+            ),
+        )
+
+
+def latency(samples=300):
+    t0 = time.perf_counter()
+    for _ in range(samples):
+        db.insert_letter(uploader="bench", timestamp="2026-01-05T09:00:00")
+    return (time.perf_counter() - t0) / samples * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--per-proc", type=int, default=200)
+    ap.add_argument("--archive", type=int, nargs="*", default=[0, 100_000, 300_000])
+    args = ap.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "stress.db")
+        db.init_db()
+        db.get_pool().close_all()
+        ok = stress(db.DB_PATH, args.procs, args.per_proc)
+
+        filled = 0
+        for size in sorted(args.archive):
+            prefill(filled, size)
+            filled = size
+            print(f"latency @ {size:>8} surat: {latency():.3f} ms/insert")
+
+        db.get_pool().close_all()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
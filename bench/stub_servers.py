@@ -0,0 +1,248 @@
+"""
+Server tiruan lokal untuk layanan eksternal (tanpa internet / tanpa kuota):
+
+- OCR.Space  : POST /parse/image → JSON ParsedResults
+- Groq (LLM) : POST /openai/v1/chat/completions → chat.completion (format OpenAI),
+               atau server-sent events kalau request minta stream=True
+
+Keduanya dengan latency dan tingkat kegagalan (HTTP 503 / koneksi diputus)
+yang bisa diatur.
+
+Jalankan sendiri:
+    python bench/stub_servers.py ocr --port 8765 --latency 0.3 --fail-rate 0.2
+lalu set OCR_SPACE_URL=http://127.0.0.1:8765/parse/image
+
+    python bench/stub_servers.py groq --port 8766 --latency 0.5
+lalu set GROQ_BASE_URL=http://127.0.0.1:8766 (GROQ_API_KEY bebas)
+
+atau dari skrip lain:
+    server, url = start_ocr_stub(latency=0.3, fail_rate=0.2)
+    server, url = start_ocr_stub(fail_first=2, fail_kind="503")   # 2 request pertama gagal
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TEXT = (
+    "PEMERINTAH KOTA\nNomor: 000.1.5/854\nHal: Undangan Rapat Koordinasi\n"
+    "Dengan hormat, mengharap kehadiran Bapak/Ibu pada Selasa 12 Agustus 2025 "
+    "pukul 13.00 WIB secara daring.\n"
+)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _drain_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self):
+        """Latency + kegagalan acak. True kalau request sudah dijawab gagal."""
+        cfg = self.server.stub_cfg
+        time.sleep(max(0.0, random.gauss(cfg["latency"], cfg["latency"] * 0.1)))
+        with self.server.stub_lock:
+            self.server.stub_stats["requests"] += 1
+            n = self.server.stub_stats["requests"]
+        # fail_first: N request pertama pasti gagal (uji retry yang deterministik)
+        if n <= cfg.get("fail_first", 0) or random.random() < cfg["fail_rate"]:
+            with self.server.stub_lock:
+                self.server.stub_stats["failed"] += 1
+            # fail_kind: "503" / "reset" / "hang" (diam sampai client timeout) /
+            # "html" (HTTP 200 halaman error proxy) / "ocr_error" (error OCR.Space
+            # sendiri, IsErroredOnProcessing); default acak 503/reset
+            kind = cfg.get("fail_kind") or random.choice(("503", "reset"))
+            if kind == "hang":
+                time.sleep(cfg.get("hang", 5.0))
+                self.close_connection = True
+            elif kind == "503":
+                self._send_json(503, {"error": "stub overloaded"})
+            elif kind == "html":
+                body = b"<html><body>502 Bad Gateway</body></html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif kind == "ocr_error":
+                self._send_json(200, {"IsErroredOnProcessing": True, "ErrorMessage": ["File rusak"]})
+            else:
+                # putus koneksi tanpa jawaban (connection reset)
+                self.connection.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00"
+                )
+                self.close_connection = True
+                self.connection.close()
+            return True
+        return False
+
+
+class OCRStubHandler(_StubHandler):
+    def do_POST(self):
+        self._drain_body()
+        if self._maybe_fail():
+            return
+        # text boleh callable → teks berbeda per request (cache AI tidak kena)
+        text = self.server.stub_cfg.get("text", SAMPLE_TEXT)
+        if callable(text):
+            with self.server.stub_lock:
+                text = text()
+        self._send_json(200, {
+            "IsErroredOnProcessing": False,
+            "OCRExitCode": 1,
+            "ParsedResults": [{"ParsedText": text}],
+        })
+
+
+class GroqStubHandler(_StubHandler):
+    """Meniru Groq chat completions; balasan JSON 3 key yang diturunkan dari teks OCR."""
+
+    def do_POST(self):
+        body = json.loads(self._drain_body() or b"{}")
+        if self._maybe_fail():
+            return
+
+        cfg = self.server.stub_cfg
+        messages = body.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        # waktu proses LLM sebanding panjang prompt (opsional, per 1000 token)
+        time.sleep(prompt_chars / 4 / 1000 * cfg.get("sec_per_1k_tokens", 0.0))
+        if len(messages) > 2 and messages[-2].get("role") == "assistant":
+            # permintaan repair → ulangi jawaban untuk prompt aslinya
+            prompt = messages[-3].get("content", "")
+        answer = json.dumps({
+            "nomor_surat_pengirim": "000.1.5/854" if "Nomor" in prompt else None,
+            "maksud_surat": f"Ringkasan otomatis ({len(prompt)} karakter prompt).",
+            "rekomendasi_divisi": "Umum",
+        }, indent=2)
+        if messages[-1].get("role") == "user" and random.random() < cfg.get("malformed_rate", 0.0):
+            answer = answer.replace('",\n', '"\n', 1)      # koma hilang → JSON rusak
+        answer += cfg.get("trailing", "")
+
+        if body.get("stream"):
+            self._send_stream(body, answer, prompt_chars)
+            return
+        # tanpa stream, balasan baru dikirim setelah semua token "dibangkitkan"
+        time.sleep(len(answer) / 4 * cfg.get("sec_per_token", 0.0))
+        self._send_json(200, {
+            "id": f"stub-{random.randrange(1 << 30)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(answer) // 4,
+                "total_tokens": (prompt_chars + len(answer)) // 4,
+            },
+        })
+
+
+    def _send_stream(self, body, answer, prompt_chars):
+        """Server-sent events ala OpenAI: satu chunk per ±4 karakter (1 token)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {
+            "id": f"stub-{random.randrange(1 << 30)}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+        }
+
+        def event(data):
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        delay = self.server.stub_cfg.get("sec_per_token", 0.0)
+        try:
+            for i in range(0, len(answer), 4):
+                time.sleep(delay)
+                event(json.dumps({**base, "choices": [
+                    {"index": 0, "delta": {"content": answer[i:i + 4]}, "finish_reason": None},
+                ]}))
+            event(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                              "x_groq": {"id": base["id"], "usage": {
+                                  "prompt_tokens": prompt_chars // 4,
+                                  "completion_tokens": len(answer) // 4,
+                                  "total_tokens": (prompt_chars + len(answer)) // 4,
+                              }}}))
+            event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # client menutup stream lebih awal (early exit) → hitung saja
+            with self.server.stub_lock:
+                self.server.stub_stats["aborted_streams"] = self.server.stub_stats.get("aborted_streams", 0) + 1
+            self.close_connection = True
+
+
+def start_stub(handler, latency=0.2, fail_rate=0.0, port=0, **extra):
+    """Jalankan server di thread daemon. Kembalikan (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stub_cfg = {"latency": latency, "fail_rate": fail_rate, **extra}
+    server.stub_stats = {"requests": 0, "failed": 0}
+    server.stub_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_ocr_stub(latency=0.2, fail_rate=0.0, port=0, **extra):
+    server, base = start_stub(OCRStubHandler, latency, fail_rate, port, **extra)
+    return server, f"{base}/parse/image"
+
+
+def start_groq_stub(latency=0.5, fail_rate=0.0, port=0, **extra):
+    """base_url untuk Groq(base_url=...) / GROQ_BASE_URL."""
+    return start_stub(GroqStubHandler, latency, fail_rate, port, **extra)
+
+
+STUBS = {
+    "ocr": start_ocr_stub,
+    "groq": start_groq_stub,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Server tiruan OCR.Space / Groq untuk uji lokal")
+    ap.add_argument("service", choices=sorted(STUBS))
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    server, url = STUBS[args.service](args.latency, args.fail_rate, args.port)
+    print(f"{args.service} stub di {url} (Ctrl+C untuk berhenti)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
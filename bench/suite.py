@@ -0,0 +1,455 @@
+"""
+Suite benchmark jalur upload, query dan AI yang bisa diulang, hasil ke JSON.
+
+Per ukuran arsip (--sizes, default 10k; 100k / 1M untuk uji skala) dibangun
+arsip sintetis deterministik (corpus.py: ocr_text ±1 KB + rantai disposisi
+0–4 langkah), lalu diukur:
+  - query dashboard (count, halaman, filter divisi, pilihan disposisi, FTS)
+  - get_dispositions_for_letter untuk surat acak
+  - ekspor (utils/export.write_export) per format yang tersedia
+  - throughput insert_letter (satu per satu) dan insert_letters_batch
+Sekali per run: pipeline upload → OCR → AI ujung-ke-ujung lewat job worker
+terhadap stub OCR.Space + Groq lokal (stub_servers.py), dengan rincian per
+tahap dari utils/metrics.
+
+    python bench/suite.py --sizes 10000 100000 --out bench/results/baru.json
+    python bench/suite.py --sizes 1000000 --cache-dir /tmp/arsip --skip-pipeline
+    python bench/suite.py --compare bench/results/lama.json bench/results/baru.json
+
+--compare membandingkan dua file hasil dan exit 1 kalau ada metrik yang
+memburuk lebih dari --threshold (latency/durasi naik, throughput turun).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_preprocess import render_scan  # noqa: E402
+from corpus import COLUMNS, fill_dispositions, fill_letters, letters  # noqa: E402
+from stub_servers import start_groq_stub, start_ocr_stub  # noqa: E402
+
+import db  # noqa: E402
+from utils import export, metrics, storage  # noqa: E402
+from utils.search import build_match_query  # noqa: E402
+
+SUITE_VERSION = 1
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# latency di bawah ini dianggap noise saat --compare
+NOISE_FLOOR_MS = 0.5
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def latency(samples_ms) -> dict:
+    return {
+        "n": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+def timed_calls(fn, args_list) -> dict:
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return latency(samples)
+
+
+def use_db(path: str):
+    db.get_pool().close_all()
+    db.DB_DIR = os.path.dirname(path)
+    db.DB_PATH = path
+    db.init_db()
+
+
+def meta() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "suite_version": SUITE_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "schema_version": db.SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# -------------------------------------------------
+# 1. Arsip sintetis
+# -------------------------------------------------
+def build_archive(path: str, n: int, seed: int) -> dict:
+    use_db(path)
+    t0 = time.perf_counter()
+    fill_letters(n, seed=seed)
+    letters_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    n_disp = fill_dispositions(seed=seed)
+    disp_s = time.perf_counter() - t0
+    with db.get_conn() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("ANALYZE")
+    return {
+        "letters": n,
+        "dispositions": n_disp,
+        "fill_letters_s": round(letters_s, 2),
+        "fill_dispositions_s": round(disp_s, 2),
+    }
+
+
+def prepare_archive(tmp: str, n: int, seed: int, cache_dir: str = None) -> dict:
+    """
+    DB arsip n surat di tmp/archive.db. Dengan cache_dir, arsip dibangun sekali
+    (per ukuran, seed & versi skema) lalu disalin → run berikutnya tidak perlu
+    membangun ulang 1M surat.
+    """
+    path = os.path.join(tmp, "archive.db")
+    if not cache_dir:
+        return build_archive(path, n, seed)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, f"archive-{n}-s{seed}-v{db.SCHEMA_VERSION}.db")
+    info_path = cached + ".json"
+    if not os.path.exists(info_path):
+        info = build_archive(cached, n, seed)
+        db.get_pool().close_all()
+        with open(info_path, "w") as f:
+            json.dump(info, f)
+    with open(info_path) as f:
+        info = json.load(f)
+    shutil.copyfile(cached, path)
+    use_db(path)
+    return {**info, "from_cache": True}
+
+
+# -------------------------------------------------
+# 2. Query & ekspor pada satu arsip
+# -------------------------------------------------
+def bench_dashboard(n: int, rng: random.Random, reps: int) -> dict:
+    """Query yang dijalankan halaman Dashboard (tanpa st.cache_data)."""
+    deep = [(None, 50, rng.randrange(max(1, n - 50))) for _ in range(reps)]
+    match = build_match_query("pengaduan air keruh")
+    return {
+        "count_all": timed_calls(db.count_dashboard, [()] * reps),
+        "page_first": timed_calls(db.query_dashboard, [(None, 50, 0)] * reps),
+        "page_deep": timed_calls(db.query_dashboard, deep),
+        "page_by_time": timed_calls(
+            lambda: db.query_dashboard(limit=50, sort="waktu_masuk"), [()] * reps
+        ),
+        "division_count": timed_calls(db.count_dashboard, [("Operasi",)] * reps),
+        "division_page": timed_calls(db.query_dashboard, [("Operasi", 50, 0)] * reps),
+        "divisions": timed_calls(db.list_assigned_divisions, [()] * reps),
+        "picker_labels": timed_calls(db.list_letter_labels, [(20, 0)] * reps),
+        "picker_search": timed_calls(
+            lambda: db.search_letters(match, limit=21, mark=("", "")), [()] * reps
+        ),
+    }
+
+
+def bench_exports(tmp: str, n: int, max_xlsx: int) -> dict:
+    out = {}
+    variants = [("csv", {}), ("csv_ocr", {"include_ocr": True}),
+                ("csv_one_year", {"date_from": "2020-01-01", "date_to": "2020-12-31"})]
+    variants += [(fmt, {}) for fmt in export.available_formats() if fmt != "csv"]
+    for name, filters in variants:
+        fmt = name.split("_")[0]
+        if fmt == "xlsx" and n > max_xlsx:
+            continue
+        path = os.path.join(tmp, f"export.{export.FORMATS[fmt]['ext']}")
+        t0 = time.perf_counter()
+        rows = export.write_export(Path(path), fmt, filters)
+        dt = time.perf_counter() - t0
+        out[name] = {
+            "rows": rows,
+            "elapsed_s": round(dt, 3),
+            "rows_per_s": round(rows / dt, 1) if dt else None,
+            "mb": round(os.path.getsize(path) / 1e6, 2),
+        }
+        os.unlink(path)
+    return out
+
+
+def bench_inserts(n_single: int, batch_size: int, n_batches: int, seed: int) -> dict:
+    rows = [{c: r[c] for c in COLUMNS if c != "nomor_internal"}
+            for r in letters(n_single + batch_size * n_batches, seed=seed + 1, start=10**8)]
+    single, batch = rows[:n_single], rows[n_single:]
+
+    samples = []
+    t0 = time.perf_counter()
+    for row in single:
+        s = time.perf_counter()
+        db.insert_letter(**row)
+        samples.append((time.perf_counter() - s) * 1000)
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(n_batches):
+        db.insert_letters_batch(batch[i * batch_size:(i + 1) * batch_size])
+    batch_s = time.perf_counter() - t0
+    return {
+        "insert_letter": {**latency(samples), "per_s": round(n_single / single_s, 1)},
+        "insert_letters_batch": {
+            "batch_size": batch_size,
+            "batches": n_batches,
+            "per_s": round(len(batch) / batch_s, 1) if batch else None,
+        },
+    }
+
+
+def bench_archive(n: int, args) -> dict:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        build = prepare_archive(tmp, n, args.seed, args.cache_dir)
+        build["db_mb"] = round(os.path.getsize(db.DB_PATH) / 1e6, 1)
+        print(f"[{n:,}] arsip siap: {build['dispositions']:,} disposisi, {build['db_mb']} MB", flush=True)
+
+        result = {"build": build}
+        result["dashboard"] = bench_dashboard(n, rng, args.reps)
+        ids = [(rng.randint(1, n),) for _ in range(args.reps * 5)]
+        result["get_dispositions_for_letter"] = timed_calls(db.get_dispositions_for_letter, ids)
+        result["export"] = bench_exports(tmp, n, args.max_xlsx_rows)
+        result.update(bench_inserts(args.inserts, args.batch_size, args.batches, args.seed))
+        db.get_pool().close_all()
+    return result
+
+
+# -------------------------------------------------
+# 3. Pipeline OCR + AI ujung-ke-ujung (stub lokal)
+# -------------------------------------------------
+def bench_pipeline(args) -> dict:
+    rng = random.Random(args.seed)
+    texts = iter([r["ocr_text"] for r in letters(args.pipeline_letters * 4, seed=args.seed)])
+    ocr_server, ocr_url = start_ocr_stub(latency=args.ocr_latency, fail_rate=args.fail_rate,
+                                         text=lambda: next(texts))
+    groq_server, groq_url = start_groq_stub(latency=args.groq_latency, fail_rate=args.fail_rate,
+                                            sec_per_token=args.sec_per_token)
+    os.environ.update(
+        OCR_BACKENDS="ocrspace", OCR_SPACE_API_KEY="stub", OCR_SPACE_URL=ocr_url,
+        OCR_BACKOFF_BASE="0.05", GROQ_API_KEY="stub", GROQ_BASE_URL=groq_url,
+        GROQ_RPM="100000", GROQ_TPM="100000000", AI_LOCAL_CLASSIFIER="0", METRICS_ENABLED="1",
+    )
+    # setelah env di atas: client OCR/Groq dibuat dari config ini
+    from utils import jobs, pipeline
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_db(os.path.join(tmp, "pipeline.db"))
+        storage.BLOB_DIR = storage.Path(tmp) / "blobs"
+        storage.DERIVED_DIR = storage.BLOB_DIR / "derived"
+        scans = [render_scan(rng, i, args.dpi)[0] for i in range(args.pipeline_letters)]
+
+        metrics.set_enabled(True)
+        pool = jobs.WorkerPool(args.workers)
+        pool.start()
+        started = time.time()
+        submitted = {}
+        for i, data in enumerate(scans):
+            t0 = time.perf_counter()
+            digest = storage.put_bytes(data, mime="image/jpeg")
+            letter_id, _ = db.insert_letter(
+                uploader="bench", division="Umum", filename=f"scan_{i}.jpg",
+                content_hash=digest, ocr_text="", status=pipeline.STATUS_PENDING,
+                timestamp=datetime.now().isoformat(timespec="seconds"),
+            )
+            pipeline.submit_letter(letter_id, str(storage.path_for(digest)), "image/jpeg", digest)
+            submitted[letter_id] = t0
+
+        # selesai = job done/failed; latency = upload sampai status Analisa Selesai terlihat
+        end_to_end = {}
+        deadline = time.perf_counter() + args.pipeline_timeout
+        while time.perf_counter() < deadline:
+            with db.get_conn() as conn:
+                done = conn.execute(
+                    "SELECT id FROM letters WHERE status = ?", (pipeline.STATUS_DONE,)
+                ).fetchall()
+                open_jobs = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status IN ('queued', 'running')",
+                    (pipeline.JOB_KIND,),
+                ).fetchone()[0]
+            now = time.perf_counter()
+            for (lid,) in done:
+                end_to_end.setdefault(lid, (now - submitted[lid]) * 1000)
+            if not open_jobs:
+                break
+            time.sleep(0.02)
+        wall = time.perf_counter() - min(submitted.values())
+        pool.stop()
+
+        stages = {
+            r["stage"]: {"n": r["count"], "errors": r["errors"],
+                         "p50_ms": round(r["p50_ms"], 1), "p95_ms": round(r["p95_ms"], 1)}
+            for r in metrics.summarize(started - 1)
+        }
+        failed = jobs.queue_stats().get("failed", 0)
+        db.get_pool().close_all()
+
+    ocr_server.shutdown()
+    groq_server.shutdown()
+    samples = list(end_to_end.values()) or [0.0]
+    return {
+        "config": {
+            "letters": args.pipeline_letters, "workers": args.workers, "dpi": args.dpi,
+            "ocr_latency": args.ocr_latency, "groq_latency": args.groq_latency,
+            "sec_per_token": args.sec_per_token, "fail_rate": args.fail_rate,
+        },
+        "completed": len(end_to_end),
+        "failed_jobs": failed,
+        "wall_s": round(wall, 2),
+        "letters_per_s": round(len(end_to_end) / wall, 2) if wall else None,
+        "end_to_end": latency(samples),
+        "stages": stages,
+        "stub_requests": {"ocr": ocr_server.stub_stats["requests"],
+                          "groq": groq_server.stub_stats["requests"]},
+    }
+
+
+# -------------------------------------------------
+# 4. Bandingkan dua hasil
+# -------------------------------------------------
+def flatten(tree, prefix=""):
+    out = {}
+    for k, v in tree.items():
+        key = f"{prefix}.{k}" if prefix else str(k)
+        if isinstance(v, dict):
+            out.update(flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def direction(key: str):
+    """+1 = makin besar makin baik, -1 = makin kecil makin baik, None = bukan metrik."""
+    last = key.rsplit(".", 1)[-1]
+    if last.endswith("per_s"):
+        return 1
+    if last.endswith("_ms") or last.endswith("_s"):
+        return -1
+    return None
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"lama: {old['meta'].get('commit')} ({old['meta'].get('created_at')})")
+    print(f"baru: {new['meta'].get('commit')} ({new['meta'].get('created_at')})\n")
+
+    a, b = flatten({k: old[k] for k in ("archives", "pipeline") if k in old}), \
+        flatten({k: new[k] for k in ("archives", "pipeline") if k in new})
+    worse = 0
+    print(f"{'metrik':<60} {'lama':>11} {'baru':>11} {'Δ':>8}")
+    for key in sorted(set(a) & set(b)):
+        sign = direction(key)
+        if sign is None or not a[key]:
+            continue
+        if key.endswith("_ms") and max(a[key], b[key]) < NOISE_FLOOR_MS:
+            continue
+        change = (b[key] - a[key]) / a[key]
+        regressed = change * sign < -threshold
+        worse += regressed
+        if abs(change) >= threshold / 2:
+            flag = "  ← lebih buruk" if regressed else ("  ← lebih baik" if change * sign > threshold else "")
+            print(f"{key:<60} {a[key]:>11.3f} {b[key]:>11.3f} {change:>+7.0%}{flag}")
+    missing = sorted(k for k in set(a) - set(b) if direction(k))
+    if missing:
+        print(f"\n{len(missing)} metrik tidak ada di hasil baru (mis. {missing[0]})")
+    print(f"\n{worse} metrik memburuk > {threshold:.0%}")
+    return 1 if worse else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--reps", type=int, default=50, help="pengulangan per query dashboard")
+    ap.add_argument("--inserts", type=int, default=500, help="jumlah insert_letter satu per satu")
+    ap.add_argument("--batch-size", type=int, default=20)
+    ap.add_argument("--batches", type=int, default=25)
+    ap.add_argument("--max-xlsx-rows", type=int, default=100_000)
+    ap.add_argument("--cache-dir", help="simpan arsip yang sudah dibangun untuk dipakai ulang")
+    ap.add_argument("--skip-archives", action="store_true")
+    ap.add_argument("--skip-pipeline", action="store_true")
+    ap.add_argument("--pipeline-letters", type=int, default=20)
+    ap.add_argument("--pipeline-timeout", type=float, default=300)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("TIRTAFLOW_WORKERS", "3")))
+    ap.add_argument("--dpi", type=int, default=150)
+    ap.add_argument("--ocr-latency", type=float, default=0.3)
+    ap.add_argument("--groq-latency", type=float, default=0.5)
+    ap.add_argument("--sec-per-token", type=float, default=0.005)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--out", help="file JSON hasil (default bench/results/<commit>-<waktu>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("LAMA", "BARU"))
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    result = {"meta": {**meta(), "args": vars(args)}, "archives": {}}
+    if not args.skip_archives:
+        for n in args.sizes:
+            result["archives"][str(n)] = bench_archive(n, args)
+    if not args.skip_pipeline:
+        print("pipeline OCR + AI (stub lokal)…", flush=True)
+        result["pipeline"] = bench_pipeline(args)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{result['meta']['commit'] or 'nocommit'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    for n, r in result["archives"].items():
+        dash = r["dashboard"]
+        print(f"\n[{int(n):,} surat]")
+        print(f"  insert_letter        {r['insert_letter']['per_s']:>9.1f}/dtk  p95 {r['insert_letter']['p95_ms']:.2f} ms")
+        print(f"  insert_letters_batch {r['insert_letters_batch']['per_s']:>9.1f}/dtk")
+        for name, s in dash.items():
+            print(f"  {name:<20} p50 {s['p50_ms']:>8.2f} ms  p95 {s['p95_ms']:>8.2f} ms")
+        disp = r["get_dispositions_for_letter"]
+        print(f"  {'disposisi/surat':<20} p50 {disp['p50_ms']:>8.2f} ms  p95 {disp['p95_ms']:>8.2f} ms")
+        for name, e in r["export"].items():
+            print(f"  ekspor {name:<13} {e['elapsed_s']:>8.2f} dtk  {e['rows']:,} baris  {e['mb']} MB")
+    if "pipeline" in result:
+        p = result["pipeline"]
+        print(f"\n[pipeline] {p['completed']}/{p['config']['letters']} surat selesai dalam {p['wall_s']} dtk "
+              f"({p['letters_per_s']}/dtk), ujung-ke-ujung p50 {p['end_to_end']['p50_ms'] / 1000:.2f} dtk "
+              f"p95 {p['end_to_end']['p95_ms'] / 1000:.2f} dtk, job gagal {p['failed_jobs']}")
+        for stage, s in p["stages"].items():
+            print(f"  {stage:<22} n={s['n']:<4} p50 {s['p50_ms']:>8.1f} ms  p95 {s['p95_ms']:>8.1f} ms")
+    print(f"\nhasil: {out}")
+
+
+if __name__ == "__main__":
+    main()
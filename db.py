@@ -1,79 +1,744 @@
 import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 DB_DIR = "data"
 DB_PATH = f"{DB_DIR}/tirtaflow.db"
 
+# Ukuran pool per proses (bisa di-override lewat environment)
+POOL_SIZE = int(os.getenv("TIRTAFLOW_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = int(os.getenv("TIRTAFLOW_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# PRAGMA per koneksi. journal_mode=WAL bersifat persisten di file DB,
+# sisanya harus diset ulang setiap kali koneksi baru dibuka.
+CONN_PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -16000;",      # ~16 MB page cache
+    "PRAGMA mmap_size = 134217728;",    # 128 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY;",
+)
+
 
 # -------------------------------------------------
-# 0. Helper: open SQLite connection safely
+# 0. Helper: connection pool SQLite (per proses)
 # -------------------------------------------------
-def get_conn():
-    """Buka koneksi SQLite dengan foreign key diaktifkan."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON;")
+def _open_conn(path: str) -> sqlite3.Connection:
+    """Buka koneksi SQLite baru dengan WAL + PRAGMA yang sudah di-tuning."""
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # dipakai bergantian oleh thread session Streamlit
+    )
+    conn.execute("PRAGMA journal_mode = WAL;")
+    for pragma in CONN_PRAGMAS:
+        conn.execute(pragma)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+class PoolExhaustedError(sqlite3.OperationalError):
+    """Semua koneksi pool dipinjam lebih lama dari BUSY_TIMEOUT_MS (setara 'database is locked')."""
+
+
+class ConnectionPool:
+    """
+    Pool koneksi SQLite thread-safe.
+
+    Koneksi dipinjam lewat `connection()` lalu dikembalikan ke pool,
+    jadi rerun Streamlit tidak perlu connect + set PRAGMA setiap kali.
+    Satu koneksi hanya dipakai oleh satu thread dalam satu waktu.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _open_conn(self.path)
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        # pool penuh → tunggu koneksi dikembalikan thread lain
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise PoolExhaustedError(
+                f"connection pool exhausted ({self.size} koneksi dipakai semua)"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    def discard(self, conn: sqlite3.Connection):
+        """Buang koneksi rusak; slot-nya boleh dipakai koneksi baru."""
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """Pinjam koneksi; commit kalau sukses, rollback kalau error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if _is_broken(conn):
+                self.discard(conn)
+            else:
+                self.release(conn)
+            raise
+        self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+
+def _is_broken(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1")
+        return False
+    except sqlite3.Error:
+        return True
+
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool milik proses ini (dibuat ulang kalau DB_PATH berubah / setelah fork)."""
+    global _pool, _pool_key
+    key = (os.getpid(), DB_PATH)
+    if _pool_key != key:
+        with _pool_lock:
+            if _pool_key != key:
+                _pool = ConnectionPool(DB_PATH)
+                _pool_key = key
+    return _pool
+
+
+def get_conn():
+    """
+    Pinjam koneksi SQLite dari pool (foreign key + WAL aktif).
+
+    Pakai sebagai context manager:
+        with get_conn() as conn:
+            conn.execute(...)
+    """
+    return get_pool().connection()
+
+
 # -------------------------------------------------
-# 1. INIT DB (dipanggil 1x di app.py)
+# 1. MIGRASI SKEMA (PRAGMA user_version)
 # -------------------------------------------------
+def _backfill_letter_sequences(conn):
+    """Isi counter dari arsip lama: max(jumlah surat, nomor urut terbesar) per bulan."""
+    rows = conn.execute(
+        """
+        SELECT substr(timestamp, 1, 7) AS ym, COUNT(*) AS n
+        FROM letters
+        WHERE timestamp IS NOT NULL
+        GROUP BY ym
+        """
+    ).fetchall()
+    seqs = {}
+    for r in rows:
+        period = (r["ym"] or "").replace("-", "/")
+        if len(period) == 7:
+            seqs[period] = r["n"]
+
+    for r in conn.execute(
+        "SELECT nomor_internal FROM letters WHERE nomor_internal LIKE '____/__/%'"
+    ):
+        period, _, tail = r["nomor_internal"].rpartition("/")
+        if tail.isdigit():
+            seqs[period] = max(seqs.get(period, 0), int(tail))
+
+    conn.executemany(
+        """
+        INSERT INTO letter_sequences (period, last_seq) VALUES (?, ?)
+        ON CONFLICT(period) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)
+        """,
+        seqs.items(),
+    )
+
+
+def _dedupe_nomor_internal(conn):
+    """Nomor kembar dari race lama diberi akhiran -<id> supaya UNIQUE bisa dipasang."""
+    conn.execute(
+        """
+        UPDATE letters
+        SET nomor_internal = nomor_internal || '-' || id
+        WHERE nomor_internal IS NOT NULL
+          AND id NOT IN (
+              SELECT MIN(id) FROM letters
+              WHERE nomor_internal IS NOT NULL
+              GROUP BY nomor_internal
+          )
+        """
+    )
+
+
+# disposisi terakhir sebuah surat (urutan sama dengan riwayat: created_at, lalu id)
+_LATEST_ASSIGNMENT_SQL = """
+    SELECT d.to_role, d.to_division, d.created_at
+    FROM dispositions d
+    WHERE d.letter_id = letters.id
+    ORDER BY d.created_at DESC, d.id DESC
+    LIMIT 1
+"""
+
+
+def _recompute_assignment_trigger(name: str, event: str, ref: str) -> str:
+    """Trigger yang menghitung ulang assignment surat `ref`.letter_id (dipakai saat DELETE/UPDATE)."""
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS {name}
+        AFTER {event} ON dispositions
+        BEGIN
+            UPDATE letters
+            SET (assigned_role, assigned_division, assigned_at) = ({_LATEST_ASSIGNMENT_SQL})
+            WHERE id = {ref}.letter_id;
+        END
+    """
+
+
+# kolom letters yang diindeks full-text (urutan = urutan kolom letters_fts)
+FTS_COLUMNS = ("nomor_internal", "ai_nomor_pengirim", "ai_maksud", "ocr_text")
+
+
+def _fts_row(ref: str) -> str:
+    return ", ".join(f"{ref}.{c}" for c in FTS_COLUMNS)
+
+
+# counter yang naik setiap kali isi letters/dispositions berubah (lihat
+# data_version) — cache data halaman Streamlit memakai nilainya sebagai kunci
+DATA_VERSION_COUNTER = "data_version"
+_BUMP_DATA_VERSION_SQL = (
+    "INSERT INTO counters (name, value) VALUES ('data_version', 1) "
+    "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+)
+
+
+# Setiap entri: (versi, deskripsi, langkah). Langkah boleh berupa string SQL
+# atau fungsi f(conn) untuk backfill data. Versi hanya boleh bertambah —
+# jangan ubah migrasi yang sudah pernah jalan di produksi, tambah yang baru.
+MIGRATIONS = [
+    (
+        1,
+        "index disposisi per surat/divisi + index waktu surat",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_dispositions_letter_created "
+            "ON dispositions(letter_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_dispositions_division_letter "
+            "ON dispositions(to_division, letter_id)",
+            "CREATE INDEX IF NOT EXISTS idx_letters_timestamp "
+            "ON letters(timestamp)",
+        ],
+    ),
+    (
+        2,
+        "counter nomor_internal per bulan + UNIQUE nomor_internal",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS letter_sequences (
+                period TEXT PRIMARY KEY,      -- 'YYYY/MM'
+                last_seq INTEGER NOT NULL
+            )
+            """,
+            _backfill_letter_sequences,
+            _dedupe_nomor_internal,
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_letters_nomor_internal "
+            "ON letters(nomor_internal)",
+        ],
+    ),
+    (
+        3,
+        "antrian job background (OCR → AI, dsb.)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                letter_id INTEGER,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'queued',  -- queued|running|done|failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_after REAL NOT NULL,                -- epoch detik
+                locked_by TEXT,
+                locked_at REAL,
+                last_error TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                FOREIGN KEY(letter_id) REFERENCES letters(id) ON DELETE CASCADE
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after "
+            "ON jobs(status, run_after)",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_letter "
+            "ON jobs(letter_id)",
+        ],
+    ),
+    (
+        4,
+        "cache hasil OCR/AI per hash isi file + counter hit/miss",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                content_hash TEXT PRIMARY KEY,          -- sha256 isi file
+                ocr_text TEXT,
+                ai_nomor_pengirim TEXT,
+                ai_maksud TEXT,
+                ai_rekomendasi TEXT,
+                has_ai INTEGER NOT NULL DEFAULT 0,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,               -- epoch detik
+                last_used_at REAL NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used "
+            "ON analysis_cache(last_used_at)",
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+        ],
+    ),
+    (
+        5,
+        "blob store content-addressed (utils/storage.py) + letters.content_hash",
+        [
+            "ALTER TABLE letters ADD COLUMN content_hash TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_letters_content_hash "
+            "ON letters(content_hash)",
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,          -- sha256 isi file
+                size_bytes INTEGER NOT NULL,
+                mime TEXT,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT
+            )
+            """,
+            # surat dihapus → referensi ke blob ikut berkurang (file dibuang oleh storage.gc)
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_letters_release_blob
+            AFTER DELETE ON letters
+            WHEN OLD.content_hash IS NOT NULL
+            BEGIN
+                UPDATE blobs SET refcount = refcount - 1
+                WHERE content_hash = OLD.content_hash;
+            END
+            """,
+        ],
+    ),
+    (
+        6,
+        "cache respons LLM per (model, hash prompt)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,             -- sha256(model + messages)
+                model TEXT NOT NULL,
+                result TEXT NOT NULL,                   -- JSON hasil yang sudah dinormalisasi
+                created_at REAL NOT NULL
+            )
+            """,
+        ],
+    ),
+    (
+        7,
+        "assignment terkini (disposisi terakhir) disimpan di letters",
+        [
+            "ALTER TABLE letters ADD COLUMN assigned_role TEXT",
+            "ALTER TABLE letters ADD COLUMN assigned_division TEXT",
+            "ALTER TABLE letters ADD COLUMN assigned_at TEXT",
+            f"""
+            UPDATE letters
+            SET (assigned_role, assigned_division, assigned_at) = ({_LATEST_ASSIGNMENT_SQL})
+            WHERE id IN (SELECT letter_id FROM dispositions)
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_letters_assigned_division "
+            "ON letters(assigned_division, id)",
+            # disposisi baru ikut transaksi INSERT-nya → assignment tidak pernah basi
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_dispositions_assign
+            AFTER INSERT ON dispositions
+            BEGIN
+                UPDATE letters
+                SET assigned_role = NEW.to_role,
+                    assigned_division = NEW.to_division,
+                    assigned_at = NEW.created_at
+                WHERE id = NEW.letter_id
+                  AND (assigned_at IS NULL OR assigned_at <= NEW.created_at);
+            END
+            """,
+            _recompute_assignment_trigger("trg_dispositions_unassign", "DELETE", "OLD"),
+            _recompute_assignment_trigger("trg_dispositions_reassign_old", "UPDATE", "OLD"),
+            _recompute_assignment_trigger("trg_dispositions_reassign_new", "UPDATE", "NEW"),
+        ],
+    ),
+    (
+        8,
+        "full-text search (FTS5) atas nomor, hasil AI & teks OCR",
+        [
+            # external content: teks tidak disalin, FTS hanya menyimpan index.
+            # unicode61 + remove_diacritics: huruf besar/kecil & aksen diseragamkan;
+            # imbuhan Bahasa Indonesia ditangani di sisi query (utils/search.py).
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS letters_fts USING fts5(
+                {", ".join(FTS_COLUMNS)},
+                content='letters',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """,
+            # bobot bm25 per kolom: nomor > maksud AI > isi OCR
+            "INSERT INTO letters_fts(letters_fts, rank) "
+            "VALUES('rank', 'bm25(10.0, 10.0, 4.0, 1.0)')",
+            "INSERT INTO letters_fts(letters_fts) VALUES('rebuild')",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_letters_fts_insert
+            AFTER INSERT ON letters
+            BEGIN
+                INSERT INTO letters_fts(rowid, {", ".join(FTS_COLUMNS)})
+                VALUES (NEW.id, {_fts_row("NEW")});
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_letters_fts_delete
+            AFTER DELETE ON letters
+            BEGIN
+                INSERT INTO letters_fts(letters_fts, rowid, {", ".join(FTS_COLUMNS)})
+                VALUES ('delete', OLD.id, {_fts_row("OLD")});
+            END
+            """,
+            # hanya kalau kolom yang diindeks berubah (update status dsb. tidak re-index)
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_letters_fts_update
+            AFTER UPDATE OF {", ".join(FTS_COLUMNS)} ON letters
+            BEGIN
+                INSERT INTO letters_fts(letters_fts, rowid, {", ".join(FTS_COLUMNS)})
+                VALUES ('delete', OLD.id, {_fts_row("OLD")});
+                INSERT INTO letters_fts(rowid, {", ".join(FTS_COLUMNS)})
+                VALUES (NEW.id, {_fts_row("NEW")});
+            END
+            """,
+        ],
+    ),
+    (
+        9,
+        "index MinHash/LSH surat hampir sama (utils/dedup.py)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS minhash_signatures (
+                letter_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,                -- NUM_PERM × uint32 little-endian
+                created_at REAL NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS minhash_buckets (
+                bucket INTEGER NOT NULL,                -- hash (band, baris band)
+                letter_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, letter_id)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS letter_duplicates (
+                letter_id INTEGER NOT NULL,             -- surat yang lebih baru
+                duplicate_of INTEGER NOT NULL,          -- surat lama yang mirip
+                similarity REAL NOT NULL,               -- estimasi Jaccard
+                created_at TEXT,
+                PRIMARY KEY (letter_id, duplicate_of)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_letter_duplicates_of "
+            "ON letter_duplicates(duplicate_of)",
+            # bucket tidak dihapus di sini (tidak ber-index letter_id); kandidat
+            # selalu di-join ke minhash_signatures jadi bucket yatim diabaikan
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_letters_forget_minhash
+            AFTER DELETE ON letters
+            BEGIN
+                DELETE FROM minhash_signatures WHERE letter_id = OLD.id;
+                DELETE FROM letter_duplicates
+                WHERE letter_id = OLD.id OR duplicate_of = OLD.id;
+            END
+            """,
+        ],
+    ),
+    (
+        10,
+        "riwayat ekspor data surat (utils/export.py)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS exports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER,
+                fmt TEXT NOT NULL,                      -- csv|parquet|xlsx
+                filters TEXT NOT NULL DEFAULT '{}',     -- JSON
+                status TEXT NOT NULL DEFAULT 'queued',  -- queued|running|done|failed
+                path TEXT,
+                rows INTEGER,
+                size_bytes INTEGER,
+                error TEXT,
+                created_by TEXT,
+                created_at TEXT,
+                finished_at TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_exports_created_by "
+            "ON exports(created_by, id)",
+        ],
+    ),
+    (
+        11,
+        "pemakaian token analisa AI per surat",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS ai_usage (
+                letter_id INTEGER PRIMARY KEY,
+                mode TEXT NOT NULL,                     -- single|map_reduce
+                chunks INTEGER NOT NULL DEFAULT 1,
+                skipped_chunks INTEGER NOT NULL DEFAULT 0,
+                calls INTEGER NOT NULL DEFAULT 0,       -- request ke LLM (tanpa cache hit)
+                cached_calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                single_prompt_tokens INTEGER,           -- perkiraan kalau teks dikirim utuh
+                model TEXT,
+                created_at TEXT
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_letters_forget_ai_usage
+            AFTER DELETE ON letters
+            BEGIN
+                DELETE FROM ai_usage WHERE letter_id = OLD.id;
+            END
+            """,
+        ],
+    ),
+    (
+        12,
+        "counter data_version dinaikkan trigger tiap perubahan surat/disposisi",
+        [
+            *(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_data_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    {_BUMP_DATA_VERSION_SQL};
+                END
+                """
+                for table, events in (("letters", ("INSERT", "UPDATE", "DELETE")),
+                                      ("dispositions", ("INSERT", "DELETE")))
+                for event in events
+            ),
+            _BUMP_DATA_VERSION_SQL,
+        ],
+    ),
+    (
+        13,
+        "durasi per tahap pipeline (utils/metrics.py)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS stage_timings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                letter_id INTEGER,                      -- NULL = bukan milik satu surat
+                stage TEXT NOT NULL,                    -- preprocess|ocr|ai|api.groq|...
+                started_at REAL NOT NULL,               -- epoch detik
+                ms REAL NOT NULL,
+                ok INTEGER NOT NULL DEFAULT 1,
+                error TEXT                              -- nama exception kalau ok = 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_stage_timings_started "
+            "ON stage_timings(started_at)",
+            "CREATE INDEX IF NOT EXISTS idx_stage_timings_letter "
+            "ON stage_timings(letter_id) WHERE letter_id IS NOT NULL",
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_letters_forget_stage_timings
+            AFTER DELETE ON letters
+            BEGIN
+                DELETE FROM stage_timings WHERE letter_id = OLD.id;
+            END
+            """,
+        ],
+    ),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Naikkan skema ke SCHEMA_VERSION, satu migrasi per transaksi.
+
+    Pakai BEGIN IMMEDIATE supaya hanya satu proses yang migrasi; proses lain
+    menunggu (busy_timeout) lalu melihat user_version sudah naik dan skip.
+    Pembaca tetap jalan selama migrasi karena DB memakai WAL.
+    """
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # cek ulang setelah dapat write lock
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+
+    if applied:
+        conn.execute("PRAGMA optimize")
+    return applied
+
+
+# -------------------------------------------------
+# 2. INIT DB (dipanggil 1x di app.py)
+# -------------------------------------------------
+_initialized = set()
+
+
 def init_db():
-    """Buat folder data + tabel jika belum ada."""
+    """Buat folder data + tabel jika belum ada, lalu jalankan migrasi."""
+
+    # app.py memanggil ini di setiap rerun → cukup sekali per proses
+    if DB_PATH in _initialized:
+        return
 
     # Pastikan folder ada
     os.makedirs(DB_DIR, exist_ok=True)
 
-    conn = get_conn()
-    c = conn.cursor()
+    with get_conn() as conn:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            _initialized.add(DB_PATH)
+            return
 
-    # === TABEL SURAT ===
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS letters (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nomor_internal TEXT,
-            uploader TEXT,
-            division TEXT,
-            status TEXT,
-            ai_nomor_pengirim TEXT,
-            ai_maksud TEXT,
-            ai_rekomendasi TEXT,
-            timestamp TEXT,
-            filename TEXT,
-            ocr_text TEXT
+        c = conn.cursor()
+
+        # === TABEL SURAT ===
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS letters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nomor_internal TEXT,
+                uploader TEXT,
+                division TEXT,
+                status TEXT,
+                ai_nomor_pengirim TEXT,
+                ai_maksud TEXT,
+                ai_rekomendasi TEXT,
+                timestamp TEXT,
+                filename TEXT,
+                ocr_text TEXT
+            )
+            """
         )
-        """
-    )
 
-    # === TABEL DISPOSISI ===
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS dispositions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            letter_id INTEGER NOT NULL,
-            from_role TEXT,
-            from_division TEXT,
-            to_role TEXT,
-            to_division TEXT,
-            note TEXT,
-            created_by TEXT,
-            created_at TEXT,
-            FOREIGN KEY(letter_id) REFERENCES letters(id) ON DELETE CASCADE
+        # === TABEL DISPOSISI ===
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dispositions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                letter_id INTEGER NOT NULL,
+                from_role TEXT,
+                from_division TEXT,
+                to_role TEXT,
+                to_division TEXT,
+                note TEXT,
+                created_by TEXT,
+                created_at TEXT,
+                FOREIGN KEY(letter_id) REFERENCES letters(id) ON DELETE CASCADE
+            )
+            """
         )
-        """
-    )
+        conn.commit()
 
-    conn.commit()
-    conn.close()
+        migrate(conn)
+
+    _initialized.add(DB_PATH)
 
 
 # -------------------------------------------------
-# 2. INSERT SURAT MASUK
+# 3. INSERT SURAT MASUK
 # -------------------------------------------------
-def insert_letter(
+def _next_nomor_internal(c, now: datetime) -> str:
+    """
+    Ambil nomor urut berikutnya dari counter bulanan (O(1), tanpa COUNT(*)).
+
+    Harus dipanggil di transaksi yang sama dengan INSERT surat: UPSERT ini
+    langsung memegang write lock, jadi dua upload bersamaan tidak bisa
+    mendapat nomor yang sama, dan nomor ikut di-rollback kalau INSERT gagal.
+    """
+    period = f"{now.year}/{now.month:02d}"
+    c.execute(
+        """
+        INSERT INTO letter_sequences (period, last_seq) VALUES (?, 1)
+        ON CONFLICT(period) DO UPDATE SET last_seq = last_seq + 1
+        """,
+        (period,),
+    )
+    seq = c.execute(
+        "SELECT last_seq FROM letter_sequences WHERE period = ?", (period,)
+    ).fetchone()[0]
+    return f"{period}/{seq:03d}"
+
+
+def _insert_letter_row(
+    c,
     nomor_internal=None,
     uploader=None,
     division=None,
@@ -85,14 +750,9 @@ def insert_letter(
     filename=None,
     ocr_text=None,
     file_path=None,
+    content_hash=None,
 ):
-    """
-    Simpan 1 surat ke tabel letters.
-    Menghasilkan (letter_id, nomor_internal).
-    """
-
-    conn = get_conn()
-    c = conn.cursor()
+    """INSERT satu surat memakai cursor c (transaksi diatur pemanggil)."""
 
     # waktu sekarang
     if not timestamp:
@@ -104,25 +764,14 @@ def insert_letter(
         except Exception:
             now = datetime.now()
 
-    # auto generate nomor_internal
-    if not nomor_internal:
-        year = now.year
-        month = now.month
-        prefix = f"{year}-{month:02d}"
-
-        # Hitung surat di bulan yang sama
-        c.execute(
-            "SELECT COUNT(*) FROM letters WHERE substr(timestamp, 1, 7) = ?",
-            (prefix,),
-        )
-        seq = c.fetchone()[0] + 1
-
-        nomor_internal = f"{year}/{month:02d}/{seq:03d}"
-
     # kalau filename tidak diberikan tapi ada file_path
     if not filename and file_path:
         filename = os.path.basename(file_path)
 
+    # auto generate nomor_internal
+    if not nomor_internal:
+        nomor_internal = _next_nomor_internal(c, now)
+
     c.execute(
         """
         INSERT INTO letters (
@@ -135,8 +784,9 @@ def insert_letter(
             ai_rekomendasi,
             timestamp,
             filename,
-            ocr_text
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ocr_text,
+            content_hash
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             nomor_internal,
@@ -149,18 +799,97 @@ def insert_letter(
             timestamp,
             filename,
             ocr_text,
+            content_hash,
         ),
     )
 
-    letter_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    return c.lastrowid, nomor_internal
+
+
+def insert_letter(
+    nomor_internal=None,
+    uploader=None,
+    division=None,
+    status=None,
+    ai_nomor_pengirim=None,
+    ai_maksud=None,
+    ai_rekomendasi=None,
+    timestamp=None,
+    filename=None,
+    ocr_text=None,
+    file_path=None,
+    content_hash=None,
+):
+    """
+    Simpan 1 surat ke tabel letters.
+    Menghasilkan (letter_id, nomor_internal).
+    content_hash = hash blob file asli di utils/storage.py (kalau ada).
+    """
+    with get_conn() as conn:
+        result = _insert_letter_row(
+            conn.cursor(),
+            nomor_internal=nomor_internal,
+            uploader=uploader,
+            division=division,
+            status=status,
+            ai_nomor_pengirim=ai_nomor_pengirim,
+            ai_maksud=ai_maksud,
+            ai_rekomendasi=ai_rekomendasi,
+            timestamp=timestamp,
+            filename=filename,
+            ocr_text=ocr_text,
+            file_path=file_path,
+            content_hash=content_hash,
+        )
+    _data_changed()
+    return result
+
+
+def insert_letters_batch(rows):
+    """
+    Simpan banyak surat dalam SATU transaksi (upload batch).
+    rows: list of dict dengan key yang sama seperti insert_letter.
+    Menghasilkan list (letter_id, nomor_internal) sesuai urutan rows;
+    kalau satu gagal, semuanya di-rollback.
+    """
+    with get_conn() as conn:
+        c = conn.cursor()
+        result = [_insert_letter_row(c, **row) for row in rows]
+    _data_changed()
+    return result
+
 
-    return letter_id, nomor_internal
+# Kolom letters yang boleh diubah lewat update_letter (mis. oleh worker OCR/AI)
+UPDATABLE_LETTER_COLS = (
+    "status",
+    "ai_nomor_pengirim",
+    "ai_maksud",
+    "ai_rekomendasi",
+    "filename",
+    "ocr_text",
+    "content_hash",
+)
+
+
+def update_letter(letter_id: int, **fields):
+    """Update sebagian kolom satu surat (hanya kolom di UPDATABLE_LETTER_COLS)."""
+    unknown = set(fields) - set(UPDATABLE_LETTER_COLS)
+    if unknown:
+        raise ValueError(f"Kolom tidak boleh diupdate: {', '.join(sorted(unknown))}")
+    if not fields:
+        return
+
+    assignments = ", ".join(f"{col} = ?" for col in fields)
+    with get_conn() as conn:
+        conn.execute(
+            f"UPDATE letters SET {assignments} WHERE id = ?",
+            (*fields.values(), letter_id),
+        )
+    _data_changed()
 
 
 # -------------------------------------------------
-# 3. INSERT DISPOSISI
+# 4. INSERT DISPOSISI
 # -------------------------------------------------
 def add_disposition(
     letter_id: int,
@@ -171,72 +900,436 @@ def add_disposition(
     note: str,
     created_by: str,
 ):
-    """Simpan satu record disposisi."""
-
-    conn = get_conn()
-    c = conn.cursor()
-
-    c.execute(
-        """
-        INSERT INTO dispositions (
-            letter_id,
-            from_role,
-            from_division,
-            to_role,
-            to_division,
-            note,
-            created_by,
-            created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            letter_id,
-            from_role,
-            from_division,
-            to_role,
-            to_division,
-            note,
-            created_by,
-            datetime.now().isoformat(timespec="seconds"),
-        ),
-    )
+    """Simpan satu record disposisi (letters.assigned_* ikut diupdate oleh trigger)."""
 
-    conn.commit()
-    conn.close()
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO dispositions (
+                letter_id,
+                from_role,
+                from_division,
+                to_role,
+                to_division,
+                note,
+                created_by,
+                created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                letter_id,
+                from_role,
+                from_division,
+                to_role,
+                to_division,
+                note,
+                created_by,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+    _data_changed()
 
 
 # -------------------------------------------------
-# 4. GET SURAT DETAIL
+# 5. GET SURAT DETAIL
 # -------------------------------------------------
 def get_letter_by_id(letter_id: int):
     """Ambil satu surat berdasarkan ID dari tabel letters."""
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("SELECT * FROM letters WHERE id = ?", (letter_id,))
-    row = c.fetchone()
-    conn.close()
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT * FROM letters WHERE id = ?", (letter_id,)
+        ).fetchone()
     return dict(row) if row else None
 
 
 # -------------------------------------------------
-# 5. GET RIWAYAT DISPOSISI
+# 6. GET RIWAYAT DISPOSISI
 # -------------------------------------------------
 def get_dispositions_for_letter(letter_id: int):
     """Ambil seluruh riwayat disposisi untuk satu surat."""
-    conn = get_conn()
-    c = conn.cursor()
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT *
+            FROM dispositions
+            WHERE letter_id = ?
+            ORDER BY created_at ASC
+            """,
+            (letter_id,),
+        ).fetchall()
+
+    return [dict(r) for r in rows]
+
+
+# -------------------------------------------------
+# 7. COUNTER SEDERHANA (hit/miss cache, dsb.)
+# -------------------------------------------------
+def bump_counter(name: str, n: int = 1, conn=None):
+    """Tambah nilai counter bernama (dibuat otomatis kalau belum ada)."""
+    sql = """
+        INSERT INTO counters (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+    """
+    if conn is not None:
+        conn.execute(sql, (name, n))
+        return
+    with get_conn() as conn:
+        conn.execute(sql, (name, n))
+
+
+def get_counters(prefix: str = ""):
+    """Ambil semua counter yang namanya diawali prefix → dict."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT name, value FROM counters WHERE name LIKE ? ORDER BY name",
+            (prefix + "%",),
+        ).fetchall()
+    return {r["name"]: r["value"] for r in rows}
+
+
+# Nilai data_version diingat per proses. Penulisan lewat fungsi di modul ini
+# langsung menandainya basi; penulisan dari proses lain (skrip, worker terpisah)
+# terlihat paling lambat DATA_VERSION_TTL detik kemudian. Rerun Streamlit tanpa
+# perubahan data tidak menyentuh SQLite sama sekali.
+DATA_VERSION_TTL = float(os.getenv("TIRTAFLOW_DATA_VERSION_TTL", "30"))
+_data_version = {"value": None, "checked_at": 0.0}
+_data_version_lock = threading.Lock()
+
+
+def _data_changed():
+    with _data_version_lock:
+        _data_version["value"] = None
+
+
+def data_version() -> int:
+    """Versi data surat/disposisi (counter data_version, dinaikkan trigger migrasi 12)."""
+    now = time.monotonic()
+    with _data_version_lock:
+        if _data_version["value"] is not None and now - _data_version["checked_at"] < DATA_VERSION_TTL:
+            return _data_version["value"]
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT value FROM counters WHERE name = ?", (DATA_VERSION_COUNTER,)
+        ).fetchone()
+    value = row[0] if row else 0
+    with _data_version_lock:
+        _data_version.update(value=value, checked_at=now)
+    return value
+
+
+# -------------------------------------------------
+# 8. QUERY DASHBOARD (filter + sort + paginasi di SQL)
+# -------------------------------------------------
+DASHBOARD_COLUMNS = [
+    "id",
+    "nomor_internal",
+    "uploader",
+    "division",
+    "status",
+    "ai_nomor_pengirim",
+    "ai_maksud",
+    "ai_rekomendasi",
+    "assigned_role",
+    "assigned_division",
+    "timestamp",
+    "filename",
+]
+
+# nama sort → ORDER BY (whitelist, jangan pernah tempel input user ke SQL)
+DASHBOARD_SORTS = {
+    "terbaru": "l.id DESC",
+    "terlama": "l.id ASC",
+    "waktu_masuk": "l.timestamp DESC, l.id DESC",
+}
 
-    c.execute(
-        """
-        SELECT *
-        FROM dispositions
-        WHERE letter_id = ?
-        ORDER BY created_at ASC
-        """,
-        (letter_id,),
-    )
 
-    rows = c.fetchall()
-    conn.close()
+def _dashboard_where(assigned_division):
+    """assigned_division=None → semua surat; selain itu hanya yang disposisi terakhirnya ke divisi tsb."""
+    if assigned_division is None:
+        return "", ()
+    # kolom assignment dirawat trigger (migrasi 7) → satu lookup
+    # idx_letters_assigned_division
+    return "WHERE l.assigned_division = ?", (assigned_division,)
 
+
+def query_dashboard(assigned_division=None, limit: int = 50, offset: int = 0,
+                    sort: str = "terbaru"):
+    """Satu halaman tabel dashboard (hanya DASHBOARD_COLUMNS, tanpa ocr_text) → list of dict."""
+    if sort not in DASHBOARD_SORTS:
+        raise ValueError(f"Sort tidak dikenal: {sort}")
+    where, params = _dashboard_where(assigned_division)
+
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT l.id, l.nomor_internal, l.uploader, l.division, l.status,
+                   l.ai_nomor_pengirim, l.ai_maksud, l.ai_rekomendasi,
+                   l.assigned_role, l.assigned_division,
+                   l.timestamp, l.filename
+            FROM letters l
+            {where}
+            ORDER BY {DASHBOARD_SORTS[sort]}
+            LIMIT ? OFFSET ?
+            """,
+            (*params, int(limit), int(offset)),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def count_dashboard(assigned_division=None) -> int:
+    """Jumlah total baris dashboard untuk filter yang sama (untuk paginasi)."""
+    if assigned_division is None:
+        with get_conn() as conn:
+            return conn.execute("SELECT COUNT(*) FROM letters").fetchone()[0]
+
+    where, params = _dashboard_where(assigned_division)
+    with get_conn() as conn:
+        return conn.execute(
+            f"SELECT COUNT(*) FROM letters l {where}",
+            params,
+        ).fetchone()[0]
+
+
+def list_assigned_divisions():
+    """Divisi yang pernah menjadi tujuan disposisi terakhir (lewat idx_letters_assigned_division)."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT assigned_division FROM letters "
+            "WHERE assigned_division IS NOT NULL ORDER BY assigned_division"
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def list_letter_labels(limit: int = 20, offset: int = 0):
+    """id, nomor_internal, ai_maksud satu halaman surat terbaru (pilihan disposisi) — tanpa kolom besar."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, nomor_internal, ai_maksud FROM letters ORDER BY id DESC LIMIT ? OFFSET ?",
+            (int(limit), int(offset)),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+# -------------------------------------------------
+# 9. FULL-TEXT SEARCH (FTS5)
+# -------------------------------------------------
+# Query yang sangat umum (mis. "air" di arsip PDAM) bisa cocok dengan puluhan
+# ribu surat; menghitung bm25 untuk semuanya >100 ms. Yang diranking cukup
+# SEARCH_RANK_WINDOW kecocokan terbaru — batasnya dicari lewat urutan rowid
+# yang murah, lalu dipakai sebagai constraint rowid ke FTS5. Halaman Cari
+# memberi tahu kalau hasil terpotong (count_search_matches) dan bisa minta
+# ranking atas semua kecocokan (rank_window=None).
+SEARCH_RANK_WINDOW = 2000
+# sama dengan konfigurasi 'rank' di migrasi 8; dipakai eksplisit supaya bm25
+# hanya dihitung untuk baris yang lolos filter divisi
+SEARCH_BM25 = "bm25(letters_fts, 10.0, 10.0, 4.0, 1.0)"
+
+
+def _search_where(match: str, assigned_division):
+    where = "WHERE letters_fts MATCH ?"
+    params = [match]
+    if assigned_division is not None:
+        where += " AND l.assigned_division = ?"
+        params.append(assigned_division)
+    return where, params
+
+
+def count_search_matches(match: str, assigned_division=None, cap: int = None) -> int:
+    """Jumlah surat yang cocok; dengan `cap`, berhenti menghitung di cap (cukup untuk 'lebih dari N')."""
+    where, params = _search_where(match, assigned_division)
+    limit = "LIMIT ?" if cap is not None else ""
+    with get_conn() as conn:
+        return conn.execute(
+            f"""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM letters_fts
+                JOIN letters l ON l.id = letters_fts.rowid
+                {where}
+                {limit}
+            )
+            """,
+            (*params, cap) if cap is not None else params,
+        ).fetchone()[0]
+
+
+def search_letters(match: str, assigned_division=None, limit: int = 20, offset: int = 0,
+                   mark=("[[", "]]"), rank_window: int = SEARCH_RANK_WINDOW):
+    """
+    Cari surat lewat letters_fts. `match` = ekspresi MATCH FTS5 yang sudah
+    dibangun (lihat utils.search.build_match_query). Hasil terurut bm25,
+    dengan potongan teks OCR & maksud AI yang kata kuncinya diapit `mark`.
+    Yang diranking hanya `rank_window` kecocokan terbaru; None = semua.
+    """
+    where, params = _search_where(match, assigned_division)
+
+    with get_conn() as conn:
+        cutoff = None
+        if rank_window is not None:
+            cutoff = conn.execute(
+                f"""
+                SELECT letters_fts.rowid FROM letters_fts
+                JOIN letters l ON l.id = letters_fts.rowid
+                {where}
+                ORDER BY letters_fts.rowid DESC
+                LIMIT 1 OFFSET ?
+                """,
+                (*params, rank_window - 1),
+            ).fetchone()
+        if cutoff is not None:
+            where += " AND letters_fts.rowid >= ?"
+            params.append(cutoff[0])
+
+        rows = conn.execute(
+            f"""
+            SELECT l.id, l.nomor_internal, l.ai_nomor_pengirim, l.status, l.timestamp,
+                   l.assigned_division,
+                   highlight(letters_fts, 2, ?, ?) AS maksud_highlight,
+                   snippet(letters_fts, 3, ?, ?, ' … ', 24) AS ocr_snippet,
+                   {SEARCH_BM25} AS score
+            FROM letters_fts
+            JOIN letters l ON l.id = letters_fts.rowid
+            {where}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+            """,
+            (*mark, *mark, *params, int(limit), int(offset)),
+        ).fetchall()
     return [dict(r) for r in rows]
+
+
+def rebuild_search_index():
+    """Bangun ulang letters_fts dari isi letters (mis. setelah impor massal)."""
+    with get_conn() as conn:
+        conn.execute("INSERT INTO letters_fts(letters_fts) VALUES('rebuild')")
+        conn.execute("INSERT INTO letters_fts(letters_fts) VALUES('optimize')")
+
+
+# -------------------------------------------------
+# 10. BACA SURAT BERTAHAP (ekspor besar)
+# -------------------------------------------------
+def iter_letters(columns, date_from=None, date_to=None, assigned_division=None,
+                 chunk: int = 2000):
+    """
+    Generator list of tuple per chunk, untuk ekspor tanpa memuat semua baris.
+    Keyset pagination (bukan OFFSET) dan koneksi dipinjam per chunk, jadi
+    tidak ada transaksi baca panjang yang menahan checkpoint WAL.
+    date_from/date_to: 'YYYY-MM-DD' inklusif, dibandingkan dengan letters.timestamp.
+    """
+    unknown = set(columns) - set(DASHBOARD_COLUMNS) - {"ocr_text", "content_hash"}
+    if unknown:
+        raise ValueError(f"Kolom tidak dikenal: {', '.join(sorted(unknown))}")
+
+    where, params = [], []
+    if date_from:
+        where.append("timestamp >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # 'YYYY-MM-DD' + akhir hari: semua timestamp ISO di tanggal itu ikut
+        where.append("timestamp < ?")
+        params.append(f"{date_to}T99")
+    if assigned_division is not None:
+        where.append("assigned_division = ?")
+        params.append(assigned_division)
+
+    # dengan filter tanggal, urut (timestamp, id) supaya idx_letters_timestamp terpakai
+    by_time = bool(date_from or date_to)
+    key_cols = ("timestamp", "id") if by_time else ("id",)
+    select = ", ".join([*key_cols, *columns])
+    last = None
+
+    while True:
+        clauses = list(where)
+        args = list(params)
+        if last is not None:
+            clauses.append(f"({', '.join(key_cols)}) > ({', '.join('?' * len(key_cols))})")
+            args.extend(last)
+        sql = (
+            f"SELECT {select} FROM letters "
+            + (f"WHERE {' AND '.join(clauses)} " if clauses else "")
+            + f"ORDER BY {', '.join(key_cols)} LIMIT ?"
+        )
+        with get_conn() as conn:
+            rows = conn.execute(sql, (*args, chunk)).fetchall()
+        if not rows:
+            return
+
+        n_key = len(key_cols)
+        last = tuple(rows[-1][:n_key])
+        yield [tuple(r[n_key:]) for r in rows]
+        if len(rows) < chunk:
+            return
+
+
+# -------------------------------------------------
+# 11. PEMAKAIAN TOKEN AI PER SURAT
+# -------------------------------------------------
+AI_USAGE_FIELDS = ("mode", "chunks", "skipped_chunks", "calls", "cached_calls",
+                   "prompt_tokens", "completion_tokens", "single_prompt_tokens")
+
+
+def record_ai_usage(letter_id: int, usage: dict, model: str = None, conn=None):
+    """Simpan laporan token analisa terakhir surat (utils/ai.TokenUsage.as_dict())."""
+    cols = ["letter_id", *AI_USAGE_FIELDS, "model", "created_at"]
+    values = [letter_id, *(usage.get(f) for f in AI_USAGE_FIELDS), model,
+              datetime.now().isoformat(timespec="seconds")]
+    sql = f"INSERT OR REPLACE INTO ai_usage ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    if conn is not None:
+        conn.execute(sql, values)
+        return
+    with get_conn() as conn:
+        conn.execute(sql, values)
+
+
+def get_ai_usage(letter_id: int):
+    with get_conn() as conn:
+        row = conn.execute("SELECT * FROM ai_usage WHERE letter_id = ?", (letter_id,)).fetchone()
+    return dict(row) if row else None
+
+
+# -------------------------------------------------
+# 12. DURASI PER TAHAP PIPELINE (utils/metrics.py)
+# -------------------------------------------------
+def record_stage_timings(rows):
+    """rows: (letter_id, stage, started_at, ms, ok, error) — satu transaksi untuk semuanya."""
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO stage_timings (letter_id, stage, started_at, ms, ok, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+
+def stage_samples(since: float, stage: str = None):
+    """{stage: ([started_at], [ms], [ok])} sejak epoch `since` (persentil dihitung di Python)."""
+    sql = "SELECT stage, started_at, ms, ok FROM stage_timings WHERE started_at >= ?"
+    params = [since]
+    if stage is not None:
+        sql += " AND stage = ?"
+        params.append(stage)
+    out = {}
+    with get_conn() as conn:
+        for r in conn.execute(sql, params):
+            started, ms, ok = out.setdefault(r[0], ([], [], []))
+            started.append(r[1])
+            ms.append(r[2])
+            ok.append(r[3])
+    return out
+
+
+def stage_timings_for_letter(letter_id: int):
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT stage, started_at, ms, ok, error FROM stage_timings "
+            "WHERE letter_id = ? ORDER BY started_at, id",
+            (letter_id,),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def prune_stage_timings(before: float) -> int:
+    with get_conn() as conn:
+        return conn.execute(
+            "DELETE FROM stage_timings WHERE started_at < ?", (before,)
+        ).rowcount
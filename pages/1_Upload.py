@@ -1,13 +1,13 @@
 import streamlit as st
+from contextlib import closing
 from datetime import datetime
-from pathlib import Path
-import time
-import io
-from PIL import Image  # untuk kompres gambar
 
-from db import insert_letter
-from utils.ocr import ocr_space_file
-from utils.ai import analyse_text_with_groq
+from db import insert_letter, get_letter_by_id
+from utils import cache, dedup, metrics, preview, storage
+from utils.batch import batch_config, expand_uploads, run_batch, save_batch
+from utils.jobs import ensure_workers, jobs_for_letter
+from utils.ocr_backends import get_backend
+from utils.pipeline import STATUS_AI_RUNNING, flag_duplicates, live_fields, submit_letter
 
 st.title("📥 Upload Surat Masuk")
 
@@ -25,13 +25,35 @@ division_user = st.session_state.get("division", "Umum")
 # ─────────────────────────────
 # 2. Form upload
 # ─────────────────────────────
-with st.form("upload_form"):
-    penerima_nama = st.text_input("Nama Penerima (Bagian Umum / staf):", value="")
-    uploaded_file = st.file_uploader(
-        "File Surat (PDF/JPG/PNG)",
-        type=["pdf", "jpg", "jpeg", "png"],
-    )
-    submitted = st.form_submit_button("Upload & Proses")
+MODE_SINGLE = "Satu surat"
+MODE_BATCH = "Batch (banyak file / ZIP)"
+
+mode = st.radio("Mode upload", [MODE_SINGLE, MODE_BATCH], horizontal=True)
+
+submitted = batch_submitted = False
+
+if mode == MODE_SINGLE:
+    with st.form("upload_form"):
+        penerima_nama = st.text_input("Nama Penerima (Bagian Umum / staf):", value="")
+        uploaded_file = st.file_uploader(
+            "File Surat (PDF/JPG/PNG)",
+            type=["pdf", "jpg", "jpeg", "png"],
+        )
+        submitted = st.form_submit_button("Upload & Proses")
+else:
+    cfg = batch_config()
+    with st.form("batch_upload_form"):
+        batch_files = st.file_uploader(
+            "File Surat (PDF/JPG/PNG, atau ZIP berisi file-file tersebut)",
+            type=["pdf", "jpg", "jpeg", "png", "zip"],
+            accept_multiple_files=True,
+        )
+        with st.expander("⚙️ Pengaturan paralel & rate limit"):
+            c1, c2, c3 = st.columns(3)
+            max_workers = c1.number_input("Worker paralel", 1, 16, cfg["max_workers"])
+            ocr_per_min = c2.number_input("OCR per menit", 1.0, 600.0, cfg["ocr_per_min"])
+            ai_per_min = c3.number_input("AI per menit", 1.0, 600.0, cfg["ai_per_min"])
+        batch_submitted = st.form_submit_button("Upload & Proses Batch")
 
 # ─────────────────────────────
 # 3. Proses setelah submit
@@ -42,123 +64,213 @@ if submitted:
         st.error("Pilih file dulu sebelum klik *Upload & Proses*.")
         st.stop()
 
-    # Simpan file fisik
-    letters_dir = Path("data/letters")
-    letters_dir.mkdir(parents=True, exist_ok=True)
-
-    unique_filename = f"{int(time.time())}_{uploaded_file.name}"
-    save_path = letters_dir / unique_filename
+    if not get_backend(st.secrets.get("OCR_SPACE_API_KEY")).available():
+        st.error("Tidak ada backend OCR yang bisa dipakai — set OCR_SPACE_API_KEY atau OCR_BACKENDS.")
+        st.stop()
 
     # baca bytes sekali saja
     file_bytes = uploaded_file.getvalue()
 
-    with open(save_path, "wb") as f:
-        f.write(file_bytes)
+    # Simpan file fisik ke blob store (file identik hanya disimpan sekali)
+    with metrics.timer("store_file"):
+        digest = storage.put_bytes(file_bytes, mime=uploaded_file.type)
+    save_path = storage.path_for(digest)
 
     # ─────────────────────────────
-    #  3.b OCR (dengan kompres gambar >1MB)
+    #  3.b Cek cache: file identik yang pernah diproses → langsung pakai hasilnya
     # ─────────────────────────────
-    st.info("🔍 OCR in progress…")
+    cached = cache.lookup(digest)
+
+    if cached and cached["has_ai"]:
+        with metrics.timer("insert_letter"), storage.release_on_error(digest):
+            letter_id, nomor_internal = insert_letter(
+                nomor_internal=None,
+                uploader=username,
+                division=division_user,
+                filename=uploaded_file.name,
+                content_hash=digest,
+                ocr_text=cached["ocr_text"],
+                ai_nomor_pengirim=cached["ai_nomor_pengirim"],
+                ai_maksud=cached["ai_maksud"],
+                ai_rekomendasi=cached["ai_rekomendasi"],
+                status="Analisa Selesai",
+                timestamp=datetime.now().isoformat(timespec="seconds"),
+            )
+        st.success(
+            f"Sukses simpan surat ID #{letter_id} — Nomor Internal: {nomor_internal}. "
+            "File identik pernah diproses, hasil OCR & AI diambil dari cache."
+        )
+        similar = flag_duplicates(letter_id, cached["ocr_text"])
+        if similar:
+            st.warning(
+                "⚠️ Kemungkinan surat kembar: "
+                + ", ".join(f"ID {other} ({sim:.0%})" for other, sim in similar[:5])
+                + ". Cek dulu sebelum didisposisikan."
+            )
+
+    else:
+        # ─────────────────────────────
+        #  3.c Simpan ke database dulu (status Pending, nomor_internal auto-generated)
+        # ─────────────────────────────
+        with metrics.timer("insert_letter"), storage.release_on_error(digest):
+            letter_id, nomor_internal = insert_letter(
+                nomor_internal=None,          # ➡️ gunakan auto-generate dari db.py
+                uploader=username,
+                division=division_user,
+                filename=uploaded_file.name,
+                content_hash=digest,
+                ocr_text="",
+                status="Pending",
+                timestamp=datetime.now().isoformat(timespec="seconds"),
+            )
+
+        # ─────────────────────────────
+        #  3.d OCR + AI jalan di background worker (lihat utils/pipeline.py)
+        # ─────────────────────────────
+        ensure_workers()
+        submit_letter(letter_id, str(save_path), uploaded_file.type, digest=digest)
+
+        st.session_state.setdefault("upload_tracking", []).append(letter_id)
+
+        st.success(
+            f"Sukses simpan surat ID #{letter_id} — Nomor Internal: {nomor_internal}. "
+            "OCR & analisa AI berjalan di background."
+        )
+
+    # thumbnail + pratinjau dibuat di background (process pool, lihat utils/preview.py)
+    preview.submit(letter_id)
+
+    if st.button("Lihat Dashboard"):
+        st.switch_page("pages/2_Dashboard.py")  # sesuaikan dengan nama file dashboard Mas
+
+# ─────────────────────────────
+# 3b. Proses batch: OCR + AI paralel, simpan semua dalam satu transaksi
+# ─────────────────────────────
+if batch_submitted:
+
+    if not batch_files:
+        st.error("Pilih minimal satu file / ZIP sebelum klik *Upload & Proses Batch*.")
+        st.stop()
 
     OCR_API_KEY = st.secrets.get("OCR_SPACE_API_KEY")
-    if not OCR_API_KEY:
-        st.error("OCR_SPACE_API_KEY belum diset di secrets!")
+    if not get_backend(OCR_API_KEY).available():
+        st.error("Tidak ada backend OCR yang bisa dipakai — set OCR_SPACE_API_KEY atau OCR_BACKENDS.")
         st.stop()
 
-    MAX_SIZE = 1024 * 1024  # 1 MB
+    items, skipped = expand_uploads(batch_files)
+    for name, reason in skipped:
+        st.warning(f"Dilewati: `{name}` — {reason}")
 
-    # Tentukan path yang akan dikirim ke OCR
-    if uploaded_file.type in ["image/jpeg", "image/jpg", "image/png"]:
-        # Gambar → kompres jika perlu
-        if len(file_bytes) > MAX_SIZE:
-            st.info("📉 File besar, melakukan kompres sebelum OCR…")
+    if not items:
+        st.error("Tidak ada file yang bisa diproses.")
+        st.stop()
 
-            img = Image.open(io.BytesIO(file_bytes))
-            img = img.convert("RGB")
+    st.info(f"🔍 Memproses {len(items)} file (OCR + AI) secara paralel…")
+    progress = st.progress(0.0)
+    status_box = st.empty()
 
-            # Resize kalau resolusi sangat besar
-            max_dim = 1500
-            if max(img.size) > max_dim:
-                img.thumbnail((max_dim, max_dim))
+    results = [None] * len(items)
+    done = 0
+    # closing(): kalau script dihentikan di tengah batch, generator langsung
+    # ditutup → sisa file dibatalkan & referensi blob dilepas (lihat run_batch)
+    with closing(run_batch(
+        items,
+        api_key=OCR_API_KEY,
+        max_workers=int(max_workers),
+        ocr_per_min=ocr_per_min,
+        ai_per_min=ai_per_min,
+    )) as batch:
+        for idx, res in batch:
+            results[idx] = res
+            done += 1
+            progress.progress(done / len(items))
+            icon = "✅" if not res["error"] else "⚠️"
+            status_box.caption(f"{icon} {done}/{len(items)} — {res['name']} ({res['seconds']} dtk)")
 
-            quality = 85
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=quality)
+    saved = save_batch(results, uploader=username, division=division_user)
 
-            # Turunkan kualitas sampai <1MB atau minimal quality = 30
-            while buffer.tell() > MAX_SIZE and quality > 30:
-                quality -= 10
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=quality)
+    st.success(f"Sukses simpan {len(saved)} surat dalam satu batch.")
+    if len(saved) < len(results):
+        st.warning(f"{len(results) - len(saved)} file gagal disimpan — lihat kolom Catatan.")
+    st.dataframe(
+        [
+            {
+                "ID": r.get("letter_id", "-"),
+                "Nomor Internal": r.get("nomor_internal", "-"),
+                "File": r["name"],
+                "Status": r["status"],
+                "Rekomendasi AI": r["ai_rekomendasi"] or "-",
+                "Durasi (dtk)": r["seconds"],
+                "Cache": "✅" if r.get("cached") else "",
+                "Mirip dengan": ", ".join(f"ID {other}" for other, _ in r.get("duplicates", [])[:3]),
+                "Catatan": r["error"] or "",
+            }
+            for r in results
+        ],
+        use_container_width=True,
+    )
 
-            compressed_bytes = buffer.getvalue()
-            st.success(f"📦 Ukuran setelah kompres: {len(compressed_bytes)/1024:.1f} KB")
+# ─────────────────────────────
+# 4. Progress OCR/AI (polling ringan tiap 2 detik selama masih ada yang jalan)
+# ─────────────────────────────
+JOB_LABEL = {
+    "queued": "⏳ antre",
+    "running": "⚙️ diproses",
+    "done": "✅ selesai",
+    "failed": "❌ gagal",
+}
 
-            # simpan file hasil kompres untuk OCR
-            temp_path = letters_dir / f"compressed_{unique_filename}.jpg"
-            with open(temp_path, "wb") as f:
-                f.write(compressed_bytes)
 
-            ocr_input_path = str(temp_path)
-        else:
-            # gambar sudah cukup kecil → pakai file asli
-            ocr_input_path = str(save_path)
-    else:
-        # PDF atau tipe lain → langsung pakai file asli
-        ocr_input_path = str(save_path)
-
-    # Panggil OCR di sini
-    try:
-        ocr_text = ocr_space_file(
-            ocr_input_path,
-            api_key=OCR_API_KEY,
-            language="eng",
-        )
-        st.success("OCR selesai.")
-    except Exception as e:
-        st.error(f"OCR gagal: {e}")
-        st.caption("Anda masih bisa menyimpan surat ini. Detail OCR & AI dapat diisi manual nanti.")
-        ocr_text = ""
+def _tracking_rows():
+    rows = []
+    for lid in st.session_state.get("upload_tracking", []):
+        letter = get_letter_by_id(lid)
+        if not letter:
+            continue
+        jobs = jobs_for_letter(lid)
+        job = jobs[-1] if jobs else None
+        # field AI yang sudah ter-stream tampil duluan, sebelum tersimpan ke DB
+        live = live_fields(lid)
+        rows.append({
+            "ID": lid,
+            "Nomor Internal": letter.get("nomor_internal"),
+            "Status Surat": letter.get("status"),
+            "Job": JOB_LABEL.get(job["status"], job["status"]) if job else "-",
+            "Percobaan": f"{job['attempts']}/{job['max_attempts']}" if job else "-",
+            "Nomor Pengirim (AI)": live.get("nomor_surat_pengirim") or letter.get("ai_nomor_pengirim") or "",
+            "Maksud (AI)": live.get("maksud_surat") or letter.get("ai_maksud") or "",
+            "Rekomendasi AI": live.get("rekomendasi_divisi") or letter.get("ai_rekomendasi") or "",
+            "Mirip dengan": ", ".join(f"ID {d['id']}" for d in dedup.duplicates_for_letter(lid)[:3]),
+            "_active": bool(job) and job["status"] in ("queued", "running"),
+            "_streaming": letter.get("status") == STATUS_AI_RUNNING,
+        })
+    return rows
 
-    # ─────────────────────────────
-    #  3.c AI Analysis
-    # ─────────────────────────────
-    ai_nomor = ai_maksud = ai_rekom = None
-    status = "Pending"
-
-    if ocr_text:
-        st.info("🤖 Analisa AI (Groq)…")
-        try:
-            ai_result = analyse_text_with_groq(ocr_text)
-            ai_nomor = ai_result.get("nomor_surat_pengirim")
-            ai_maksud = ai_result.get("maksud_surat")
-            ai_rekom = ai_result.get("rekomendasi_divisi")
-            status = "Analisa Selesai"
-            st.success("Analisa AI selesai.")
-        except Exception as e:
-            st.warning(f"Analisa AI gagal: {e}")
-            status = "OCR Selesai"
 
-    # ─────────────────────────────
-    #  3.d Simpan ke database (nomor_internal auto-generated)
-    # ─────────────────────────────
-    letter_id, nomor_internal = insert_letter(
-        nomor_internal=None,          # ➡️ gunakan auto-generate dari db.py
-        uploader=username,
-        division=division_user,
-        filename=unique_filename,
-        ocr_text=ocr_text,
-        ai_nomor_pengirim=ai_nomor,
-        ai_maksud=ai_maksud,
-        ai_rekomendasi=ai_rekom,
-        status=status,
-        timestamp=datetime.now().isoformat(timespec="seconds"),
-    )
+if st.session_state.get("upload_tracking"):
+    ensure_workers()
+    rows = _tracking_rows()
+    active = any(r["_active"] for r in rows)
+    streaming = any(r["_streaming"] for r in rows)
 
-    # ─────────────────────────────
-    #  3.e Feedback
-    # ─────────────────────────────
-    st.success(f"Sukses simpan surat ID #{letter_id} — Nomor Internal: {nomor_internal}")
+    # selama analisa AI jalan, poll lebih rapat supaya field muncul begitu ter-stream
+    @st.fragment(run_every=(0.5 if streaming else 2) if active else None)
+    def upload_progress():
+        st.subheader("📡 Progress Surat yang Diupload")
+        current = _tracking_rows()
+        st.dataframe(
+            [{k: v for k, v in r.items() if not k.startswith("_")} for r in current],
+            use_container_width=True,
+        )
+        if active and not any(r["_active"] for r in current):
+            # semua selesai → rerun penuh supaya polling berhenti
+            st.rerun()
+        if streaming != any(r["_streaming"] for r in current):
+            # masuk / keluar tahap analisa AI → rerun penuh untuk ganti interval polling
+            st.rerun()
 
-    if st.button("Lihat Dashboard"):
-        st.switch_page("pages/2_Dashboard.py")  # sesuaikan dengan nama file dashboard Mas
+    upload_progress()
+
+    if st.button("Bersihkan daftar progress"):
+        st.session_state.pop("upload_tracking", None)
+        st.rerun()
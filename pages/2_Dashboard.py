@@ -1,13 +1,90 @@
 # pages/2_Dashboard.py
 
+import json
+from datetime import date
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import sqlite3
 
-from db import add_disposition, DB_PATH  # kita pakai DB_PATH dari db.py biar konsisten
+from db import (
+    DASHBOARD_COLUMNS,
+    add_disposition,
+    count_dashboard,
+    data_version,
+    list_assigned_divisions,
+    list_letter_labels,
+    query_dashboard,
+    search_letters,
+)
+from utils import export, fileserver
+from utils.jobs import ensure_workers
+from utils.search import build_match_query
 
 st.title("📊 Dashboard Surat")
 
+PICKER_PAGE_SIZE = 20
+
+
+# ─────────────────────────────
+# 0. Cache data per versi DB
+#    Argumen `version` = db.data_version() (naik tiap insert/update surat &
+#    disposisi) → data baru otomatis jadi kunci cache baru. Rerun tanpa
+#    perubahan data (ganti halaman bolak-balik, buka form, dsb.) tidak
+#    menyentuh SQLite.
+# ─────────────────────────────
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_count(assigned_filter, version):
+    return count_dashboard(assigned_filter)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_page(assigned_filter, limit, offset, sort, version):
+    return pd.DataFrame(
+        query_dashboard(assigned_filter, limit=limit, offset=offset, sort=sort),
+        columns=DASHBOARD_COLUMNS,
+    )
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_divisions(version):
+    return list_assigned_divisions()
+
+
+def letter_labels(df: pd.DataFrame) -> pd.Series:
+    """Label pilihan "nomor — maksud" untuk seluruh kolom sekaligus (tanpa loop per baris)."""
+    nomor = df["nomor_internal"].mask(
+        df["nomor_internal"].fillna("") == "", "ID " + df["id"].astype(str)
+    )
+    judul = df["ai_maksud"].mask(df["ai_maksud"].fillna("") == "", "(tanpa judul)").str[:60]
+    return nomor + " — " + judul
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_labels(query, limit, offset, version):
+    """Satu halaman pilihan disposisi: surat terbaru, atau hasil cari FTS kalau query diisi."""
+    match = build_match_query(query) if query else None
+    if match:
+        rows = [
+            {"id": r["id"], "nomor_internal": r["nomor_internal"], "ai_maksud": r["maksud_highlight"]}
+            for r in search_letters(match, limit=limit, offset=offset, mark=("", ""))
+        ]
+    else:
+        rows = list_letter_labels(limit=limit, offset=offset)
+    df = pd.DataFrame(rows, columns=["id", "nomor_internal", "ai_maksud"])
+    return pd.Series(letter_labels(df).values, index=df["id"].astype(int)) if not df.empty else pd.Series(dtype=str)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_exports(created_by, version):
+    """
+    Daftar ekspor user. Tabel exports tidak menaikkan data_version → cache
+    dikosongkan sendiri saat halaman ini tahu ada perubahan (ekspor baru
+    dijadwalkan, atau polling melihat ekspor selesai).
+    """
+    return export.list_exports(created_by)
+
+
 # ─────────────────────────────
 # 1. Cek user sudah login
 # ─────────────────────────────
@@ -20,88 +97,64 @@ division = st.session_state.get("division", "Umum")
 username = st.session_state.get("username", "unknown")
 
 # ─────────────────────────────
-# 2. Ambil data surat & disposisi dari SQLite
+# 2. Filter sesuai role/divisi login
+#    - IT_ADMIN / BAGIAN_UMUM / DIREKTUR: lihat semua
+#    - lainnya: hanya yang assigned_division = division masing-masing
+# Join disposisi terakhir, filter, sort & paginasi semuanya dikerjakan SQLite
+# (lihat db.query_dashboard) → hanya satu halaman yang dibawa ke pandas.
 # ─────────────────────────────
-# (kalau DB belum ada, sqlite akan bikin kosong; kita handle pakai cek df kosong)
-conn = sqlite3.connect(DB_PATH)
-
-df_letters = pd.read_sql_query("SELECT * FROM letters", conn)
+see_all = role in ("IT_ADMIN", "BAGIAN_UMUM", "DIREKTUR")
+assigned_filter = None if see_all else division
 
-try:
-    df_disp = pd.read_sql_query("SELECT * FROM dispositions", conn)
-except Exception:
-    # kalau tabel dispositions belum pernah dibuat (harusnya sudah oleh init_db, tapi jaga-jaga)
-    df_disp = pd.DataFrame()
+version = data_version()
+total = cached_count(assigned_filter, version)
 
-conn.close()
-
-if df_letters.empty:
-    st.info("Belum ada surat di sistem. Silakan upload surat dulu di menu **Upload**.")
+if total == 0:
+    if see_all:
+        st.info("Belum ada surat di sistem. Silakan upload surat dulu di menu **Upload**.")
+    else:
+        st.info("Tidak ada surat untuk role/divisi Anda saat ini.")
     st.stop()
 
 # ─────────────────────────────
-# 3. Gabungkan dengan assignment terakhir (disposisi terakhir)
+# 3. Kontrol paginasi
 # ─────────────────────────────
-if df_disp.empty:
-    df = df_letters.copy()
-    df["assigned_role"] = None
-    df["assigned_division"] = None
-else:
-    df_disp_latest = (
-        df_disp.sort_values("created_at")
-               .groupby("letter_id")
-               .tail(1)[["letter_id", "to_role", "to_division"]]
-               .rename(columns={"to_role": "assigned_role", "to_division": "assigned_division"})
-    )
-
-    df = df_letters.merge(
-        df_disp_latest,
-        left_on="id",
-        right_on="letter_id",
-        how="left",
-    )
+SORT_LABELS = {
+    "terbaru": "ID terbaru",
+    "terlama": "ID terlama",
+    "waktu_masuk": "Waktu masuk terbaru",
+}
+
+col_sort, col_size, col_page = st.columns([2, 1, 1])
+with col_sort:
+    sort = st.selectbox("Urutkan", list(SORT_LABELS), format_func=SORT_LABELS.get)
+with col_size:
+    page_size = st.selectbox("Baris per halaman", [25, 50, 100, 200], index=1)
+
+n_pages = max(1, -(-total // page_size))
+with col_page:
+    page = st.number_input("Halaman", min_value=1, max_value=n_pages, value=1, step=1)
 
 # ─────────────────────────────
-# 4. Filter sesuai role/divisi login
-#    - IT_ADMIN / BAGIAN_UMUM / DIREKTUR: lihat semua
-#    - lainnya: hanya yang assigned_division = division masing-masing
+# 4. Tampilkan tabel utama
 # ─────────────────────────────
-if role in ("IT_ADMIN", "BAGIAN_UMUM", "DIREKTUR"):
-    filtered = df
+filtered = cached_page(assigned_filter, page_size, (page - 1) * page_size, sort, version)
+
+if fileserver.ensure_server():
+    # thumbnail WebP beberapa KB per surat (utils/preview.py), diambil browser langsung
+    # dari server file — halaman ini tidak membaca file apa pun
+    thumbs = pd.Series(
+        [fileserver.file_url(int(i), "thumb") for i in filtered["id"]], index=filtered.index
+    ).where(filtered["filename"].notna())
+    st.dataframe(
+        filtered.assign(pratinjau=thumbs),
+        use_container_width=True,
+        column_order=["pratinjau", *DASHBOARD_COLUMNS],
+        column_config={"pratinjau": st.column_config.ImageColumn("Pratinjau", width="small")},
+    )
 else:
-    # kalau kolom belum ada (misalnya belum ada disposisi sama sekali), paksa kolom kosong dulu
-    if "assigned_division" not in df.columns:
-        df["assigned_division"] = None
-    filtered = df[df["assigned_division"] == division]
-
-if filtered.empty:
-    st.info("Tidak ada surat untuk role/divisi Anda saat ini.")
-    st.stop()
-
-# ─────────────────────────────
-# 5. Tampilkan tabel utama
-# ─────────────────────────────
-expected_cols = [
-    "id",
-    "nomor_internal",
-    "uploader",
-    "division",
-    "status",
-    "ai_nomor_pengirim",
-    "ai_maksud",
-    "ai_rekomendasi",
-    "assigned_role",
-    "assigned_division",
-    "timestamp",
-    "filename",
-]
-
-available_cols = [c for c in expected_cols if c in filtered.columns]
-
-if "id" in filtered.columns:
-    filtered = filtered.sort_values("id", ascending=False)
-
-st.dataframe(filtered[available_cols], use_container_width=True)
+    st.dataframe(filtered, use_container_width=True)
+st.caption(f"Halaman {page} dari {n_pages} · total {total} surat")
 
 # =====================================================================
 #  ⚡ FORM DISPOSISI CEPAT LANGSUNG DARI DASHBOARD
@@ -110,24 +163,35 @@ if role in ("BAGIAN_UMUM", "DIREKTUR") and not filtered.empty:
 
     st.subheader("⚡ Disposisi Cepat dari Dashboard")
 
-    # direktur / umum boleh memilih dari semua surat
-    source_df = df_letters.copy()
-
-    def make_label(row):
-        nomor = row["nomor_internal"] or f"ID {row['id']}"
-        judul = row["ai_maksud"] or "(tanpa judul)"
-        return f"{nomor} — {judul[:60]}"
+    # direktur / umum boleh memilih dari semua surat — dicari & dipaginasi di
+    # SQLite, yang dibawa ke halaman hanya PICKER_PAGE_SIZE pilihan
+    col_q, col_qpage = st.columns([3, 1])
+    with col_q:
+        picker_query = st.text_input(
+            "Cari surat (nomor / perihal / isi):",
+            value="",
+            placeholder="kosongkan untuk surat terbaru",
+        ).strip()
+    with col_qpage:
+        picker_page = st.number_input("Halaman pilihan", min_value=1, value=1, step=1)
+
+    # ambil satu baris lebih untuk tahu masih ada halaman berikutnya atau tidak
+    labels = cached_labels(
+        picker_query, PICKER_PAGE_SIZE + 1, (picker_page - 1) * PICKER_PAGE_SIZE, version
+    )
+    has_next = len(labels) > PICKER_PAGE_SIZE
+    labels = labels.iloc[:PICKER_PAGE_SIZE]
 
-    options = {
-        int(r["id"]): make_label(r)
-        for _, r in source_df.iterrows()
-    }
+    if labels.empty:
+        st.info("Tidak ada surat yang cocok di halaman ini.")
 
     selected_id = st.selectbox(
         "Pilih surat yang akan didisposisikan:",
-        options=list(options.keys()),
-        format_func=lambda x: options[x],
+        options=labels.index.tolist(),
+        format_func=labels.get,
     )
+    if has_next:
+        st.caption("Masih ada surat lain — naikkan *Halaman pilihan* atau persempit pencarian.")
 
     # Tujuan disposisi — disesuaikan dengan nama divisi yang kita pakai
     tujuan_map = {
@@ -149,7 +213,7 @@ if role in ("BAGIAN_UMUM", "DIREKTUR") and not filtered.empty:
         height=80,
     )
 
-    if st.button("Kirimkan Disposisi"):
+    if st.button("Kirimkan Disposisi", disabled=selected_id is None):
         to_role, to_div = tujuan_map[tujuan_label]
 
         add_disposition(
@@ -163,13 +227,13 @@ if role in ("BAGIAN_UMUM", "DIREKTUR") and not filtered.empty:
         )
 
         st.success(f"Disposisi tersimpan: Surat ID {selected_id} ⇒ {tujuan_label}")
-        st.rerun()   # refresh supaya assigned_division di tabel ikut update
+        st.rerun()   # data_version naik → tabel dibaca ulang, assigned_division ikut update
 
 # ─────────────────────────────
-# 6. Tombol download CSV
+# 5. Tombol download CSV (halaman yang sedang tampil)
 # ─────────────────────────────
 st.download_button(
-    "⬇️ Unduh CSV (Dashboard)",
+    "⬇️ Unduh CSV (halaman ini)",
     data=filtered.to_csv(index=False).encode("utf-8"),
     file_name="surat_dashboard.csv",
     mime="text/csv",
@@ -179,3 +243,97 @@ st.caption(
     "Tabel di atas otomatis difilter sesuai **role** dan **divisi**. "
     "IT Admin / Bagian Umum / Direktur melihat semua; divisi lain hanya melihat yang sudah didisposisikan ke divisinya."
 )
+
+# ─────────────────────────────
+# 6. Ekspor lengkap (job background, file dibuat bertahap dari SQLite)
+# ─────────────────────────────
+st.subheader("📦 Ekspor Data Surat")
+
+with st.form("export_form"):
+    c1, c2 = st.columns(2)
+    with c1:
+        date_range = st.date_input(
+            "Rentang tanggal masuk",
+            value=(date(date.today().year, 1, 1), date.today()),
+        )
+    with c2:
+        if see_all:
+            div_choice = st.selectbox("Divisi tujuan", ["(Semua)"] + cached_divisions(version))
+            export_division = None if div_choice == "(Semua)" else div_choice
+        else:
+            st.text_input("Divisi tujuan", value=division, disabled=True)
+            export_division = division
+
+    c3, c4 = st.columns(2)
+    with c3:
+        fmt = st.selectbox(
+            "Format",
+            export.available_formats(),
+            format_func=lambda f: export.FORMATS[f]["label"],
+        )
+    with c4:
+        include_ocr = st.checkbox("Sertakan teks OCR", value=False)
+
+    if st.form_submit_button("Buat File Ekspor"):
+        date_from, date_to = (list(date_range) + [None, None])[:2]
+        ensure_workers()
+        export.request_export(
+            fmt,
+            created_by=username,
+            date_from=date_from,
+            date_to=date_to,
+            assigned_division=export_division,
+            include_ocr=include_ocr,
+        )
+        cached_exports.clear()
+        st.success("Ekspor dijadwalkan — file muncul di daftar di bawah setelah selesai.")
+
+EXPORT_LABEL = {"queued": "⏳ antre", "running": "⚙️ diproses", "done": "✅ selesai", "failed": "❌ gagal"}
+# tanpa server file, ekspor diunduh lewat st.download_button (seluruh file di memori server)
+EXPORT_INLINE_MAX_BYTES = 50 * 1024 * 1024
+file_links = fileserver.ensure_server()
+my_exports = cached_exports(username, version)
+
+if my_exports:
+    exporting = any(e["status"] in ("queued", "running") for e in my_exports)
+
+    @st.fragment(run_every=2 if exporting else None)
+    def export_list():
+        # SQLite dibaca ulang hanya selama ada ekspor antre/diproses
+        current = export.list_exports(username) if exporting else my_exports
+        for e in current:
+            filters = json.loads(e["filters"])
+            desc = (
+                f"#{e['id']} · {export.FORMATS[e['fmt']]['label']} · "
+                f"{filters.get('date_from') or '…'} s/d {filters.get('date_to') or '…'} · "
+                f"{filters.get('assigned_division') or 'semua divisi'} · {EXPORT_LABEL.get(e['status'], e['status'])}"
+            )
+            col_desc, col_btn = st.columns([4, 1])
+            col_desc.write(desc)
+            if e["status"] == "done" and e["path"] and Path(e["path"]).exists():
+                col_desc.caption(f"{e['rows']} baris · {e['size_bytes'] / 1024:.0f} KB")
+                if file_links:
+                    # dikirim server file langsung dari disk, tidak lewat memori Streamlit
+                    col_btn.link_button("⬇️ Unduh", fileserver.export_url(e["id"]))
+                elif e["size_bytes"] > EXPORT_INLINE_MAX_BYTES:
+                    col_btn.caption("Terlalu besar untuk diunduh lewat halaman ini (butuh FILE_SERVER_URL).")
+                # tanpa server file: file kecil baru dibaca saat diminta, bukan di setiap rerun
+                elif st.session_state.get("export_ready") == e["id"]:
+                    with open(e["path"], "rb") as f:
+                        col_btn.download_button(
+                            "⬇️ Unduh",
+                            data=f,
+                            file_name=Path(e["path"]).name,
+                            mime=export.FORMATS[e["fmt"]]["mime"],
+                            key=f"export_dl_{e['id']}",
+                        )
+                elif col_btn.button("Siapkan", key=f"export_prep_{e['id']}"):
+                    st.session_state["export_ready"] = e["id"]
+                    st.rerun(scope="fragment")
+            elif e["status"] == "failed":
+                col_desc.caption(f"Gagal: {e['error'] or '-'}")
+        if exporting and not any(e["status"] in ("queued", "running") for e in current):
+            cached_exports.clear()
+            st.rerun()
+
+    export_list()
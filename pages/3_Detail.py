@@ -1,8 +1,9 @@
 # pages/3_Detail.py
 
-import os
 import streamlit as st
-from db import get_letter_by_id, get_dispositions_for_letter, DB_PATH
+from db import get_ai_usage, get_letter_by_id, get_dispositions_for_letter
+from utils import dedup, fileserver, metrics, preview, storage
+from utils.jobs import ensure_workers, jobs_for_letter
 
 # ─────────────────────────────────────────────
 # 0. Cek login
@@ -50,6 +51,18 @@ if not letter:
     st.error(f"❌ Tidak ditemukan surat dengan ID {letter_id}.")
     st.stop()
 
+# peringatan surat hampir sama (MinHash/LSH atas teks OCR, lihat utils/dedup.py)
+similar = dedup.duplicates_for_letter(letter_id)
+if similar:
+    st.warning(
+        "⚠️ Surat ini mirip dengan surat lain (kemungkinan scan/foto dari surat yang sama):\n\n"
+        + "\n".join(
+            f"- ID {d['id']} · {d['nomor_internal'] or '-'} · {(d['ai_maksud'] or '')[:60]} "
+            f"(kemiripan {d['similarity']:.0%})"
+            for d in similar
+        )
+    )
+
 # ─────────────────────────────────────────────
 # 3. Layout utama: Info Surat + File + OCR
 # ─────────────────────────────────────────────
@@ -69,28 +82,73 @@ with left:
     st.write("**Maksud / Inti Surat (AI)**:", letter.get("ai_maksud") or "-")
     st.write("**Rekomendasi Divisi (AI)**:", letter.get("ai_rekomendasi") or "-")
 
+    usage = get_ai_usage(letter_id)
+    if usage:
+        mode = (
+            f"map-reduce {usage['chunks']} bagian"
+            + (f" (+{usage['skipped_chunks']} dilewati)" if usage["skipped_chunks"] else "")
+            if usage["mode"] == "map_reduce" else "sekali kirim"
+        )
+        st.caption(
+            f"Token AI: {usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} balasan "
+            f"· {usage['calls']} request ({usage['cached_calls']} dari cache) · {mode}"
+        )
+
+    # durasi tiap tahap pipeline (utils/metrics.py; rinciannya di halaman Metrik)
+    timings = metrics.timings_for_letter(letter_id)
+    if timings:
+        st.caption("Durasi: " + " · ".join(
+            f"{t['stage']} {t['ms'] / 1000:.2f} dtk" + ("" if t["ok"] else " ❌") for t in timings
+        ))
+
 
 with right:
     st.markdown("### ⬇️ File Asli & Isi OCR")
 
-    UPLOAD_DIR = "data/letters"
     filename = letter.get("filename")
 
-    # --- download file asli ---
-    if filename:
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            with open(file_path, "rb") as f:
-                file_bytes = f.read()
-
-            st.download_button(
-                "⬇️ Unduh File Asli",
-                data=file_bytes,
-                file_name=filename,
-                mime="application/octet-stream",
-            )
+    # --- download file asli (blob store, atau data/letters untuk surat lama) ---
+    # File TIDAK dibaca saat render: link ke utils/fileserver.py yang mengirim
+    # file langsung dari disk (Range, MIME benar) hanya kalau diklik.
+    if filename or letter.get("content_hash"):
+        file_path = storage.letter_file_path(letter)
+        if file_path:
+            if fileserver.ensure_server():
+                col_dl, col_open = st.columns(2)
+                col_dl.link_button("⬇️ Unduh File Asli", fileserver.file_url(letter_id))
+                col_open.link_button("🔎 Buka di Tab Baru", fileserver.file_url(letter_id, inline=True))
+            elif st.session_state.get("detail_download_ready") == letter_id:
+                # server file dimatikan → baca file hanya setelah user minta
+                with open(file_path, "rb") as f:
+                    st.download_button(
+                        "⬇️ Unduh File Asli",
+                        data=f,
+                        file_name=filename or file_path.name,
+                        mime=preview.sniff_mime(file_path) or "application/octet-stream",
+                    )
+            elif st.button("Siapkan Unduhan File Asli"):
+                st.session_state["detail_download_ready"] = letter_id
+                st.rerun()
+
+            # pratinjau WebP kecil dari job preview — tidak pernah di-render di thread script
+            preview_path = preview.cached(letter, "preview")
+            if preview_path:
+                st.image(str(preview_path), caption="Pratinjau halaman pertama", use_column_width=True)
+            else:
+                pending = any(
+                    j["kind"] == preview.JOB_KIND and j["status"] in ("queued", "running")
+                    for j in jobs_for_letter(letter_id)
+                )
+                requested = st.session_state.setdefault("preview_requested", set())
+                if not pending and letter_id not in requested:
+                    ensure_workers()
+                    preview.submit(letter_id)
+                    requested.add(letter_id)
+                    pending = True
+                if pending:
+                    st.caption("🖼️ Pratinjau halaman pertama sedang dibuat — muat ulang halaman sebentar lagi.")
         else:
-            st.error(f"⚠️ File asli tidak ditemukan di server:\n`{file_path}`")
+            st.error(f"⚠️ File asli tidak ditemukan di server:\n`{filename}`")
     else:
         st.info("Belum ada informasi nama file tersimpan untuk surat ini.")
 
@@ -0,0 +1,67 @@
+# pages/4_Admin.py
+
+import streamlit as st
+
+from utils import cache
+from utils.jobs import queue_stats
+
+st.title("🛠️ Admin Sistem")
+
+# ─────────────────────────────
+# 1. Cek login + role
+# ─────────────────────────────
+if st.session_state.get("authentication_status") is not True:
+    st.warning("Silakan login di halaman utama.")
+    st.stop()
+
+if st.session_state.get("role") != "IT_ADMIN":
+    st.error("Halaman ini hanya untuk IT Admin.")
+    st.stop()
+
+# ─────────────────────────────
+# 2. Cache OCR/AI
+# ─────────────────────────────
+st.subheader("🧠 Cache OCR & AI (per hash isi file)")
+
+s = cache.stats()
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Hit rate", f"{s['hit_rate'] * 100:.1f}%")
+c2.metric("Hit (OCR+AI)", s["hit"])
+c3.metric("Hit (OCR saja)", s["hit_ocr_only"])
+c4.metric("Miss", s["miss"])
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Entri", s["entries"])
+c2.metric("Entri dengan AI", s["with_ai"])
+c3.metric("Ukuran", f"{s['bytes'] / 1024:.1f} KB")
+c4.metric("Dibuang (evicted)", s["evicted"])
+
+limits = cache.cache_limits()
+st.caption(
+    f"Batas: {limits['max_entries']} entri · {limits['max_bytes'] / 1024 / 1024:.0f} MB · "
+    f"{limits['max_age_days']:.0f} hari sejak terakhir dipakai "
+    "(atur lewat CACHE_MAX_ENTRIES / CACHE_MAX_MB / CACHE_MAX_AGE_DAYS)."
+)
+
+col_a, col_b = st.columns(2)
+with col_a:
+    if st.button("Jalankan eviction sekarang"):
+        removed = cache.evict()
+        st.success(f"{removed} entri dibuang.")
+with col_b:
+    if st.button("Kosongkan cache"):
+        cache.clear()
+        st.success("Cache dikosongkan.")
+
+# ─────────────────────────────
+# 3. Antrian job background
+# ─────────────────────────────
+st.subheader("📡 Antrian Job Background")
+
+q = queue_stats()
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Antre", q.get("queued", 0))
+c2.metric("Diproses", q.get("running", 0))
+c3.metric("Selesai", q.get("done", 0))
+c4.metric("Gagal", q.get("failed", 0))
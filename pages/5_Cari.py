@@ -0,0 +1,116 @@
+# pages/5_Cari.py
+
+import streamlit as st
+
+from db import SEARCH_RANK_WINDOW
+from utils.search import count_matches, render_highlight, search
+
+st.title("🔎 Cari Surat")
+
+# ─────────────────────────────
+# 1. Cek user sudah login
+# ─────────────────────────────
+if st.session_state.get("authentication_status") is not True:
+    st.warning("Silakan login di halaman utama.")
+    st.stop()
+
+role = st.session_state.get("role", "STAFF")
+division = st.session_state.get("division", "Umum")
+
+# sama dengan Dashboard: divisi lain hanya melihat surat yang didisposisikan ke divisinya
+see_all = role in ("IT_ADMIN", "BAGIAN_UMUM", "DIREKTUR")
+assigned_filter = None if see_all else division
+
+PAGE_SIZE = 20
+
+# ─────────────────────────────
+# 2. Form pencarian
+# ─────────────────────────────
+query = st.text_input(
+    "Kata kunci",
+    value=st.session_state.get("search_query", ""),
+    placeholder='mis. pengaduan air keruh · 000.1.5/854 · "rapat koordinasi"',
+)
+st.caption(
+    "Mencari di nomor surat, maksud surat (AI) dan isi OCR. "
+    "Imbuhan diabaikan (mis. *pengaduan* juga menemukan *aduan*); "
+    "pakai tanda kutip untuk frasa persis."
+)
+
+rank_all = st.toggle(
+    "Urutkan semua kecocokan",
+    key="search_rank_all",
+    help=f"Default: hanya {SEARCH_RANK_WINDOW:,} surat cocok terbaru yang diurutkan relevansinya "
+         "(cepat). Nyalakan supaya surat lama yang lebih relevan ikut muncul — lebih lambat "
+         "untuk kata yang sangat umum.",
+)
+
+if (query, rank_all) != (st.session_state.get("search_query"), st.session_state.get("search_ranked_all")):
+    st.session_state["search_query"] = query
+    st.session_state["search_ranked_all"] = rank_all
+    st.session_state["search_page"] = 1
+
+if not query.strip():
+    st.stop()
+
+page = st.session_state.get("search_page", 1)
+rank_window = None if rank_all else SEARCH_RANK_WINDOW
+try:
+    # ambil 1 baris lebih untuk tahu masih ada halaman berikutnya
+    rows = search(query, assigned_filter, limit=PAGE_SIZE + 1, offset=(page - 1) * PAGE_SIZE,
+                  rank_window=rank_window)
+    # cukup tahu "lebih dari N" — hitungan berhenti di N+1
+    truncated = rank_window is not None and count_matches(
+        query, assigned_filter, cap=rank_window + 1
+    ) > rank_window
+except Exception as e:
+    st.error(f"Query pencarian tidak valid: {e}")
+    st.stop()
+
+if truncated:
+    st.caption(
+        f"ℹ️ Lebih dari {rank_window:,} surat cocok; yang diurutkan hanya {rank_window:,} "
+        "surat terbaru. Nyalakan *Urutkan semua kecocokan* untuk menyertakan surat lama."
+    )
+
+has_next = len(rows) > PAGE_SIZE
+rows = rows[:PAGE_SIZE]
+
+if not rows:
+    st.info("Tidak ada surat yang cocok.")
+    st.stop()
+
+# ─────────────────────────────
+# 3. Hasil (terurut relevansi bm25)
+# ─────────────────────────────
+for r in rows:
+    with st.container(border=True):
+        col_info, col_btn = st.columns([5, 1])
+        with col_info:
+            st.markdown(
+                f"**{r['nomor_internal'] or 'ID ' + str(r['id'])}** · "
+                f"{r['timestamp'] or '-'} · {r['status'] or '-'}"
+                + (f" · ➡️ {r['assigned_division']}" if r["assigned_division"] else "")
+            )
+            if r["maksud_highlight"]:
+                st.markdown(render_highlight(r["maksud_highlight"]), unsafe_allow_html=True)
+            if r["ocr_snippet"]:
+                st.caption(render_highlight(r["ocr_snippet"]), unsafe_allow_html=True)
+        with col_btn:
+            if st.button("Detail", key=f"search_detail_{r['id']}"):
+                st.session_state["detail_letter_id"] = int(r["id"])
+                st.switch_page("pages/3_Detail.py")
+
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    if page > 1 and st.button("⬅️ Sebelumnya"):
+        st.session_state["search_page"] = page - 1
+        st.rerun()
+with col_page:
+    st.caption(f"Halaman {page}")
+    if truncated and not has_next:
+        st.caption(f"Batas {rank_window:,} kecocokan terbaru tercapai.")
+with col_next:
+    if has_next and st.button("Berikutnya ➡️"):
+        st.session_state["search_page"] = page + 1
+        st.rerun()
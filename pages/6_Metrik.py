@@ -0,0 +1,154 @@
+# pages/6_Metrik.py
+
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from db import prune_stage_timings
+from utils import metrics
+
+st.title("⏱️ Metrik Pipeline")
+
+# ─────────────────────────────
+# 1. Cek login + role
+# ─────────────────────────────
+if st.session_state.get("authentication_status") is not True:
+    st.warning("Silakan login di halaman utama.")
+    st.stop()
+
+if st.session_state.get("role") != "IT_ADMIN":
+    st.error("Halaman ini hanya untuk IT Admin.")
+    st.stop()
+
+# ─────────────────────────────
+# 2. Saklar + rentang waktu
+# ─────────────────────────────
+col_sw, col_win = st.columns([2, 1])
+with col_sw:
+    on = st.toggle(
+        "Catat durasi tiap tahap (profiling)",
+        value=metrics.enabled(),
+        help="Berlaku untuk proses server ini sampai restart; default dari METRICS_ENABLED.",
+    )
+    if on != metrics.enabled():
+        metrics.set_enabled(on)
+
+# rentang → (detik, lebar bucket grafik)
+WINDOWS = {
+    "1 jam terakhir": (3600, 300),
+    "24 jam terakhir": (86400, 3600),
+    "7 hari terakhir": (7 * 86400, 6 * 3600),
+}
+with col_win:
+    window = st.selectbox("Rentang", list(WINDOWS), index=1)
+seconds, bucket = WINDOWS[window]
+since = time.time() - seconds
+
+# ─────────────────────────────
+# 3. Ringkasan per tahap
+# ─────────────────────────────
+STAGE_LABEL = {
+    "store_file": "Simpan file (blob store)",
+    "insert_letter": "insert_letter",
+    "insert_letters_batch": "insert_letters_batch (batch)",
+    "job.ocr_ai": "Job OCR + AI (total)",
+    "preprocess": "Pra-proses gambar",
+    "ocr": "OCR (total, termasuk pra-proses)",
+    "ai": "Analisa AI (total)",
+    "preview": "Thumbnail & pratinjau",
+    "api.ocrspace": "API OCR.Space",
+    "api.tesseract": "Tesseract",
+    "api.groq": "API Groq",
+}
+
+summary = metrics.summarize(since)
+if not summary:
+    st.info("Belum ada metrik di rentang ini. Upload surat dulu, atau nyalakan pencatatan di atas.")
+    st.stop()
+
+table = pd.DataFrame(summary)
+st.dataframe(
+    pd.DataFrame({
+        "Tahap": table["stage"].map(lambda s: STAGE_LABEL.get(s, s)),
+        "Jumlah": table["count"],
+        "Per jam": table["per_hour"].round(1),
+        "Error": table["errors"],
+        "Error rate": (table["error_rate"] * 100).round(1).astype(str) + "%",
+        "p50 (ms)": table["p50_ms"].round(0),
+        "p95 (ms)": table["p95_ms"].round(0),
+        "p99 (ms)": table["p99_ms"].round(0),
+    }),
+    use_container_width=True,
+    hide_index=True,
+)
+st.caption("Persentil hanya dari pemanggilan yang sukses; error dihitung terpisah.")
+
+# ─────────────────────────────
+# 4. Dari waktu ke waktu
+# ─────────────────────────────
+series = pd.DataFrame(metrics.series(since, bucket))
+series["time"] = pd.to_datetime(series["time"], unit="s")
+
+st.subheader("📈 Throughput & error")
+col_a, col_b = st.columns(2)
+with col_a:
+    st.caption("Jumlah per bucket (job OCR+AI & insert)")
+    main = series[series["stage"].isin(["job.ocr_ai", "insert_letter", "insert_letters_batch"])]
+    if not main.empty:
+        st.bar_chart(main.pivot_table(index="time", columns="stage", values="count", aggfunc="sum"))
+with col_b:
+    st.caption("Error per bucket (semua tahap)")
+    st.bar_chart(series.pivot_table(index="time", columns="stage", values="errors", aggfunc="sum"))
+
+st.subheader("🌐 Latency API eksternal (p95, ms)")
+api = series[series["stage"].str.startswith("api.")]
+if api.empty:
+    st.info("Belum ada request API eksternal di rentang ini.")
+else:
+    st.line_chart(api.pivot_table(index="time", columns="stage", values="p95_ms"))
+
+# ─────────────────────────────
+# 5. Histogram satu tahap
+# ─────────────────────────────
+st.subheader("📊 Sebaran durasi")
+stage = st.selectbox(
+    "Tahap",
+    table["stage"].tolist(),
+    format_func=lambda s: STAGE_LABEL.get(s, s),
+)
+edges, counts = metrics.histogram(stage, since)
+if len(counts):
+    labels = [f"{lo:,.0f}–{hi:,.0f}" if hi >= 10 else f"{lo:.2f}–{hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])]
+    st.bar_chart(pd.DataFrame({"ms": labels, "jumlah": counts}).set_index("ms"), x_label="ms", y_label="jumlah")
+
+# ─────────────────────────────
+# 6. Per surat
+# ─────────────────────────────
+st.subheader("🔎 Durasi per surat")
+letter_id = st.number_input("ID surat", min_value=1, step=1, value=1)
+rows = metrics.timings_for_letter(int(letter_id))
+if rows:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Mulai": datetime.fromtimestamp(r["started_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+                "Tahap": STAGE_LABEL.get(r["stage"], r["stage"]),
+                "Durasi (ms)": round(r["ms"]),
+                "Status": "✅" if r["ok"] else f"❌ {r['error'] or ''}",
+            }
+            for r in rows
+        ]),
+        use_container_width=True,
+        hide_index=True,
+    )
+else:
+    st.caption("Tidak ada catatan durasi untuk surat ini.")
+
+# ─────────────────────────────
+# 7. Perawatan
+# ─────────────────────────────
+if st.button("Hapus metrik lebih lama dari 30 hari"):
+    removed = prune_stage_timings(time.time() - 30 * 86400)
+    st.success(f"{removed} catatan dihapus.")
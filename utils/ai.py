@@ -1,14 +1,29 @@
-import os
+import asyncio
+import contextvars
+import hashlib
 import json
-from typing import Dict
-from groq import Groq
-import streamlit as st
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from groq import AsyncGroq, Groq
+
+import db
+from utils import metrics
+from utils.config import get_secret
+from utils.ratelimit import TokenBucket
 
 ALLOWED_DIVISI = [
     "Operasi", "Hubungan Pelanggan", "Finance",
     "Hukum", "IT", "SDM", "Umum"
 ]
 
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+MAX_TOKENS = 300
+
 SYSTEM_PROMPT = f"""
 Anda staf Bagian Umum berpengalaman. Baca teks OCR, simpulkan ringkas untuk disposisi.
 
@@ -22,63 +37,194 @@ Larangan:
 - jangan tambah key lain di luar 3 key tersebut.
 """
 
+# Contoh few-shot sebagai pasangan pesan statis (prefix yang sama di setiap
+# request), jadi pesan user hanya berisi teks OCR surat yang sedang diproses.
+FEW_SHOT_MESSAGES = [
+    {
+        "role": "user",
+        "content": 'OCR: "Nomor: 000.1.5/854 ... Hal: Undangan ... Selasa 12 Agustus 2025 13.00 WIB ..."',
+    },
+    {
+        "role": "assistant",
+        "content": (
+            '{\n'
+            '  "nomor_surat_pengirim": "000.1.5/854",\n'
+            '  "maksud_surat": "Undangan rapat koordinasi pada Selasa, 12 Agustus 2025 pukul 13.00 WIB secara daring.",\n'
+            '  "rekomendasi_divisi": "Umum"\n'
+            '}'
+        ),
+    },
+]
+
 
 def build_prompt(teks: str) -> str:
-    return (
-        'Contoh:\n'
-        'OCR: "Nomor: 000.1.5/854 ... Hal: Undangan ... Selasa 12 Agustus 2025 13.00 WIB ..."\n'
-        'Jawab:\n'
-        '{\n'
-        '  "nomor_surat_pengirim": "000.1.5/854",\n'
-        '  "maksud_surat": "Undangan rapat koordinasi pada Selasa, 12 Agustus 2025 pukul 13.00 WIB secara daring.",\n'
-        '  "rekomendasi_divisi": "Umum"\n'
-        '}\n\n'
-        f'Sekarang proses teks berikut, balas hanya JSON valid:\n"""{teks}"""'
-    )
+    return f'Sekarang proses teks berikut, balas hanya JSON valid:\nOCR: """{teks}"""'
 
 
-def analyse_text_with_groq(teks: str) -> Dict:
+def build_messages(teks: str) -> List[Dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *FEW_SHOT_MESSAGES,
+        {"role": "user", "content": build_prompt(teks)},
+    ]
+
+
+def get_model() -> str:
+    return get_secret("GROQ_MODEL", DEFAULT_MODEL)
+
+
+# =========================================
+#  CLIENT GROQ — factory yang bisa diganti (test / server tiruan)
+# =========================================
+def default_client_factory() -> Groq:
     # 🔑 AMBIL API KEY DARI secrets / environment
-    groq_key = st.secrets.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
+    groq_key = get_secret("GROQ_API_KEY")
     if not groq_key:
         raise RuntimeError("GROQ_API_KEY belum diset di secrets atau environment.")
+    return Groq(api_key=groq_key, base_url=get_secret("GROQ_BASE_URL"))
 
-    model_name = (
-        st.secrets.get("GROQ_MODEL")
-        or os.getenv("GROQ_MODEL")
-        or "llama-3.1-8b-instant"
-    )
 
-    # 🔑 CLIENT GROQ — versi stabil tanpa proxies
-    client = Groq(api_key=groq_key)
-
-    # =========================================
-    #  PANGGIL GROQ CHAT COMPLETION
-    # =========================================
-    resp = client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": build_prompt(teks)}
-        ],
-        temperature=0.2,
-        max_tokens=300
-    )
+def default_async_client_factory() -> AsyncGroq:
+    groq_key = get_secret("GROQ_API_KEY")
+    if not groq_key:
+        raise RuntimeError("GROQ_API_KEY belum diset di secrets atau environment.")
+    return AsyncGroq(api_key=groq_key, base_url=get_secret("GROQ_BASE_URL"))
+
+
+_client_factory: Callable[[], Groq] = default_client_factory
+_async_client_factory: Callable[[], AsyncGroq] = default_async_client_factory
+_client: Optional[Groq] = None
+_client_lock = threading.Lock()
+
+
+def set_client_factory(factory=None, async_factory=None):
+    """Ganti pembuat client (None = kembali ke default). Client lama dibuang."""
+    global _client_factory, _async_client_factory, _client
+    with _client_lock:
+        _client_factory = factory or default_client_factory
+        _async_client_factory = async_factory or default_async_client_factory
+        _client = None
+
+
+def get_client() -> Groq:
+    """Satu client Groq per proses (connection pool httpx dipakai ulang)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _client_factory()
+    return _client
+
 
-    raw = (resp.choices[0].message.content or "").strip()
+# =========================================
+#  RATE LIMIT (request/menit + token/menit)
+# =========================================
+_limits: Optional[Dict[str, TokenBucket]] = None
 
-    # =========================================
-    #  PARSE JSON (robust)
-    # =========================================
+
+def _rate_limits() -> Dict[str, TokenBucket]:
+    global _limits
+    if _limits is None:
+        rpm = float(get_secret("GROQ_RPM", 30))
+        tpm = float(get_secret("GROQ_TPM", 6000))
+        _limits = {
+            "requests": TokenBucket(rpm, burst=max(1, int(rpm // 6))),
+            "tokens": TokenBucket(tpm, burst=int(tpm)),
+        }
+    return _limits
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Perkiraan kasar: ±4 karakter per token + jatah balasan."""
+    return sum(len(m["content"]) for m in messages) // 4 + MAX_TOKENS
+
+
+def _acquire_rate(messages: List[Dict]):
+    limits = _rate_limits()
+    limits["requests"].acquire()
+    limits["tokens"].acquire(estimate_tokens(messages))
+
+
+# =========================================
+#  CACHE RESPONS: LRU di memori + tabel llm_cache di SQLite
+# =========================================
+LRU_SIZE = 512
+_lru: "OrderedDict[str, Dict]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def cache_key(model: str, messages: List[Dict]) -> str:
+    blob = json.dumps([model, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[Dict]:
+    with _lru_lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return dict(_lru[key])
+
+    try:
+        with db.get_conn() as conn:
+            row = conn.execute(
+                "SELECT result FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+    except Exception:
+        # tabel belum ada (init_db belum jalan) → anggap miss
+        return None
+    if row is None:
+        return None
+
+    result = json.loads(row["result"])
+    _lru_put(key, result)
+    return dict(result)
+
+
+def _lru_put(key: str, result: Dict):
+    with _lru_lock:
+        _lru[key] = result
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _cache_put(key: str, model: str, result: Dict):
+    _lru_put(key, result)
+    try:
+        with db.get_conn() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (cache_key, model, result, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, model, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+    except Exception:
+        # cache hanya optimasi — gagal simpan tidak boleh menggagalkan analisa
+        pass
+
+
+# =========================================
+#  PARSE JSON (robust)
+# =========================================
+def parse_ai_json(raw: str) -> Dict:
+    raw = (raw or "").strip()
     try:
         data = json.loads(raw)
     except Exception:
         s, e = raw.find("{"), raw.rfind("}")
-        if s != -1 and e != -1 and e > s:
-            data = json.loads(raw[s:e+1])
-        else:
+        if s == -1 or e == -1 or e <= s:
             raise RuntimeError("Balasan AI tidak berbentuk JSON valid.")
+        try:
+            data = json.loads(raw[s:e+1])
+        except ValueError as err:
+            raise RuntimeError(f"Balasan AI tidak berbentuk JSON valid: {err}") from err
+    if not isinstance(data, dict):
+        raise RuntimeError("Balasan AI tidak berbentuk objek JSON.")
+    return normalize_ai_result(data)
+
 
+def normalize_ai_result(data: Dict) -> Dict:
     nomor = data.get("nomor_surat_pengirim") or None
     maksud = data.get("maksud_surat") or "Tidak dapat dianalisis otomatis"
     rekom = data.get("rekomendasi_divisi")
@@ -91,3 +237,601 @@ def analyse_text_with_groq(teks: str) -> Dict:
         "maksud_surat": maksud,
         "rekomendasi_divisi": rekom,
     }
+
+
+class StreamingJSON:
+    """
+    Parser inkremental untuk SATU objek JSON top-level yang datang sepotong-sepotong
+    (stream chat completion). feed() mengembalikan pasangan (key, value) top-level
+    yang baru lengkap; done True begitu kurung kurawal penutup terbaca — sisa
+    stream (penjelasan tambahan model, dsb.) tidak perlu ditunggu.
+    Teks sebelum "{" pertama diabaikan, seperti fallback find("{") di parse_ai_json.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict = {}
+        self.done = False
+        self.malformed = False
+        self._pos = 0
+        self._start = None        # indeks "{" pembuka
+        self._end = None          # indeks setelah "}" penutup
+        self._pair_start = None   # awal pasangan key:value yang sedang dibaca
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self.text += chunk or ""
+        out = []
+        while self._pos < len(self.text) and not self.done:
+            i = self._pos
+            ch = self.text[i]
+            self._pos += 1
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif self._start is None:
+                if ch == "{":
+                    self._start, self._pair_start, self._depth = i, i + 1, 1
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    out += self._pair(i)
+                    self._end = i + 1
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                out += self._pair(i)
+                self._pair_start = i + 1
+        return out
+
+    def _pair(self, end: int) -> List[Tuple[str, object]]:
+        frag = self.text[self._pair_start:end].strip()
+        if not frag:
+            return []
+        try:
+            data = json.loads("{" + frag + "}")
+        except ValueError:
+            self.malformed = True
+            return []
+        self.fields.update(data)
+        return list(data.items())
+
+    def result(self) -> Dict:
+        """Objek lengkap; RuntimeError kalau stream berhenti sebelum "}" / JSON rusak."""
+        if not self.done:
+            raise RuntimeError("Balasan AI terpotong sebelum objek JSON selesai.")
+        try:
+            data = json.loads(self.text[self._start:self._end])
+        except ValueError as err:
+            raise RuntimeError(f"Balasan AI tidak berbentuk JSON valid: {err}") from err
+        return normalize_ai_result(data)
+
+
+# =========================================
+#  PANGGIL GROQ CHAT COMPLETION
+# =========================================
+REPAIR_PROMPT = (
+    "Balasan di atas bukan JSON valid. Ulangi jawaban yang sama sebagai SATU objek "
+    "JSON valid dengan key nomor_surat_pengirim, maksud_surat, rekomendasi_divisi — "
+    "tanpa teks lain."
+)
+
+
+def stream_enabled() -> bool:
+    return str(get_secret("GROQ_STREAM", "1")) == "1"
+
+
+def build_repair_messages(messages: List[Dict], raw: str) -> List[Dict]:
+    return [
+        *messages,
+        {"role": "assistant", "content": raw or ""},
+        {"role": "user", "content": REPAIR_PROMPT},
+    ]
+
+
+def _repair_json(messages: List[Dict], raw: str, client: Groq,
+                 usage: Optional["TokenUsage"] = None) -> Dict:
+    """Satu kali minta model membetulkan balasannya sendiri yang bukan JSON valid."""
+    repair = build_repair_messages(messages, raw)
+    _acquire_rate(repair)
+    with metrics.timer("api.groq"):
+        resp = client.chat.completions.create(
+            model=get_model(),
+            messages=repair,
+            temperature=0.0,
+            max_tokens=MAX_TOKENS,
+        )
+    if usage is not None:
+        usage.add(repair, resp)
+    return parse_ai_json(resp.choices[0].message.content)
+
+
+def _chat_json(messages: List[Dict], client: Optional[Groq] = None, use_cache: bool = True,
+               usage: Optional["TokenUsage"] = None) -> Dict:
+    """Satu chat completion → JSON 3 key (dengan cache + rate limit + hitung token)."""
+    model_name = get_model()
+    key = cache_key(model_name, messages)
+
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            if usage is not None:
+                usage.add_cached()
+            return cached
+
+    client = client or get_client()
+    _acquire_rate(messages)
+    with metrics.timer("api.groq"):
+        resp = client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=MAX_TOKENS,
+        )
+    if usage is not None:
+        usage.add(messages, resp)
+
+    raw = resp.choices[0].message.content
+    try:
+        result = parse_ai_json(raw)
+    except RuntimeError:
+        result = _repair_json(messages, raw, client, usage)
+    _cache_put(key, model_name, result)
+    return result
+
+
+def _chat_json_stream(messages: List[Dict], on_field: Callable[[str, object], None],
+                      client: Optional[Groq] = None, use_cache: bool = True,
+                      usage: Optional["TokenUsage"] = None) -> Dict:
+    """
+    Seperti _chat_json tapi stream=True: tiap key top-level dikirim ke
+    on_field(key, value) begitu lengkap, dan koneksi ditutup begitu "}" penutup
+    terbaca. JSON rusak / terpotong → satu kali repair (non-stream).
+    """
+    model_name = get_model()
+    key = cache_key(model_name, messages)
+
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            if usage is not None:
+                usage.add_cached()
+            return cached
+
+    client = client or get_client()
+    _acquire_rate(messages)
+    parser = StreamingJSON()
+    reported = None
+    # api.groq = sampai stream ditutup (bukan hanya sampai token pertama)
+    with metrics.timer("api.groq"):
+        stream = client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=MAX_TOKENS,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                x_groq = getattr(chunk, "x_groq", None)
+                reported = getattr(x_groq, "usage", None) or reported
+                if not chunk.choices:
+                    continue
+                for k, v in parser.feed(chunk.choices[0].delta.content or ""):
+                    on_field(k, v)
+                if parser.done:
+                    break
+        finally:
+            # early exit: sisa token tidak dibaca, koneksi dilepas
+            stream.close()
+    if usage is not None:
+        usage.add_text(messages, parser.text, reported)
+
+    try:
+        result = parser.result()
+    except RuntimeError:
+        result = _repair_json(messages, parser.text, client, usage)
+    _cache_put(key, model_name, result)
+    return result
+
+
+@metrics.timed("ai")
+def analyse_text_with_groq(teks: str, client: Optional[Groq] = None, use_cache: bool = True,
+                           usage: Optional["TokenUsage"] = None,
+                           on_field: Optional[Callable[[str, object], None]] = None) -> Dict:
+    """
+    Analisa teks OCR → {nomor_surat_pengirim, maksud_surat, rekomendasi_divisi}.
+    Teks yang melebihi satu chunk dianalisa map-reduce (analyse_long_text).
+    usage (opsional) diisi pemakaian token untuk laporan per surat.
+    on_field (opsional) → mode streaming: on_field(key, value) dipanggil tiap key
+    begitu tersedia (nilai mentah dari model), lalu sekali lagi untuk semua key
+    dengan nilai akhir yang sudah dinormalisasi.
+    """
+    if usage is not None:
+        usage.single_prompt_tokens = estimate_tokens(build_messages(teks)) - MAX_TOKENS
+
+    local, shortcut = local_analysis(teks)
+    if shortcut is not None:
+        if usage is not None:
+            usage.mode = "local"
+        _emit_all(on_field, shortcut)
+        return shortcut
+
+    if count_tokens(teks) > chunk_config()["chunk_tokens"]:
+        result = analyse_long_text(teks, client, use_cache, usage)
+    elif on_field is not None:
+        if local:
+            on_field("rekomendasi_divisi", local)
+
+        def relay(k, v):
+            # divisi dari classifier sudah dikirim duluan, jangan ditimpa
+            if not (local and k == "rekomendasi_divisi"):
+                on_field(k, v)
+
+        result = _chat_json_stream(build_messages(teks), relay, client, use_cache, usage)
+    else:
+        result = _chat_json(build_messages(teks), client, use_cache, usage)
+    result = apply_local_division(result, local)
+    _emit_all(on_field, result)
+    return result
+
+
+def _emit_all(on_field, result: Dict):
+    if on_field is not None:
+        for k, v in result.items():
+            on_field(k, v)
+
+
+async def analyse_text_async(teks: str, client: AsyncGroq, use_cache: bool = True) -> Dict:
+    """Sama dengan analyse_text_with_groq (jalur lokal, repair JSON, divisi classifier), versi async."""
+    if count_tokens(teks) > chunk_config()["chunk_tokens"]:
+        # teks panjang → map-reduce (client sinkron, chunk paralel di thread pool)
+        return await asyncio.to_thread(analyse_text_with_groq, teks, None, use_cache)
+
+    local, shortcut = await asyncio.to_thread(local_analysis, teks)
+    if shortcut is not None:
+        return shortcut
+
+    model_name = get_model()
+    messages = build_messages(teks)
+    key = cache_key(model_name, messages)
+
+    cached = await asyncio.to_thread(_cache_get, key) if use_cache else None
+    if cached is not None:
+        return apply_local_division(cached, local)
+
+    raw = await _create_async(client, messages, temperature=0.2)
+    try:
+        result = parse_ai_json(raw)
+    except RuntimeError:
+        result = parse_ai_json(await _create_async(client, build_repair_messages(messages, raw), temperature=0.0))
+    await asyncio.to_thread(_cache_put, key, model_name, result)
+    return apply_local_division(result, local)
+
+
+async def _create_async(client: AsyncGroq, messages: List[Dict], temperature: float) -> str:
+    await asyncio.to_thread(_acquire_rate, messages)
+    with metrics.timer("api.groq"):
+        resp = await client.chat.completions.create(
+            model=get_model(),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=MAX_TOKENS,
+        )
+    return resp.choices[0].message.content
+
+
+async def analyse_many_async(texts: List[str], concurrency: int = 4,
+                             use_cache: bool = True) -> List:
+    """Analisa banyak teks OCR sekaligus. Hasil berurutan: dict atau Exception."""
+    sem = asyncio.Semaphore(concurrency)
+    client = _async_client_factory()
+
+    async def one(teks):
+        async with sem:
+            return await analyse_text_async(teks, client, use_cache)
+
+    try:
+        return await asyncio.gather(*(one(t) for t in texts), return_exceptions=True)
+    finally:
+        await client.close()
+
+
+def analyse_many(texts: List[str], concurrency: int = 4, use_cache: bool = True) -> List:
+    """Pembungkus sinkron analyse_many_async."""
+    return asyncio.run(analyse_many_async(texts, concurrency, use_cache))
+
+
+# =========================================
+#  TEKS PANJANG: MAP-REDUCE PER CHUNK
+# =========================================
+# map    : teks dipecah per chunk (batas token), tiap chunk diringkas paralel
+#          ke skema 3 key yang sama
+# reduce : ringkasan chunk + kandidat nomor surat dari regex lokal digabung
+#          jadi satu hasil akhir
+# Surat sangat panjang (lampiran puluhan halaman) dipotong ke MAX_CHUNKS:
+# chunk awal (kop, nomor, perihal) + chunk terakhir (penutup) — biaya
+# tidak tumbuh terus dengan panjang surat.
+
+DEFAULT_CHUNK_TOKENS = 2000
+DEFAULT_MAX_CHUNKS = 6
+
+MAP_SYSTEM_PROMPT = f"""
+Anda staf Bagian Umum berpengalaman. Teks berikut adalah SATU BAGIAN dari surat
+panjang hasil OCR.
+
+Hasilkan JSON dengan key:
+- nomor_surat_pengirim (string atau null; hanya kalau tertulis di bagian ini)
+- maksud_surat (ringkasan isi bagian ini, maksimal 2 kalimat)
+- rekomendasi_divisi (SATU dari: {", ".join(ALLOWED_DIVISI)})
+
+Larangan:
+- jangan isi nomor telepon/meeting ID sebagai nomor surat.
+- jangan tambah key lain di luar 3 key tersebut.
+"""
+
+# "Nomor: 000.1.5/854", "No. 12/UND/PDAM/2025" → nomor berlabel
+_NOMOR_LABELED = re.compile(
+    r"\b(?:nomor|no)\b\s*(?:surat)?\s*[:.]?\s*([A-Za-z0-9][\w.\-]*(?:/[\w.\-]+)+)",
+    re.IGNORECASE,
+)
+# pola nomor surat dinas tanpa label: angka/kode dipisah '/' (bukan tanggal)
+_NOMOR_SHAPE = re.compile(r"\b(\d{1,4}(?:\.\d{1,4})*/[A-Za-z0-9.\-]+(?:/[A-Za-z0-9.\-]+)*)")
+_DATE = re.compile(r"^\d{1,2}/\d{1,2}/\d{2,4}$")
+
+
+def chunk_config() -> Dict:
+    return {
+        "chunk_tokens": int(get_secret("GROQ_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS)),
+        "max_chunks": int(get_secret("GROQ_MAX_CHUNKS", DEFAULT_MAX_CHUNKS)),
+        "concurrency": int(get_secret("GROQ_MAP_CONCURRENCY", 4)),
+    }
+
+
+def count_tokens(teks: str) -> int:
+    """Perkiraan jumlah token teks (±4 karakter per token, sama dengan estimate_tokens)."""
+    return len(teks or "") // 4
+
+
+class TokenUsage:
+    """Akumulasi pemakaian token satu surat (thread-safe, chunk jalan paralel)."""
+
+    def __init__(self):
+        self.mode = "single"
+        self.chunks = 1
+        self.skipped_chunks = 0
+        self.calls = 0
+        self.cached_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.single_prompt_tokens = 0      # perkiraan kalau seluruh teks dikirim sekali
+        self._lock = threading.Lock()
+
+    def add(self, messages: List[Dict], resp):
+        self.add_text(messages, resp.choices[0].message.content, getattr(resp, "usage", None))
+
+    def add_text(self, messages: List[Dict], completion_text: Optional[str], u=None):
+        """u = objek usage dari API kalau ada (stream yang diputus lebih awal tidak punya)."""
+        prompt = getattr(u, "prompt_tokens", None) or estimate_tokens(messages) - MAX_TOKENS
+        completion = getattr(u, "completion_tokens", None)
+        if completion is None:
+            completion = len(completion_text or "") // 4
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+
+    def add_cached(self):
+        with self._lock:
+            self.cached_calls += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "chunks": self.chunks,
+            "skipped_chunks": self.skipped_chunks,
+            "calls": self.calls,
+            "cached_calls": self.cached_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "single_prompt_tokens": self.single_prompt_tokens,
+        }
+
+
+def extract_nomor_candidates(teks: str, limit: int = 5) -> List[str]:
+    """Kandidat nomor surat dari regex lokal: yang berlabel 'Nomor/No' dulu, lalu pola umum."""
+    found: List[str] = []
+    for pattern in (_NOMOR_LABELED, _NOMOR_SHAPE):
+        for m in pattern.finditer(teks or ""):
+            nomor = m.group(1).rstrip(".-")
+            if _DATE.match(nomor) or nomor in found:
+                continue
+            found.append(nomor)
+            if len(found) >= limit:
+                return found
+    return found
+
+
+def split_chunks(teks: str, chunk_tokens: int) -> List[str]:
+    """Pecah teks per baris ke chunk ≤ chunk_tokens (baris super panjang dipotong di spasi)."""
+    max_chars = max(200, chunk_tokens * 4)
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append("\n".join(current).strip())
+        current, size = [], 0
+
+    for line in (teks or "").splitlines():
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            flush()
+            chunks.append(line[:cut].strip())
+            line = line[cut:]
+        if size + len(line) + 1 > max_chars:
+            flush()
+        current.append(line)
+        size += len(line) + 1
+    flush()
+    return [c for c in chunks if c]
+
+
+def _select_chunks(chunks: List[str], max_chunks: int) -> List[str]:
+    if len(chunks) <= max_chunks:
+        return chunks
+    return chunks[:max_chunks - 1] + chunks[-1:]
+
+
+def build_map_messages(chunk: str, index: int, total: int) -> List[Dict]:
+    return [
+        {"role": "system", "content": MAP_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f'Bagian {index} dari {total}, balas hanya JSON valid:\nOCR: """{chunk}"""',
+        },
+    ]
+
+
+def build_reduce_messages(partials: List[Dict], candidates: List[str]) -> List[Dict]:
+    lines = [
+        f"{i}. [nomor: {p['nomor_surat_pengirim'] or '-'} | divisi: {p['rekomendasi_divisi']}] "
+        f"{p['maksud_surat']}"
+        for i, p in enumerate(partials, start=1)
+    ]
+    content = (
+        "Surat panjang sudah diringkas per bagian. Gabungkan menjadi SATU hasil untuk "
+        "disposisi, balas hanya JSON valid.\n"
+        f"Kandidat nomor surat (dari teks asli): {', '.join(candidates) or '(tidak ada)'}\n"
+        "Ringkasan per bagian:\n" + "\n".join(lines)
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *FEW_SHOT_MESSAGES,
+        {"role": "user", "content": content},
+    ]
+
+
+def _compact(s: str) -> str:
+    return re.sub(r"\s+", "", s or "").lower()
+
+
+def analyse_long_text(teks: str, client: Optional[Groq] = None, use_cache: bool = True,
+                      usage: Optional[TokenUsage] = None) -> Dict:
+    """Map-reduce: ringkas tiap chunk paralel lalu gabungkan ke skema 3 key."""
+    cfg = chunk_config()
+    usage = usage if usage is not None else TokenUsage()
+    candidates = extract_nomor_candidates(teks)
+
+    all_chunks = split_chunks(teks, cfg["chunk_tokens"])
+    chunks = _select_chunks(all_chunks, max(2, cfg["max_chunks"]))
+    usage.mode = "map_reduce"
+    usage.chunks = len(chunks)
+    usage.skipped_chunks = len(all_chunks) - len(chunks)
+
+    client = client or get_client()
+    with ThreadPoolExecutor(max_workers=max(1, min(cfg["concurrency"], len(chunks))),
+                            thread_name_prefix="tirtaflow-ai-map") as ex:
+        # copy_context per tugas: timer api.groq di thread map tetap tercatat untuk suratnya
+        futures = [
+            ex.submit(contextvars.copy_context().run, _chat_json,
+                      build_map_messages(chunk, i, len(chunks)), client, use_cache, usage)
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+        partials = [f.result() for f in futures]
+
+    result = _chat_json(build_reduce_messages(partials, candidates), client, use_cache, usage)
+
+    # nomor yang tidak ada di teks asli = halusinasi → pakai kandidat regex
+    nomor = result.get("nomor_surat_pengirim")
+    if not nomor or _compact(nomor) not in _compact(teks):
+        nomor = next(
+            (p["nomor_surat_pengirim"] for p in partials
+             if p["nomor_surat_pengirim"] and _compact(p["nomor_surat_pengirim"]) in _compact(teks)),
+            candidates[0] if candidates else None,
+        )
+    return {**result, "nomor_surat_pengirim": nomor}
+
+
+# =========================================
+#  JALUR CEPAT LOKAL (tanpa LLM)
+# =========================================
+_PERIHAL = re.compile(r"^\s*(?:hal|perihal)\s*[:.]\s*(.{5,200}?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def _flag(name: str, default: str) -> bool:
+    return str(get_secret(name, default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def local_classifier_enabled() -> bool:
+    """AI_LOCAL_CLASSIFIER (default on): classifier yang yakin menentukan rekomendasi_divisi."""
+    return _flag("AI_LOCAL_CLASSIFIER", "1")
+
+
+def local_fast_path_enabled() -> bool:
+    """
+    AI_LOCAL_FASTPATH (default off): LLM dilewati total kalau classifier yakin
+    dan nomor + perihal tertulis jelas. maksud_surat lalu hanya baris "Hal:",
+    bukan ringkasan LLM — aktifkan kalau hemat kuota lebih penting.
+    """
+    return _flag("AI_LOCAL_FASTPATH", "0")
+
+
+def local_analysis(teks: str) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    (divisi dari classifier atau None, hasil lengkap tanpa LLM atau None).
+    Hasil lengkap hanya kalau AI_LOCAL_FASTPATH aktif.
+    """
+    local = predict_division(teks)
+    if local is None or not local_fast_path_enabled():
+        return local, None
+    fields = local_fields(teks)
+    if fields is None:
+        return local, None
+    return local, {**fields, "rekomendasi_divisi": local}
+
+
+def apply_local_division(result: Dict, local: Optional[str]) -> Dict:
+    """Classifier dilatih dari disposisi sungguhan → kalau yakin, divisinya yang menang."""
+    return {**result, "rekomendasi_divisi": local} if local else result
+
+
+def predict_division(teks: str) -> Optional[str]:
+    """Divisi dari classifier lokal (utils/classifier.py) kalau cukup yakin, selain itu None."""
+    if not local_classifier_enabled():
+        return None
+    from utils import classifier
+
+    try:
+        pred = classifier.predict(teks)
+    except Exception:
+        # model rusak / format lama → tetap bisa lewat LLM
+        return None
+    if pred is None or pred[0] not in ALLOWED_DIVISI or pred[1] < classifier.min_confidence():
+        return None
+    return pred[0]
+
+
+def local_fields(teks: str) -> Optional[Dict]:
+    """Nomor (berlabel 'Nomor:') + perihal ('Hal:'/'Perihal:') dari teks; None kalau salah satu tidak ada."""
+    nomor = _NOMOR_LABELED.search(teks or "")
+    perihal = _PERIHAL.search(teks or "")
+    if not nomor or not perihal:
+        return None
+    maksud = perihal.group(1).rstrip(" .")
+    return {
+        "nomor_surat_pengirim": nomor.group(1).rstrip(".-"),
+        "maksud_surat": maksud[0].upper() + maksud[1:] + ".",
+    }
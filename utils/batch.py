@@ -0,0 +1,264 @@
+# utils/batch.py
+#
+# Upload batch: banyak file / ZIP sekaligus → OCR + AI paralel (thread pool
+# terbatas, rate limit per layanan) → simpan semua surat dalam satu transaksi.
+
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import db
+from utils import cache, metrics, preview, storage
+from utils.ai import TokenUsage, analyse_text_with_groq, get_model
+from utils.config import get_secret
+from utils.pipeline import (
+    STATUS_DONE,
+    STATUS_OCR_DONE,
+    STATUS_PENDING,
+    flag_duplicates,
+    run_ocr,
+)
+from utils.ratelimit import TokenBucket
+
+MIME_BY_EXT = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+# Batas aman isi ZIP (hindari zip bomb)
+MAX_ZIP_ENTRIES = 500
+MAX_ZIP_BYTES = 200 * 1024 * 1024
+
+
+def batch_config() -> dict:
+    """Default concurrency & rate limit, bisa di-override lewat secrets/env."""
+    return {
+        "max_workers": int(get_secret("BATCH_MAX_WORKERS", 4)),
+        "ocr_per_min": float(get_secret("OCR_RATE_PER_MIN", 30)),
+        "ai_per_min": float(get_secret("GROQ_RATE_PER_MIN", 30)),
+    }
+
+
+# -------------------------------------------------
+# 1. Intake: file tunggal & isi ZIP
+# -------------------------------------------------
+def expand_uploads(uploaded_files):
+    """
+    Ubah daftar UploadedFile (PDF/JPG/PNG/ZIP) menjadi item {name, bytes, mime}.
+    Menghasilkan (items, skipped) — skipped berisi (nama, alasan).
+    """
+    items, skipped = [], []
+
+    for uf in uploaded_files:
+        ext = Path(uf.name).suffix.lower()
+        data = uf.getvalue()
+
+        if ext == ".zip":
+            zitems, zskipped = _expand_zip(uf.name, data)
+            items.extend(zitems)
+            skipped.extend(zskipped)
+        elif ext in MIME_BY_EXT:
+            items.append({"name": uf.name, "bytes": data, "mime": MIME_BY_EXT[ext]})
+        else:
+            skipped.append((uf.name, "tipe file tidak didukung"))
+
+    return items, skipped
+
+
+def _expand_zip(zip_name: str, data: bytes):
+    items, skipped = [], []
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        return items, [(zip_name, "ZIP rusak")]
+
+    total = 0
+    with zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                continue
+
+            ext = Path(name).suffix.lower()
+            if ext not in MIME_BY_EXT:
+                skipped.append((f"{zip_name}/{info.filename}", "tipe file tidak didukung"))
+                continue
+            if len(items) >= MAX_ZIP_ENTRIES:
+                skipped.append((f"{zip_name}/{info.filename}", "melebihi batas jumlah file ZIP"))
+                continue
+            total += info.file_size
+            if total > MAX_ZIP_BYTES:
+                skipped.append((f"{zip_name}/{info.filename}", "melebihi batas ukuran ZIP"))
+                continue
+
+            items.append({"name": name, "bytes": zf.read(info), "mime": MIME_BY_EXT[ext]})
+
+    return items, skipped
+
+
+# -------------------------------------------------
+# 2. Proses paralel OCR → AI
+# -------------------------------------------------
+def _empty_result(item, digest=None):
+    return {
+        "name": item["name"],
+        "filename": item["name"],
+        "content_hash": digest,
+        "ocr_text": "",
+        "ai_nomor_pengirim": None,
+        "ai_maksud": None,
+        "ai_rekomendasi": None,
+        "status": STATUS_PENDING,
+        "error": None,
+        "ai_usage": None,
+    }
+
+
+def _process_one(item, api_key, ocr_bucket, ai_bucket):
+    """
+    Simpan file, OCR, AI. Tidak menyentuh DB — hasil disimpan batch di akhir.
+    Kalau gagal setelah put_bytes, referensi blob dilepas sebelum error naik.
+    """
+    started = time.perf_counter()
+    digest = storage.put_bytes(item["bytes"], mime=item["mime"])
+    with storage.release_on_error(digest):
+        result = _analyse_one(item, digest, api_key, ocr_bucket, ai_bucket)
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def _analyse_one(item, digest, api_key, ocr_bucket, ai_bucket):
+    save_path = storage.path_for(digest)
+    result = _empty_result(item, digest)
+
+    cached = cache.lookup(digest)
+    result["cached"] = bool(cached and cached["has_ai"])
+
+    if cached:
+        result["ocr_text"] = cached["ocr_text"]
+    else:
+        try:
+            result["ocr_text"] = run_ocr(
+                str(save_path), item["mime"], digest, api_key=api_key, limiter=ocr_bucket
+            )
+            cache.store(digest, result["ocr_text"])
+        except Exception as e:
+            result["error"] = f"OCR gagal: {e}"
+
+    if result["ocr_text"]:
+        try:
+            if result["cached"]:
+                ai_result = cache.as_ai_result(cached)
+            else:
+                usage = TokenUsage()
+                with ai_bucket:
+                    ai_result = analyse_text_with_groq(result["ocr_text"], usage=usage)
+                result["ai_usage"] = usage.as_dict()
+                cache.store(digest, result["ocr_text"], ai_result)
+            result["ai_nomor_pengirim"] = ai_result.get("nomor_surat_pengirim")
+            result["ai_maksud"] = ai_result.get("maksud_surat")
+            result["ai_rekomendasi"] = ai_result.get("rekomendasi_divisi")
+            result["status"] = STATUS_DONE
+        except Exception as e:
+            result["error"] = f"Analisa AI gagal: {e}"
+            result["status"] = STATUS_OCR_DONE
+    return result
+
+
+def _result_of(fut, item):
+    """Hasil satu future; exception (disk penuh, DB sibuk, ...) jadi hasil ber-error, bukan batal semua."""
+    try:
+        return fut.result()
+    except Exception as e:
+        result = _empty_result(item)
+        result["error"] = f"Gagal memproses file: {e}"
+        result["seconds"] = 0.0
+        return result
+
+
+def _release_results(futures):
+    """Lepas referensi blob dari future yang sudah selesai (batch ditinggalkan)."""
+    for fut in futures:
+        if fut.cancelled() or fut.exception() is not None:
+            continue
+        try:
+            storage.release(fut.result()["content_hash"])
+        except Exception:
+            pass
+
+
+def run_batch(items, api_key, max_workers=4, ocr_per_min=30, ai_per_min=30):
+    """
+    Generator: jalankan OCR+AI paralel, yield (index, result) begitu selesai.
+    Dipakai dari thread script Streamlit supaya progress bisa di-update di sana.
+
+    Setelah generator habis, referensi blob hasil (content_hash) milik
+    pemanggil dan harus diteruskan ke save_batch. Kalau generator ditutup
+    sebelum habis (error, script Streamlit dihentikan), file yang belum
+    diproses dibatalkan dan referensi blob yang sudah diambil dilepas.
+    """
+    ocr_bucket = TokenBucket(ocr_per_min, burst=max_workers)
+    ai_bucket = TokenBucket(ai_per_min, burst=max_workers)
+
+    ex = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tirtaflow-batch")
+    futures = {
+        ex.submit(_process_one, item, api_key, ocr_bucket, ai_bucket): i
+        for i, item in enumerate(items)
+    }
+    finished = False
+    try:
+        for fut in as_completed(futures):
+            i = futures[fut]
+            yield i, _result_of(fut, items[i])
+        finished = True
+    finally:
+        ex.shutdown(wait=True, cancel_futures=not finished)
+        if not finished:
+            _release_results(futures)
+
+
+def save_batch(results, uploader, division):
+    """
+    Simpan semua hasil dalam satu transaksi insert_letters_batch, lalu cek
+    surat hampir sama (hasil di r["duplicates"], termasuk sesama isi batch)
+    dan catat pemakaian token AI per surat. Kalau insert gagal, referensi
+    blob yang diambil _process_one dilepas lagi sebelum error diteruskan.
+
+    Hasil yang filenya gagal disimpan (content_hash None) dilewati; yang
+    tersimpan mendapat r["letter_id"] dan r["nomor_internal"].
+    """
+    results = [r for r in results if r["content_hash"]]
+    now = datetime.now().isoformat(timespec="seconds")
+    rows = [
+        {
+            "uploader": uploader,
+            "division": division,
+            "filename": r["filename"],
+            "content_hash": r["content_hash"],
+            "ocr_text": r["ocr_text"],
+            "ai_nomor_pengirim": r["ai_nomor_pengirim"],
+            "ai_maksud": r["ai_maksud"],
+            "ai_rekomendasi": r["ai_rekomendasi"],
+            "status": r["status"],
+            "timestamp": now,
+        }
+        for r in results
+    ]
+    # referensi blob dari _process_one tidak jadi dipakai kalau insert gagal
+    digests = [r["content_hash"] for r in results]
+    with metrics.timer("insert_letters_batch"), storage.release_on_error(*digests):
+        saved = db.insert_letters_batch(rows)
+
+    for (letter_id, nomor_internal), r in zip(saved, results):
+        r["letter_id"], r["nomor_internal"] = letter_id, nomor_internal
+        r["duplicates"] = flag_duplicates(letter_id, r["ocr_text"]) if r["ocr_text"] else []
+        if r.get("ai_usage"):
+            db.record_ai_usage(letter_id, r["ai_usage"], model=get_model())
+        preview.submit(letter_id)
+    return saved
@@ -0,0 +1,196 @@
+# utils/cache.py
+#
+# Cache hasil OCR + AI berdasarkan hash isi file (sha256).
+# Upload ulang file yang byte-nya identik → tidak perlu panggil OCR.Space
+# maupun Groq lagi (surat baru tetap dibuat dengan nomor_internal sendiri).
+#
+# Eviction: umur (CACHE_MAX_AGE_DAYS), jumlah entri (CACHE_MAX_ENTRIES) dan
+# total ukuran teks (CACHE_MAX_MB), yang paling lama tidak dipakai dibuang dulu.
+
+import hashlib
+import itertools
+import time
+from typing import Optional
+
+import db
+from utils.config import get_secret
+
+COUNTER_PREFIX = "analysis_cache."
+EVICT_EVERY = 50  # jalankan eviction setiap N kali store()
+
+_store_calls = itertools.count(1)
+
+
+def cache_limits() -> dict:
+    return {
+        "max_entries": int(get_secret("CACHE_MAX_ENTRIES", 5000)),
+        "max_bytes": int(float(get_secret("CACHE_MAX_MB", 200)) * 1024 * 1024),
+        "max_age_days": float(get_secret("CACHE_MAX_AGE_DAYS", 90)),
+    }
+
+
+def content_hash(data: bytes = None, path: str = None) -> str:
+    """sha256 dari bytes, atau dari file (dibaca per blok 1 MB)."""
+    h = hashlib.sha256()
+    if data is not None:
+        h.update(data)
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def lookup(digest: str, count: bool = True) -> Optional[dict]:
+    """
+    Cari hasil tersimpan. Kembalikan dict (ocr_text, has_ai, ai_*) atau None.
+    Hit/miss dicatat di tabel counters (count=False untuk lookup ulang
+    atas file yang sama, supaya statistik tidak dobel).
+    """
+    with db.get_conn() as conn:
+        row = conn.execute(
+            "SELECT * FROM analysis_cache WHERE content_hash = ?", (digest,)
+        ).fetchone()
+
+        if row is None:
+            if count:
+                db.bump_counter(COUNTER_PREFIX + "miss", conn=conn)
+            return None
+
+        conn.execute(
+            """
+            UPDATE analysis_cache SET hits = hits + ?, last_used_at = ?
+            WHERE content_hash = ?
+            """,
+            (1 if count else 0, time.time(), digest),
+        )
+        if count:
+            db.bump_counter(
+                COUNTER_PREFIX + ("hit" if row["has_ai"] else "hit_ocr_only"), conn=conn
+            )
+
+    return dict(row)
+
+
+def as_ai_result(cached: dict) -> dict:
+    """Ubah baris cache ke format hasil analyse_text_with_groq."""
+    return {
+        "nomor_surat_pengirim": cached.get("ai_nomor_pengirim"),
+        "maksud_surat": cached.get("ai_maksud"),
+        "rekomendasi_divisi": cached.get("ai_rekomendasi"),
+    }
+
+
+def store(digest: str, ocr_text: str, ai_result: Optional[dict] = None):
+    """Simpan / lengkapi hasil OCR (dan AI kalau ada) untuk hash ini."""
+    if not ocr_text:
+        return
+
+    ai_result = ai_result or {}
+    now = time.time()
+    fields = (
+        ocr_text,
+        ai_result.get("nomor_surat_pengirim"),
+        ai_result.get("maksud_surat"),
+        ai_result.get("rekomendasi_divisi"),
+        1 if ai_result else 0,
+    )
+    size = sum(len((f or "").encode("utf-8")) for f in fields[:4] if isinstance(f, str))
+
+    with db.get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO analysis_cache (
+                content_hash, ocr_text, ai_nomor_pengirim, ai_maksud,
+                ai_rekomendasi, has_ai, size_bytes, created_at, last_used_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                ocr_text = excluded.ocr_text,
+                ai_nomor_pengirim = CASE WHEN excluded.has_ai THEN excluded.ai_nomor_pengirim
+                                         ELSE ai_nomor_pengirim END,
+                ai_maksud = CASE WHEN excluded.has_ai THEN excluded.ai_maksud
+                                 ELSE ai_maksud END,
+                ai_rekomendasi = CASE WHEN excluded.has_ai THEN excluded.ai_rekomendasi
+                                      ELSE ai_rekomendasi END,
+                has_ai = MAX(has_ai, excluded.has_ai),
+                size_bytes = excluded.size_bytes,
+                last_used_at = excluded.last_used_at
+            """,
+            (digest, *fields, size, now, now),
+        )
+
+    if next(_store_calls) % EVICT_EVERY == 0:
+        evict()
+
+
+def evict(max_entries=None, max_bytes=None, max_age_days=None) -> int:
+    """Buang entri kedaluwarsa lalu LRU sampai di bawah batas. Kembalikan jumlah terhapus."""
+    limits = cache_limits()
+    max_entries = limits["max_entries"] if max_entries is None else max_entries
+    max_bytes = limits["max_bytes"] if max_bytes is None else max_bytes
+    max_age_days = limits["max_age_days"] if max_age_days is None else max_age_days
+
+    removed = 0
+    with db.get_conn() as conn:
+        cur = conn.execute(
+            "DELETE FROM analysis_cache WHERE last_used_at < ?",
+            (time.time() - max_age_days * 86400,),
+        )
+        removed += cur.rowcount
+
+        # LRU: simpan entri terbaru yang masih muat di batas jumlah & ukuran
+        cur = conn.execute(
+            """
+            DELETE FROM analysis_cache
+            WHERE content_hash IN (
+                SELECT content_hash FROM (
+                    SELECT content_hash,
+                           ROW_NUMBER() OVER w AS rn,
+                           SUM(size_bytes) OVER w AS running_bytes
+                    FROM analysis_cache
+                    WINDOW w AS (ORDER BY last_used_at DESC
+                                 ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+                )
+                WHERE rn > ? OR running_bytes > ?
+            )
+            """,
+            (max_entries, max_bytes),
+        )
+        removed += cur.rowcount
+
+        if removed:
+            db.bump_counter(COUNTER_PREFIX + "evicted", removed, conn=conn)
+
+    return removed
+
+
+def stats() -> dict:
+    """Ringkasan untuk halaman admin."""
+    counters = {
+        k[len(COUNTER_PREFIX):]: v for k, v in db.get_counters(COUNTER_PREFIX).items()
+    }
+    with db.get_conn() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) AS entries,
+                   COALESCE(SUM(size_bytes), 0) AS bytes,
+                   COALESCE(SUM(has_ai), 0) AS with_ai
+            FROM analysis_cache
+            """
+        ).fetchone()
+
+    hits = counters.get("hit", 0) + counters.get("hit_ocr_only", 0)
+    lookups = hits + counters.get("miss", 0)
+    return {
+        **dict(row),
+        "hit": counters.get("hit", 0),
+        "hit_ocr_only": counters.get("hit_ocr_only", 0),
+        "miss": counters.get("miss", 0),
+        "evicted": counters.get("evicted", 0),
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+def clear():
+    with db.get_conn() as conn:
+        conn.execute("DELETE FROM analysis_cache")
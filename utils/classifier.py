@@ -0,0 +1,327 @@
+# utils/classifier.py
+#
+# Klasifikasi lokal rekomendasi_divisi (TF-IDF + regresi logistik multinomial,
+# NumPy saja) — jalur cepat sebelum memanggil LLM.
+#
+# - Data latih: letters.ocr_text → divisi disposisi terakhir
+#   (letters.assigned_division, diisi trigger dari tabel dispositions).
+# - Fitur: kata + pasangan kata berurutan, tf sublinear × idf, dinormalisasi L2.
+#   Disimpan sebagai CSR (indptr/indices/data) supaya tidak butuh scipy.
+# - Prediksi ±1 ms per surat. Kalau confidence (probabilitas kelas teratas)
+#   < CLASSIFIER_MIN_CONFIDENCE, keputusan tetap diserahkan ke LLM.
+#
+# Latih / evaluasi:
+#   python -m utils.classifier train
+#   python -m utils.classifier eval [--test-frac 0.2]
+
+import argparse
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import db
+from utils.config import get_secret
+
+MODEL_PATH = Path("data/models/divisi_clf.npz")
+MIN_DF = 2
+MAX_FEATURES = 30_000
+MIN_TRAIN_DOCS = 50
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+_TOKEN = re.compile(r"[a-z][a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN.findall((text or "").lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+# -------------------------------------------------
+# 1. Matriks sparse (CSR) minimal
+# -------------------------------------------------
+def _csr(docs: Sequence[List[str]], vocab: Dict[str, int], idf: np.ndarray):
+    indptr, indices, data = [0], [], []
+    for tokens in docs:
+        counts = Counter(vocab[t] for t in tokens if t in vocab)
+        if counts:
+            cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+            w = tf * idf[cols]
+            w /= np.linalg.norm(w)
+            indices.append(cols)
+            data.append(w)
+        indptr.append(indptr[-1] + len(counts))
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+    data = np.concatenate(data) if data else np.empty(0)
+    return np.asarray(indptr, dtype=np.int64), indices, data
+
+
+def _rows_dot(indptr, indices, data, W: np.ndarray) -> np.ndarray:
+    """X @ W untuk X dalam CSR."""
+    n = len(indptr) - 1
+    out = np.zeros((n, W.shape[1]))
+    if len(data) == 0:
+        return out
+    prod = data[:, None] * W[indices]
+    nonempty = np.diff(indptr) > 0
+    out[nonempty] = np.add.reduceat(prod, indptr[:-1][nonempty], axis=0)
+    return out
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+# -------------------------------------------------
+# 2. Model
+# -------------------------------------------------
+class DivisionClassifier:
+    def __init__(self, vocab: Dict[str, int], idf: np.ndarray, W: np.ndarray,
+                 b: np.ndarray, labels: List[str], meta: Optional[Dict] = None):
+        self.vocab = vocab
+        self.idf = idf
+        self.W = W
+        self.b = b
+        self.labels = labels
+        self.meta = meta or {}
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], epochs: int = 40,
+              lr: float = 0.2, l2: float = 1e-5) -> "DivisionClassifier":
+        docs = [tokenize(t) for t in texts]
+        df = Counter(t for tokens in docs for t in set(tokens))
+        terms = [t for t, c in df.most_common(MAX_FEATURES) if c >= MIN_DF]
+        vocab = {t: i for i, t in enumerate(terms)}
+        n = len(docs)
+        idf = np.array([math.log((1 + n) / (1 + df[t])) + 1.0 for t in terms])
+
+        classes = sorted(set(labels))
+        y = np.array([classes.index(l) for l in labels])
+        Y = np.eye(len(classes))[y]
+        indptr, indices, data = _csr(docs, vocab, idf)
+        data = data.astype(np.float32)        # bandwidth memori setengah, akurasi sama
+
+        # X^T @ G lewat salinan urut per kolom (CSC) + reduceat, tanpa np.add.at
+        order = np.argsort(indices, kind="stable")
+        csc_rows = np.repeat(np.arange(n), np.diff(indptr))[order]
+        csc_data = data[order]
+        col_sorted = indices[order]
+        col_starts = np.flatnonzero(np.r_[True, col_sorted[1:] != col_sorted[:-1]])
+        cols = col_sorted[col_starts]
+        del order, col_sorted
+
+        W = np.zeros((len(terms), len(classes)), dtype=np.float32)
+        b = np.zeros(len(classes), dtype=np.float32)
+        # Adam, full batch
+        mW, vW = np.zeros_like(W), np.zeros_like(W)
+        mb, vb = np.zeros_like(b), np.zeros_like(b)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            P = _softmax(_rows_dot(indptr, indices, data, W) + b)
+            G = ((P - Y) / n).astype(np.float32)
+            gW = np.zeros_like(W)
+            gW[cols] = np.add.reduceat(csc_data[:, None] * G[csc_rows], col_starts, axis=0)
+            gW += l2 * W
+            gb = G.sum(axis=0)
+
+            mW = beta1 * mW + (1 - beta1) * gW
+            vW = beta2 * vW + (1 - beta2) * gW ** 2
+            mb = beta1 * mb + (1 - beta1) * gb
+            vb = beta2 * vb + (1 - beta2) * gb ** 2
+            corr1, corr2 = 1 - beta1 ** step, 1 - beta2 ** step
+            W -= lr * (mW / corr1) / (np.sqrt(vW / corr2) + eps)
+            b -= lr * (mb / corr1) / (np.sqrt(vb / corr2) + eps)
+
+        meta = {"trained_at": datetime.now().isoformat(timespec="seconds"), "n_docs": n}
+        return cls(vocab, idf, W, b, classes, meta)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        indptr, indices, data = _csr([tokenize(t) for t in texts], self.vocab, self.idf)
+        return _softmax(_rows_dot(indptr, indices, data, self.W) + self.b)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(divisi, confidence) untuk satu teks."""
+        p = self.predict_proba([text])[0]
+        k = int(p.argmax())
+        return self.labels[k], float(p[k])
+
+    def save(self, path: Path = MODEL_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        tmp = path.with_name(f".tmp-{path.name}")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f, terms=np.array(terms), idf=self.idf, W=self.W, b=self.b,
+                labels=np.array(self.labels),
+                meta=np.array([self.meta.get("trained_at", ""), str(self.meta.get("n_docs", 0))]),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "DivisionClassifier":
+        with np.load(path) as z:
+            terms = z["terms"].tolist()
+            meta = z["meta"].tolist()
+            return cls(
+                {t: i for i, t in enumerate(terms)}, z["idf"], z["W"], z["b"],
+                z["labels"].tolist(), {"trained_at": meta[0], "n_docs": int(meta[1])},
+            )
+
+
+# -------------------------------------------------
+# 3. Model aktif (dimuat ulang kalau file model berubah)
+# -------------------------------------------------
+_loaded: Optional[Tuple[float, DivisionClassifier]] = None
+_load_lock = threading.Lock()
+
+
+def min_confidence() -> float:
+    return float(get_secret("CLASSIFIER_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
+
+
+def load_model(path: Path = MODEL_PATH) -> Optional[DivisionClassifier]:
+    """Model tersimpan (None kalau belum pernah dilatih)."""
+    global _loaded
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _loaded is None or _loaded[0] != mtime:
+        with _load_lock:
+            if _loaded is None or _loaded[0] != mtime:
+                _loaded = (mtime, DivisionClassifier.load(path))
+    return _loaded[1]
+
+
+def predict(text: str) -> Optional[Tuple[str, float]]:
+    """(divisi, confidence) dari model lokal, atau None kalau model belum ada."""
+    model = load_model()
+    if model is None or not (text or "").strip():
+        return None
+    return model.predict(text)
+
+
+# -------------------------------------------------
+# 4. Data latih & evaluasi
+# -------------------------------------------------
+def load_training_data(allowed: Optional[Sequence[str]] = None) -> Tuple[List[str], List[str]]:
+    """(teks OCR, divisi disposisi terakhir), urut id (≈ urut waktu masuk)."""
+    if allowed is None:
+        from utils.ai import ALLOWED_DIVISI as allowed
+    marks = ",".join("?" * len(allowed))
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT ocr_text, assigned_division FROM letters
+            WHERE assigned_division IN ({marks}) AND ocr_text IS NOT NULL AND ocr_text != ''
+            ORDER BY id
+            """,
+            list(allowed),
+        ).fetchall()
+    return [r["ocr_text"] for r in rows], [r["assigned_division"] for r in rows]
+
+
+def train_from_db(path: Path = MODEL_PATH) -> Dict:
+    texts, labels = load_training_data()
+    if len(texts) < MIN_TRAIN_DOCS or len(set(labels)) < 2:
+        raise RuntimeError(
+            f"Data latih belum cukup: {len(texts)} surat terdisposisi, {len(set(labels))} divisi "
+            f"(minimal {MIN_TRAIN_DOCS} surat, 2 divisi)."
+        )
+    started = time.perf_counter()
+    model = DivisionClassifier.train(texts, labels)
+    model.save(path)
+    return {"docs": len(texts), "features": len(model.vocab), "labels": model.labels,
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+def evaluate(texts: Sequence[str], labels: Sequence[str], test_frac: float = 0.2,
+             thresholds: Sequence[float] = (0.5, 0.7, 0.8, 0.85, 0.9, 0.95),
+             local_complete=None) -> Dict:
+    """
+    Latih pada surat lama, uji pada test_frac surat terbaru (seperti pemakaian
+    nyata). Per ambang confidence: porsi surat yang dijawab lokal (tidak perlu
+    LLM untuk divisi) dan akurasinya. local_complete(teks) → bool opsional:
+    surat yang nomor & perihalnya juga bisa diambil lokal (LLM dilewati total).
+    """
+    split = int(len(texts) * (1 - test_frac))
+    model = DivisionClassifier.train(texts[:split], labels[:split])
+    test_x, test_y = list(texts[split:]), np.array(labels[split:])
+
+    started = time.perf_counter()
+    proba = model.predict_proba(test_x)
+    batch_ms = (time.perf_counter() - started) * 1000 / max(1, len(test_x))
+    sample = test_x[:200]
+    started = time.perf_counter()
+    for t in sample:
+        model.predict(t)
+    single_ms = (time.perf_counter() - started) * 1000 / max(1, len(sample))
+
+    pred = np.array(model.labels)[proba.argmax(axis=1)]
+    conf = proba.max(axis=1)
+    correct = pred == test_y
+    complete = np.array([bool(local_complete(t)) for t in test_x]) if local_complete else None
+
+    rows = []
+    for t in thresholds:
+        covered = conf >= t
+        row = {
+            "threshold": t,
+            "coverage": float(covered.mean()),
+            "accuracy_covered": float(correct[covered].mean()) if covered.any() else None,
+        }
+        if complete is not None:
+            row["llm_avoided"] = float((covered & complete).mean())
+        rows.append(row)
+
+    return {
+        "train": split,
+        "test": len(test_x),
+        "accuracy": float(correct.mean()) if len(test_x) else None,
+        "ms_per_letter": round(single_ms, 3),
+        "ms_per_letter_batch": round(batch_ms, 3),
+        "thresholds": rows,
+    }
+
+
+def print_report(report: Dict):
+    print(f"latih {report['train']} · uji {report['test']} surat terbaru")
+    print(f"akurasi (semua): {report['accuracy']:.1%} · "
+          f"{report['ms_per_letter']:.2f} ms/surat ({report['ms_per_letter_batch']:.3f} ms dalam batch)")
+    has_avoided = "llm_avoided" in report["thresholds"][0]
+    print(f"\n{'ambang':>7} {'dijawab lokal':>14} {'akurasi':>9}" + (f" {'LLM dilewati':>13}" if has_avoided else ""))
+    for r in report["thresholds"]:
+        acc = f"{r['accuracy_covered']:.1%}" if r["accuracy_covered"] is not None else "-"
+        line = f"{r['threshold']:>7.2f} {r['coverage']:>14.1%} {acc:>9}"
+        if has_avoided:
+            line += f" {r['llm_avoided']:>13.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Klasifikasi lokal rekomendasi divisi Tirtaflow")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("train", help="latih dari riwayat disposisi dan simpan model")
+    e = sub.add_parser("eval", help="evaluasi offline: latih surat lama, uji surat terbaru")
+    e.add_argument("--test-frac", type=float, default=0.2)
+    args = ap.parse_args()
+
+    db.init_db()
+    if args.cmd == "train":
+        print(train_from_db())
+    else:
+        from utils.ai import local_fields
+
+        texts, labels = load_training_data()
+        print_report(evaluate(texts, labels, test_frac=args.test_frac,
+                              local_complete=lambda t: local_fields(t) is not None))
@@ -0,0 +1,15 @@
+# utils/config.py
+
+import os
+
+import streamlit as st
+
+
+def get_secret(name: str, default=None):
+    """Ambil konfigurasi dari st.secrets, lalu environment, lalu default."""
+    try:
+        value = st.secrets.get(name)
+    except Exception:
+        # tidak ada secrets.toml (mis. dijalankan di luar Streamlit / di worker CLI)
+        value = None
+    return value or os.getenv(name) or default
@@ -0,0 +1,268 @@
+# utils/dedup.py
+#
+# Deteksi surat kembar "hampir sama" (scan vs foto vs PDF dari surat yang sama)
+# lewat MinHash + LSH atas teks OCR.
+#
+# - Teks dinormalisasi (huruf yang sering tertukar OCR diseragamkan: 0/o,
+#   1/l, 5/s, rn/m) lalu dipecah menjadi shingle 7 karakter — cukup panjang
+#   untuk melintasi batas kata (frasa umum surat dinas tidak membuat surat
+#   berbeda terlihat mirip), cukup pendek untuk tahan salah baca OCR.
+# - Signature MinHash NUM_PERM × uint32 disimpan sebagai BLOB (numpy.tobytes)
+#   di tabel minhash_signatures.
+# - LSH: signature dibagi BANDS band × ROWS baris; tiap band di-hash menjadi
+#   satu bucket di minhash_buckets. Kandidat = surat yang berbagi ≥1 bucket
+#   → lookup index, tidak membandingkan dengan seluruh arsip.
+# - Kandidat diverifikasi dengan estimasi Jaccard dari signature penuh;
+#   yang ≥ DUP_THRESHOLD dicatat di letter_duplicates.
+#
+# Index arsip lama: python -m utils.dedup build [--rebuild]
+
+import argparse
+import re
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import db
+
+SHINGLE = 7
+NUM_PERM = 120
+BANDS = 24
+ROWS = NUM_PERM // BANDS            # 5 → ambang LSH ±(1/24)^(1/5) ≈ 0.53
+DUP_THRESHOLD = 0.5
+MIN_TEXT_CHARS = 80                 # teks OCR lebih pendek → tidak cukup sinyal
+
+# Parameter hash TIDAK boleh berubah setelah ada signature tersimpan
+# (kalau berubah, jalankan `build --rebuild`).
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20250801)
+_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.randint(1, np.iinfo(np.int64).max, size=(BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_OCR_FOLD = str.maketrans({"0": "o", "1": "l", "5": "s"})
+
+
+# -------------------------------------------------
+# 1. Signature & bucket
+# -------------------------------------------------
+def normalize(text: str) -> str:
+    norm = _NON_ALNUM.sub(" ", (text or "").lower()).strip()
+    return norm.translate(_OCR_FOLD).replace("rn", "m")
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hash crc32 (uint64) dari semua shingle SHINGLE karakter, unik."""
+    norm = normalize(text)
+    if len(norm) < SHINGLE:
+        return np.empty(0, dtype=np.uint64)
+    data = norm.encode("utf-8")
+    hashes = {zlib.crc32(data[i:i + SHINGLE]) for i in range(len(data) - SHINGLE + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash NUM_PERM × uint32; None kalau teks terlalu pendek."""
+    if len(normalize(text)) < MIN_TEXT_CHARS:
+        return None
+    x = shingles(text)
+    # ((a·x + b) mod 2^64) mod p: a < 2^61 dan x (crc32) < 2^32, jadi a·x + b
+    # hampir selalu wrap di uint64 sebelum direduksi mod p. Ini BUKAN keluarga
+    # (a·x + b) mod p yang klasik, hanya hash multiply-add per permutasi yang
+    # cukup acak untuk MinHash (recall diukur di bench/bench_dedup.py).
+    # Mengubah rumus/konstanta mengubah semua signature → perlu build --rebuild.
+    with np.errstate(over="ignore"):
+        hashed = (np.outer(_A, x) + _B[:, None]) % _MERSENNE
+    return (hashed.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def band_buckets(sig: np.ndarray) -> List[int]:
+    """Satu bucket int64 per band (nomor band ikut di-hash, jadi cukup satu kolom)."""
+    rows = sig.reshape(BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        h = (rows * _BAND_MIX).sum(axis=1, dtype=np.uint64) ^ _BAND_SALT
+    return h.view(np.int64).tolist()
+
+
+def similarity(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimasi Jaccard sig terhadap setiap baris others (N × NUM_PERM)."""
+    return (others == sig).mean(axis=1)
+
+
+def _to_blob(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def _from_blobs(blobs: Iterable[bytes]) -> np.ndarray:
+    return np.frombuffer(b"".join(blobs), dtype="<u4").reshape(-1, NUM_PERM)
+
+
+# -------------------------------------------------
+# 2. Index & pencarian
+# -------------------------------------------------
+def _store(conn, letter_id: int, sig: np.ndarray, buckets: List[int]):
+    conn.execute(
+        "INSERT OR REPLACE INTO minhash_signatures (letter_id, signature, created_at) VALUES (?, ?, ?)",
+        (letter_id, _to_blob(sig), time.time()),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO minhash_buckets (bucket, letter_id) VALUES (?, ?)",
+        [(b, letter_id) for b in buckets],
+    )
+
+
+def _candidates(conn, sig: np.ndarray, buckets: List[int],
+                exclude_id: Optional[int]) -> List[Tuple[int, float]]:
+    marks = ",".join("?" * len(buckets))
+    # bucket lama dibiarkan (dibersihkan oleh build --rebuild): surat yang sudah
+    # dihapus tidak punya signature lagi, dan kandidat selalu diverifikasi
+    # dengan signature terbarunya
+    rows = conn.execute(
+        f"""
+        SELECT s.letter_id, s.signature
+        FROM minhash_signatures s
+        WHERE s.letter_id IN (SELECT DISTINCT letter_id FROM minhash_buckets WHERE bucket IN ({marks}))
+        """,
+        buckets,
+    ).fetchall()
+    rows = [r for r in rows if r["letter_id"] != exclude_id]
+    if not rows:
+        return []
+
+    sims = similarity(sig, _from_blobs(r["signature"] for r in rows))
+    found = [
+        (r["letter_id"], float(s))
+        for r, s in zip(rows, sims)
+        if s >= DUP_THRESHOLD
+    ]
+    return sorted(found, key=lambda t: -t[1])
+
+
+def find_similar(text: str, exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+    """Surat yang teks OCR-nya mirip `text` → [(letter_id, estimasi Jaccard)], terbesar dulu."""
+    sig = signature(text)
+    if sig is None:
+        return []
+    with db.get_conn() as conn:
+        return _candidates(conn, sig, band_buckets(sig), exclude_id)
+
+
+def check_letter(letter_id: int, text: str, conn=None) -> List[Tuple[int, float]]:
+    """
+    Index teks OCR satu surat dan catat kemiripannya dengan surat lain
+    (hanya terhadap surat yang lebih dulu masuk). Kembalikan daftar kemiripan.
+    """
+    sig = signature(text)
+    if sig is None:
+        return []
+    if conn is None:
+        with db.get_conn() as conn:
+            return _check(conn, letter_id, sig)
+    return _check(conn, letter_id, sig)
+
+
+def _check(conn, letter_id: int, sig: np.ndarray) -> List[Tuple[int, float]]:
+    buckets = band_buckets(sig)
+    found = [(i, s) for i, s in _candidates(conn, sig, buckets, letter_id) if i < letter_id]
+    _store(conn, letter_id, sig, buckets)
+    conn.execute("DELETE FROM letter_duplicates WHERE letter_id = ?", (letter_id,))
+    conn.executemany(
+        """
+        INSERT INTO letter_duplicates (letter_id, duplicate_of, similarity, created_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        [
+            (letter_id, other, round(sim, 3), datetime.now().isoformat(timespec="seconds"))
+            for other, sim in found
+        ],
+    )
+    return found
+
+
+def duplicates_for_letter(letter_id: int) -> List[Dict]:
+    """Surat lain yang ditandai mirip (ke dua arah), dengan nomor_internal-nya."""
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT x.other_id AS id, l.nomor_internal, l.ai_maksud, x.similarity
+            FROM (
+                SELECT duplicate_of AS other_id, similarity FROM letter_duplicates WHERE letter_id = ?
+                UNION ALL
+                SELECT letter_id, similarity FROM letter_duplicates WHERE duplicate_of = ?
+            ) x
+            JOIN letters l ON l.id = x.other_id
+            ORDER BY x.similarity DESC, x.other_id
+            """,
+            (letter_id, letter_id),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+# -------------------------------------------------
+# 3. Build index untuk arsip yang sudah ada
+# -------------------------------------------------
+def build_index(rebuild: bool = False, chunk: int = 2000, progress=None) -> Dict:
+    """
+    Index semua surat yang punya teks OCR tapi belum punya signature
+    (rebuild=True → kosongkan dulu index & hasil deteksi lama).
+    Surat diproses urut id, jadi yang lebih baru ditandai mirip yang lebih lama.
+    """
+    stats = {"indexed": 0, "skipped": 0, "duplicates": 0}
+
+    if rebuild:
+        with db.get_conn() as conn:
+            conn.execute("DELETE FROM minhash_buckets")
+            conn.execute("DELETE FROM minhash_signatures")
+            conn.execute("DELETE FROM letter_duplicates")
+
+    last_id = 0
+    while True:
+        # satu transaksi per chunk
+        with db.get_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, ocr_text FROM letters
+                WHERE id > ? AND ocr_text IS NOT NULL AND ocr_text != ''
+                  AND id NOT IN (SELECT letter_id FROM minhash_signatures)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (last_id, chunk),
+            ).fetchall()
+            if not rows:
+                break
+
+            for r in rows:
+                if len(normalize(r["ocr_text"])) < MIN_TEXT_CHARS:
+                    stats["skipped"] += 1
+                    continue
+                found = check_letter(r["id"], r["ocr_text"], conn=conn)
+                stats["indexed"] += 1
+                stats["duplicates"] += bool(found)
+            last_id = rows[-1]["id"]
+
+        if progress:
+            progress(stats)
+
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Index MinHash/LSH surat mirip Tirtaflow")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="index semua surat yang belum punya signature")
+    b.add_argument("--rebuild", action="store_true", help="hapus index lama dan bangun ulang")
+    args = ap.parse_args()
+
+    db.init_db()
+    started = time.perf_counter()
+    result = build_index(
+        rebuild=args.rebuild,
+        progress=lambda s: print(f"  {s['indexed']} terindex, {s['duplicates']} mirip", flush=True),
+    )
+    print(f"{result} dalam {time.perf_counter() - started:.1f} dtk")
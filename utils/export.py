@@ -0,0 +1,230 @@
+# utils/export.py
+#
+# Ekspor data surat (audit, rekap tahunan) sebagai job background:
+#   Dashboard → request_export() → job "export" → file di data/exports/
+#
+# - Baris dibaca dari SQLite per chunk (db.iter_letters) dan langsung ditulis
+#   ke file → memori tetap konstan berapa pun jumlah barisnya.
+# - Format: CSV (selalu ada), Parquet (butuh pyarrow), XLSX (butuh openpyxl,
+#   mode write-only). Format yang library-nya tidak terpasang tidak ditawarkan.
+# - File ditulis ke .tmp lalu os.replace → file yang ada selalu lengkap.
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import db
+from utils.jobs import enqueue, register
+
+JOB_KIND = "export"
+EXPORT_DIR = Path("data/exports")
+EXPORT_MAX_AGE_DAYS = 7
+CHUNK_ROWS = 2000
+XLSX_MAX_ROWS = 1_048_575  # batas Excel dikurangi baris header
+
+FORMATS = {
+    "csv": {"label": "CSV", "ext": "csv", "mime": "text/csv"},
+    "parquet": {"label": "Parquet (kolumnar, terkompresi)", "ext": "parquet",
+                "mime": "application/vnd.apache.parquet"},
+    "xlsx": {"label": "Excel (XLSX)", "ext": "xlsx",
+             "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+}
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except Exception:
+        # ImportError, atau library terpasang tapi tidak cocok (mis. versi numpy)
+        return False
+
+
+def available_formats() -> List[str]:
+    fmts = ["csv"]
+    if _has_module("pyarrow.parquet"):
+        fmts.append("parquet")
+    if _has_module("openpyxl"):
+        fmts.append("xlsx")
+    return fmts
+
+
+def export_columns(include_ocr: bool = False) -> List[str]:
+    return list(db.DASHBOARD_COLUMNS) + (["ocr_text"] if include_ocr else [])
+
+
+# -------------------------------------------------
+# 1. Writer per format (menerima iterator chunk → tulis bertahap)
+# -------------------------------------------------
+def write_csv(path: Path, columns, chunks) -> int:
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:   # BOM → Excel baca UTF-8
+        w = csv.writer(f)
+        w.writerow(columns)
+        for rows in chunks:
+            w.writerows(rows)
+            n += len(rows)
+    return n
+
+
+def write_parquet(path: Path, columns, chunks) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (c, pa.int64() if c == "id" else pa.string()) for c in columns
+    ])
+    n = 0
+    # satu row group per chunk → memori hanya sebesar satu chunk
+    with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+        for rows in chunks:
+            cols = list(zip(*rows))
+            writer.write_table(pa.table(
+                [pa.array(col, type=field.type) for col, field in zip(cols, schema)],
+                schema=schema,
+            ))
+            n += len(rows)
+    return n
+
+
+def write_xlsx(path: Path, columns, chunks) -> int:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)   # baris langsung di-stream ke file sementara
+    ws = wb.create_sheet("Surat")
+    ws.append(list(columns))
+    n = 0
+    for rows in chunks:
+        if n + len(rows) > XLSX_MAX_ROWS:
+            raise RuntimeError(
+                f"Lebih dari {XLSX_MAX_ROWS} baris tidak muat di Excel — pakai CSV/Parquet."
+            )
+        for r in rows:
+            ws.append(list(r))
+        n += len(rows)
+    wb.save(str(path))
+    return n
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "xlsx": write_xlsx}
+
+
+def write_export(path: Path, fmt: str, filters: Dict, chunk: int = CHUNK_ROWS) -> int:
+    """Tulis ekspor ke path (atomik). Kembalikan jumlah baris."""
+    columns = export_columns(filters.get("include_ocr", False))
+    chunks = db.iter_letters(
+        columns,
+        date_from=filters.get("date_from"),
+        date_to=filters.get("date_to"),
+        assigned_division=filters.get("assigned_division"),
+        chunk=chunk,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".tmp-{path.name}")
+    try:
+        n = WRITERS[fmt](tmp, columns, chunks)
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return n
+
+
+# -------------------------------------------------
+# 2. Job background
+# -------------------------------------------------
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def request_export(fmt: str, created_by: str, date_from=None, date_to=None,
+                   assigned_division=None, include_ocr: bool = False) -> int:
+    """Catat permintaan ekspor + jadwalkan job-nya; kembalikan id ekspor."""
+    if fmt not in available_formats():
+        raise ValueError(f"Format ekspor tidak tersedia: {fmt}")
+
+    filters = {
+        "date_from": str(date_from) if date_from else None,
+        "date_to": str(date_to) if date_to else None,
+        "assigned_division": assigned_division,
+        "include_ocr": include_ocr,
+    }
+    with db.get_conn() as conn:
+        export_id = conn.execute(
+            "INSERT INTO exports (fmt, filters, created_by, created_at) VALUES (?, ?, ?, ?)",
+            (fmt, json.dumps(filters), created_by, _now_iso()),
+        ).lastrowid
+
+    job_id = enqueue(JOB_KIND, payload={"export_id": export_id}, max_attempts=2)
+    with db.get_conn() as conn:
+        conn.execute("UPDATE exports SET job_id = ? WHERE id = ?", (job_id, export_id))
+
+    cleanup_exports()
+    return export_id
+
+
+def _update(export_id: int, **fields):
+    cols = ", ".join(f"{c} = ?" for c in fields)
+    with db.get_conn() as conn:
+        conn.execute(f"UPDATE exports SET {cols} WHERE id = ?", (*fields.values(), export_id))
+
+
+def get_export(export_id: int) -> Optional[Dict]:
+    with db.get_conn() as conn:
+        row = conn.execute("SELECT * FROM exports WHERE id = ?", (export_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_exports(created_by: str, limit: int = 10) -> List[Dict]:
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM exports WHERE created_by = ? ORDER BY id DESC LIMIT ?",
+            (created_by, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@register(JOB_KIND)
+def run_export_job(job: dict):
+    export_id = job["payload"]["export_id"]
+    exp = get_export(export_id)
+    if exp is None:
+        return
+
+    fmt = exp["fmt"]
+    path = EXPORT_DIR / f"surat_{export_id}_{datetime.now():%Y%m%d_%H%M%S}.{FORMATS[fmt]['ext']}"
+    _update(export_id, status="running")
+    try:
+        n = write_export(path, fmt, json.loads(exp["filters"]))
+    except Exception as e:
+        last_attempt = job["attempts"] >= job["max_attempts"]
+        _update(export_id, status="failed" if last_attempt else "queued", error=str(e)[-500:])
+        raise
+
+    _update(
+        export_id,
+        status="done",
+        path=str(path),
+        rows=n,
+        size_bytes=path.stat().st_size,
+        error=None,
+        finished_at=_now_iso(),
+    )
+
+
+def cleanup_exports(max_age_days: float = EXPORT_MAX_AGE_DAYS) -> int:
+    """Hapus file ekspor yang lebih tua dari max_age_days (riwayatnya tetap)."""
+    if not EXPORT_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for p in EXPORT_DIR.iterdir():
+        if p.is_file() and p.stat().st_mtime < cutoff:
+            p.unlink()
+            removed += 1
+    return removed
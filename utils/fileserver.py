@@ -0,0 +1,377 @@
+# utils/fileserver.py
+#
+# Endpoint unduh file surat di luar Streamlit. st.download_button butuh
+# seluruh isi file di memori di setiap render; di sini file baru dibaca saat
+# link benar-benar diklik, dan dikirim langsung dari disk ke socket
+# (socket.sendfile → os.sendfile, tanpa salinan di Python).
+#
+#   GET/HEAD /files/<letter_id>/<kind>?exp=…&sig=…[&inline=1]
+#     kind: original | preview | thumb (utils/preview.py)
+#   GET/HEAD /exports/<export_id>?exp=…&sig=…   ← file ekspor (utils/export.py)
+#
+# - Link ditandatangani HMAC-SHA256 + kedaluwarsa, jadi endpoint tidak perlu
+#   sesi login Streamlit; link hanya dibuat di halaman yang sudah cek login.
+# - Content-Type dari isi file, Range (satu rentang) → 206 Partial Content,
+#   ETag = content_hash, If-None-Match → 304.
+# - Server jalan di thread daemon, satu per proses (ensure_server), dan hanya
+#   kalau FILE_SERVER_URL diset: alamat yang bisa dijangkau browser user
+#   (biasanya lewat reverse proxy). Tanpa itu halaman memakai
+#   st.download_button yang membaca file hanya saat diminta.
+
+import argparse
+import hashlib
+import hmac
+import http.client
+import mimetypes
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import db
+from utils import preview, storage
+from utils.config import get_secret
+
+LINK_TTL = 15 * 60             # detik
+SECRET_PATH = Path("data/.file_link_secret")
+KINDS = ("original", "preview", "thumb")
+EXPORT_KIND = "export"         # hanya untuk tanda tangan link /exports/<id>
+
+
+# -------------------------------------------------
+# 1. Link bertanda tangan
+# -------------------------------------------------
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _link_secret() -> bytes:
+    """FILE_LINK_SECRET, atau kunci acak yang disimpan sekali di data/ (sama untuk semua proses)."""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                configured = get_secret("FILE_LINK_SECRET")
+                if configured:
+                    _secret = str(configured).encode()
+                else:
+                    if not SECRET_PATH.exists():
+                        try:
+                            # O_EXCL: kalau dua proses berebut, yang kalah membaca milik pemenang
+                            fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                            with os.fdopen(fd, "w") as f:
+                                f.write(secrets.token_hex(32))
+                        except FileExistsError:
+                            pass
+                    _secret = SECRET_PATH.read_text().strip().encode()
+    return _secret
+
+
+def _signature(letter_id: int, kind: str, exp: int) -> str:
+    msg = f"{int(letter_id)}:{kind}:{int(exp)}".encode()
+    return hmac.new(_link_secret(), msg, hashlib.sha256).hexdigest()
+
+
+def verify(letter_id: int, kind: str, exp: int, sig: str) -> bool:
+    if exp < time.time():
+        return False
+    return hmac.compare_digest(_signature(letter_id, kind, exp), sig or "")
+
+
+def base_url() -> str:
+    """Alamat publik server file (FILE_SERVER_URL); tidak ada tebakan localhost."""
+    url = get_secret("FILE_SERVER_URL")
+    if not url:
+        raise RuntimeError("FILE_SERVER_URL belum diset — server file tidak aktif.")
+    return str(url).rstrip("/")
+
+
+def file_url(letter_id: int, kind: str = "original", inline: bool = False,
+             ttl: int = LINK_TTL) -> str:
+    """
+    URL bertanda tangan untuk satu file surat, berlaku minimal ttl detik.
+    exp dibulatkan ke kelipatan ttl → URL sama di setiap rerun dalam jendela
+    itu, jadi thumbnail di tabel tetap diambil dari cache browser.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Jenis file tidak dikenal: {kind}")
+    query = _signed_query(letter_id, kind, ttl)
+    if inline:
+        query["inline"] = 1
+    return f"{base_url()}/files/{int(letter_id)}/{kind}?{urlencode(query)}"
+
+
+def export_url(export_id: int, ttl: int = LINK_TTL) -> str:
+    """URL bertanda tangan untuk file ekspor (link hanya dibuat untuk pemilik ekspor)."""
+    query = _signed_query(export_id, EXPORT_KIND, ttl)
+    return f"{base_url()}/exports/{int(export_id)}?{urlencode(query)}"
+
+
+def _signed_query(obj_id: int, kind: str, ttl: int) -> dict:
+    exp = (int(time.time()) // ttl + 2) * ttl
+    return {"exp": exp, "sig": _signature(obj_id, kind, exp)}
+
+
+# -------------------------------------------------
+# 2. Range & header
+# -------------------------------------------------
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Header Range → (awal, akhir) inklusif. None = tidak ada Range (kirim semua).
+    ValueError = rentang tidak bisa dipenuhi (416). Multi-range tidak didukung →
+    diperlakukan seperti tanpa Range (boleh menurut RFC 9110).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[6:].strip().partition("-")
+    try:
+        if start_s == "":
+            # bytes=-N → N byte terakhir
+            n = int(end_s)
+            if n <= 0:
+                raise ValueError("rentang kosong")
+            return max(0, size - n), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        raise ValueError(f"Range tidak valid: {header}")
+    if start >= size or end < start:
+        raise ValueError(f"Range di luar ukuran file: {header}")
+    return start, min(end, size - 1)
+
+
+def content_disposition(filename: str, inline: bool) -> str:
+    """Nama file non-ASCII aman untuk browser (RFC 6266 / 5987)."""
+    ascii_name = filename.encode("ascii", "replace").decode().replace('"', "")
+    kind = "inline" if inline else "attachment"
+    return f"{kind}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def resolve(letter_id: int, kind: str) -> Optional[Tuple[Path, str, str, str]]:
+    """(path, mime, nama unduhan, etag) untuk file surat, atau None kalau tidak ada."""
+    letter = db.get_letter_by_id(letter_id)
+    if letter is None:
+        return None
+    if kind == "original":
+        path = storage.letter_file_path(letter)
+        if path is None:
+            return None
+        name = letter.get("filename") or path.name
+        mime = preview.sniff_mime(path) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        etag = letter.get("content_hash") or preview.derivative_key(letter, path)
+        return path, mime, name, etag
+
+    path = preview.ensure(letter, kind)
+    if path is None:
+        return None
+    stem = Path(letter.get("filename") or f"surat_{letter_id}").stem
+    return path, "image/webp", f"{stem}.{kind}.webp", path.stem
+
+
+def resolve_export(export_id: int) -> Optional[Tuple[Path, str, str, str]]:
+    """(path, mime, nama unduhan, etag) untuk ekspor yang sudah selesai, atau None."""
+    from utils import export
+
+    exp = export.get_export(export_id)
+    if exp is None or exp["status"] != "done" or not exp["path"]:
+        return None
+    path = Path(exp["path"])
+    if not path.exists():
+        return None
+    return path, export.FORMATS[exp["fmt"]]["mime"], path.name, f"export-{export_id}-{exp['size_bytes']}"
+
+
+# -------------------------------------------------
+# 3. Handler HTTP
+# -------------------------------------------------
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TirtaflowFiles"
+
+    def log_message(self, *args):
+        pass
+
+    def _error(self, status: int, message: str):
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def _probe(self, nonce: str):
+        """Bukti bahwa ini server file Tirtaflow dengan kunci link yang sama (lihat ensure_server)."""
+        body = _probe_answer(nonce).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        if parts == ["files", "_probe"]:
+            return self._probe(query.get("nonce", [""])[0])
+        if len(parts) == 3 and parts[0] == "files" and parts[1].isdigit() and parts[2] in KINDS:
+            obj_id, kind = int(parts[1]), parts[2]
+        elif len(parts) == 2 and parts[0] == "exports" and parts[1].isdigit():
+            obj_id, kind = int(parts[1]), EXPORT_KIND
+        else:
+            return self._error(404, "Tidak ditemukan")
+        try:
+            exp = int(query.get("exp", ["0"])[0])
+        except ValueError:
+            exp = 0
+        if not verify(obj_id, kind, exp, query.get("sig", [""])[0]):
+            return self._error(403, "Link tidak valid atau sudah kedaluwarsa")
+
+        found = resolve_export(obj_id) if kind == EXPORT_KIND else resolve(obj_id, kind)
+        if found is None:
+            return self._error(404, "File tidak ditemukan")
+        path, mime, name, etag = found
+        etag = f'"{etag}"'
+        inline = "inline" in query or kind in ("preview", "thumb")
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            try:
+                rng = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = rng if rng else (0, size - 1)
+            length = end - start + 1 if size else 0
+            self.send_response(206 if rng else 200)
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "private, max-age=3600")
+            self.send_header("Content-Disposition",
+                             content_disposition(name, inline=inline))
+            if rng:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            if self.command == "HEAD" or not length:
+                return
+            self.wfile.flush()
+            try:
+                # zero-copy: kernel menyalin langsung file → socket
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                # browser membatalkan unduhan / pindah ke rentang lain
+                self.close_connection = True
+
+
+# -------------------------------------------------
+# 4. Server per proses
+# -------------------------------------------------
+def server_config() -> dict:
+    """
+    Aktif hanya kalau FILE_SERVER_URL diset (FILE_SERVER_ENABLED=0 mematikan
+    paksa): link ke localhost tidak berguna untuk browser di komputer lain.
+    """
+    return {
+        "enabled": bool(get_secret("FILE_SERVER_URL"))
+        and str(get_secret("FILE_SERVER_ENABLED", "1")) == "1",
+        "host": get_secret("FILE_SERVER_HOST", "127.0.0.1"),
+        "port": int(get_secret("FILE_SERVER_PORT", 8502)),
+    }
+
+
+def _probe_answer(nonce: str) -> str:
+    return hmac.new(_link_secret(), f"probe:{nonce}".encode(), hashlib.sha256).hexdigest()
+
+
+def probe(host: str, port: int, timeout: float = 1.0) -> bool:
+    """True kalau yang mendengarkan di host:port adalah server file ini (kunci link sama)."""
+    nonce = secrets.token_hex(8)
+    if host in ("", "0.0.0.0", "::"):
+        host = "127.0.0.1"
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", f"/files/_probe?nonce={nonce}")
+        resp = conn.getresponse()
+        answer = resp.read(128).decode("ascii", "replace")
+        return resp.status == 200 and hmac.compare_digest(answer, _probe_answer(nonce))
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+_shared = False                # port dipegang server file Tirtaflow di proses lain
+_PROBE_RETRY = 30.0            # detik sebelum port yang dipakai program lain dicek ulang
+_probe_failed_at: Optional[float] = None
+
+
+def ensure_server() -> bool:
+    """
+    Jalankan server file sekali per proses (aman dipanggil di setiap rerun).
+    True kalau link file_url() bisa dipakai: server ini jalan, atau port sudah
+    dipegang server file Tirtaflow di proses lain (dibuktikan lewat probe —
+    program lain di port yang sama tidak dianggap server kita).
+    """
+    global _server, _shared, _probe_failed_at
+    cfg = server_config()
+    if not cfg["enabled"]:
+        return False
+    if _server is not None or _shared:
+        return True
+    with _server_lock:
+        if _server is not None or _shared:
+            return True
+        if _probe_failed_at is not None and time.monotonic() - _probe_failed_at < _PROBE_RETRY:
+            return False
+        db.init_db()
+        try:
+            server = ThreadingHTTPServer((cfg["host"], cfg["port"]), FileHandler)
+        except OSError:
+            # port sudah dipakai → hanya dipakai kalau memang server file kita
+            if probe(cfg["host"], cfg["port"]):
+                _shared = True
+                return True
+            _probe_failed_at = time.monotonic()
+            return False
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="tirtaflow-files", daemon=True
+        ).start()
+        _server = server
+    return True
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Server unduh file surat Tirtaflow (tanpa Streamlit)")
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--port", type=int, default=None)
+    args = ap.parse_args()
+
+    db.init_db()
+    cfg = server_config()
+    host, port = args.host or cfg["host"], args.port or cfg["port"]
+    print(f"server file di http://{host}:{port}/files/… (Ctrl+C untuk berhenti)")
+    ThreadingHTTPServer((host, port), FileHandler).serve_forever()
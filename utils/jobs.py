@@ -0,0 +1,331 @@
+# utils/jobs.py
+#
+# Antrian job persisten di SQLite (tabel `jobs`, lihat migrasi 3 di db.py)
+# + worker pool berbasis thread di dalam proses Streamlit.
+#
+# - Job tersimpan di DB → tidak hilang saat app restart.
+# - Selama handler jalan, lease job diperpanjang tiap HEARTBEAT_SECONDS →
+#   job panjang (PDF banyak halaman + retry) tidak diambil worker lain.
+# - Job yang sedang "running" saat proses mati: langsung diantre ulang saat
+#   worker pool start kalau proses pemiliknya sudah tidak ada (host sama),
+#   atau paling lambat setelah lease-nya kedaluwarsa (LEASE_SECONDS).
+# - Gagal → dicoba ulang dengan exponential backoff + jitter sampai
+#   max_attempts, setelah itu status "failed".
+
+import json
+import os
+import random
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import db
+
+WORKER_COUNT = int(os.getenv("TIRTAFLOW_WORKERS", "3"))
+POLL_INTERVAL = 2.0        # detik, kalau antrian kosong
+LEASE_SECONDS = 120        # job "running" tanpa heartbeat selama ini dianggap yatim
+HEARTBEAT_SECONDS = 30     # interval perpanjangan lease selama handler jalan
+BACKOFF_BASE = 5.0         # detik, dikali 2^(attempt-1)
+BACKOFF_MAX = 600.0
+
+# kind → fungsi handler(job: dict). Daftarkan dengan @register("kind").
+# Handler melempar exception untuk minta retry; job["attempts"] dan
+# job["max_attempts"] bisa dipakai untuk tahu apakah ini percobaan terakhir.
+HANDLERS: Dict[str, Callable[[dict], None]] = {}
+
+
+def register(kind: str):
+    def deco(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return deco
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def backoff_delay(attempts: int) -> float:
+    """Jeda sebelum percobaan berikutnya (full jitter di separuh atas)."""
+    delay = min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# -------------------------------------------------
+# 1. Operasi antrian
+# -------------------------------------------------
+def enqueue(kind: str, payload: Optional[dict] = None, letter_id: Optional[int] = None,
+            max_attempts: int = 5, delay: float = 0.0) -> int:
+    """Masukkan job baru ke antrian; kembalikan job id."""
+    with db.get_conn() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO jobs (kind, letter_id, payload, max_attempts, run_after,
+                              created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                kind,
+                letter_id,
+                json.dumps(payload or {}),
+                max_attempts,
+                time.time() + delay,
+                _now_iso(),
+                _now_iso(),
+            ),
+        )
+        job_id = cur.lastrowid
+
+    _wake.set()
+    return job_id
+
+
+def claim(worker_id: str) -> Optional[dict]:
+    """Ambil satu job siap jalan secara atomik (BEGIN IMMEDIATE)."""
+    now = time.time()
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """
+            SELECT * FROM jobs
+            WHERE (status = 'queued' AND run_after <= ?)
+               OR (status = 'running' AND locked_at < ?)
+            ORDER BY run_after
+            LIMIT 1
+            """,
+            (now, now - LEASE_SECONDS),
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+
+        conn.execute(
+            """
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1,
+                locked_by = ?, locked_at = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (worker_id, now, _now_iso(), row["id"]),
+        )
+
+    job = dict(row)
+    job["attempts"] += 1
+    job["locked_by"] = worker_id
+    job["payload"] = json.loads(job["payload"] or "{}")
+    return job
+
+
+def renew_lease(job: dict) -> bool:
+    """Perpanjang lease job yang masih dipegang worker ini. False kalau sudah diambil alih."""
+    with db.get_conn() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET locked_at = ? "
+            "WHERE id = ? AND status = 'running' AND locked_by = ?",
+            (time.time(), job["id"], job.get("locked_by")),
+        )
+    return cur.rowcount == 1
+
+
+def _worker_alive(locked_by: Optional[str]) -> bool:
+    """Proses pemilik worker_id '<pid>-…' masih hidup? Ragu → anggap hidup (tunggu lease)."""
+    try:
+        pid = int(str(locked_by).split("-", 1)[0])
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # mis. PermissionError: proses ada, milik user lain
+    return True
+
+
+def requeue_orphans() -> int:
+    """
+    Job 'running' yang proses pemiliknya sudah mati (restart app) → antre lagi
+    sekarang, tanpa menunggu lease habis. Hanya berlaku untuk worker di host
+    yang sama (DB SQLite lokal); kembalikan jumlah job yang diantre ulang.
+    """
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, locked_by FROM jobs WHERE status = 'running'"
+        ).fetchall()
+        dead = [(r["id"], r["locked_by"]) for r in rows if not _worker_alive(r["locked_by"])]
+        conn.executemany(
+            """
+            UPDATE jobs
+            SET status = 'queued', run_after = ?, locked_by = NULL, locked_at = NULL,
+                updated_at = ?
+            WHERE id = ? AND status = 'running' AND locked_by = ?
+            """,
+            [(time.time(), _now_iso(), job_id, locked_by) for job_id, locked_by in dead],
+        )
+    return len(dead)
+
+
+def complete(job: dict) -> bool:
+    """Tandai selesai. False kalau lease sudah diambil alih worker lain (tidak diubah)."""
+    with db.get_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE jobs
+            SET status = 'done', locked_by = NULL, locked_at = NULL,
+                last_error = NULL, updated_at = ?
+            WHERE id = ? AND status = 'running' AND locked_by = ?
+            """,
+            (_now_iso(), job["id"], job.get("locked_by")),
+        )
+    return cur.rowcount == 1
+
+
+def fail(job: dict, error: str) -> bool:
+    """
+    Catat kegagalan. Kembalikan True kalau job dijadwalkan ulang,
+    False kalau sudah habis jatah percobaan (status 'failed') atau lease
+    sudah diambil alih worker lain (job tidak diubah).
+    """
+    retry = job["attempts"] < job["max_attempts"]
+    with db.get_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE jobs
+            SET status = ?, run_after = ?, locked_by = NULL, locked_at = NULL,
+                last_error = ?, updated_at = ?
+            WHERE id = ? AND status = 'running' AND locked_by = ?
+            """,
+            (
+                "queued" if retry else "failed",
+                time.time() + (backoff_delay(job["attempts"]) if retry else 0),
+                error[-2000:],
+                _now_iso(),
+                job["id"],
+                job.get("locked_by"),
+            ),
+        )
+    return retry and cur.rowcount == 1
+
+
+def jobs_for_letter(letter_id: int):
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE letter_id = ? ORDER BY id", (letter_id,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def queue_stats() -> Dict[str, int]:
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+        ).fetchall()
+    return {r["status"]: r["n"] for r in rows}
+
+
+# -------------------------------------------------
+# 2. Worker pool (thread daemon, satu per proses)
+# -------------------------------------------------
+_wake = threading.Event()
+
+
+class WorkerPool:
+    def __init__(self, size: int = WORKER_COUNT):
+        self.size = size
+        self.prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(
+                target=self._run,
+                args=(f"{self.prefix}-{i}",),
+                name=f"tirtaflow-worker-{i}",
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        _wake.set()
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = claim(worker_id)
+            except Exception:
+                # DB sibuk / belum siap → coba lagi nanti
+                job = None
+
+            if job is None:
+                _wake.wait(POLL_INTERVAL)
+                _wake.clear()
+                continue
+
+            run_job(job)
+
+
+def run_job(job: dict):
+    handler = HANDLERS.get(job["kind"])
+    if handler is None:
+        fail({**job, "max_attempts": 0}, f"Tidak ada handler untuk job '{job['kind']}'")
+        return
+
+    stop = threading.Event()
+    lost = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job, stop, lost), name=f"tirtaflow-lease-{job['id']}", daemon=True
+    )
+    heartbeat.start()
+    try:
+        handler(job)
+    except Exception as e:
+        if not lost.is_set():
+            fail(job, f"{e}\n{traceback.format_exc()}")
+        return
+    finally:
+        stop.set()
+
+    # lease hilang → job sudah dijalankan worker lain; hasil worker ini diabaikan
+    if not lost.is_set():
+        complete(job)
+
+
+def _heartbeat(job: dict, stop: threading.Event, lost: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            if not renew_lease(job):
+                lost.set()
+                return
+        except Exception:
+            # DB sibuk sesaat → coba lagi di detak berikutnya (lease masih 4× interval)
+            pass
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def ensure_workers(size: int = WORKER_COUNT) -> WorkerPool:
+    """Start worker pool sekali per proses (aman dipanggil di setiap rerun)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db.init_db()
+                requeue_orphans()
+                # daftar handler bawaan
+                import utils.export  # noqa: F401
+                import utils.pipeline  # noqa: F401
+                import utils.preview  # noqa: F401
+
+                _pool = WorkerPool(size)
+                _pool.start()
+    return _pool
@@ -0,0 +1,204 @@
+# utils/metrics.py
+#
+# Instrumentasi ringan per tahap pipeline (pra-proses, OCR, AI, simpan DB,
+# request API eksternal):
+#
+#   with metrics.timer("ocr"):                ← context manager
+#       ...
+#   @metrics.timed("api.groq")                ← decorator
+#   def panggil(...): ...
+#   with metrics.letter(letter_id):           ← timer di dalamnya tercatat untuk surat ini
+#       ...
+#
+# - Catatan ditampung di memori lalu ditulis ke tabel stage_timings (migrasi 13)
+#   sekaligus per FLUSH_EVERY baris / FLUSH_SECONDS detik → satu executemany,
+#   bukan satu transaksi per timer.
+# - Exception tetap dilempar ulang; tahapnya tercatat ok=0 + nama exception.
+# - METRICS_ENABLED=0 (atau set_enabled(False) dari halaman Metrik) → timer
+#   langsung lewat tanpa mencatat apa pun.
+# - letter() disimpan di contextvar: thread pool yang menjalankan tugas lewat
+#   contextvars.copy_context().run (map-reduce AI, OCR per halaman PDF) ikut
+#   mencatat letter_id. Sisa buffer ditulis saat proses keluar (atexit).
+
+import atexit
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import db
+from utils.config import get_secret
+
+FLUSH_EVERY = 50
+FLUSH_SECONDS = 5.0
+PERCENTILES = (50, 95, 99)
+
+_enabled: Optional[bool] = None
+_buffer: List[tuple] = []
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+_letter_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("metrics_letter_id", default=None)
+
+
+# -------------------------------------------------
+# 1. Saklar
+# -------------------------------------------------
+def enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = str(get_secret("METRICS_ENABLED", "1")) == "1"
+    return _enabled
+
+
+def set_enabled(value: bool):
+    """Nyalakan/matikan pencatatan untuk proses ini (tanpa restart)."""
+    global _enabled
+    _enabled = bool(value)
+    if not value:
+        flush()
+
+
+# -------------------------------------------------
+# 2. Timer
+# -------------------------------------------------
+@contextmanager
+def letter(letter_id: Optional[int]):
+    """Timer di dalam blok ini (dan tugas yang membawa context-nya) tercatat untuk letter_id."""
+    token = _letter_id.set(letter_id)
+    try:
+        yield
+    finally:
+        _letter_id.reset(token)
+
+
+@contextmanager
+def timer(stage: str, letter_id: Optional[int] = None):
+    if not enabled():
+        yield
+        return
+    started = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record(stage, (time.perf_counter() - t0) * 1000, letter_id, error, started)
+
+
+def timed(stage: str):
+    """Decorator: seluruh pemanggilan fungsi dicatat sebagai `stage`."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def record(stage: str, ms: float, letter_id: Optional[int] = None,
+           error: Optional[str] = None, started: Optional[float] = None):
+    global _last_flush
+    if letter_id is None:
+        letter_id = _letter_id.get()
+    row = (letter_id, stage, started or time.time(), round(ms, 3), 0 if error else 1, error)
+    with _buffer_lock:
+        _buffer.append(row)
+        due = len(_buffer) >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def flush():
+    """Tulis semua catatan yang masih di memori ke SQLite."""
+    global _buffer, _last_flush
+    with _buffer_lock:
+        rows, _buffer = _buffer, []
+        _last_flush = time.monotonic()
+    if not rows:
+        return
+    try:
+        db.record_stage_timings(rows)
+    except Exception:
+        # metrik tidak boleh menggagalkan pipeline (DB sibuk, migrasi belum jalan, ...)
+        pass
+
+
+atexit.register(flush)
+
+
+# -------------------------------------------------
+# 3. Ringkasan (halaman Metrik)
+# -------------------------------------------------
+def summarize(since: float) -> List[Dict]:
+    """Per tahap: jumlah, error rate, throughput/jam, p50/p95/p99 & rata-rata (ms)."""
+    flush()
+    hours = max((time.time() - since) / 3600, 1e-9)
+    out = []
+    for stage, (_, ms, ok) in db.stage_samples(since).items():
+        ms = np.asarray(ms, dtype=float)
+        ok = np.asarray(ok, dtype=bool)
+        p = np.percentile(ms[ok], PERCENTILES) if ok.any() else [float("nan")] * len(PERCENTILES)
+        out.append({
+            "stage": stage,
+            "count": int(ms.size),
+            "errors": int((~ok).sum()),
+            "error_rate": float((~ok).mean()),
+            "per_hour": ms.size / hours,
+            **{f"p{q}_ms": float(v) for q, v in zip(PERCENTILES, p)},
+            "mean_ms": float(ms[ok].mean()) if ok.any() else float("nan"),
+        })
+    return sorted(out, key=lambda r: r["stage"])
+
+
+def histogram(stage: str, since: float, bins: int = 20):
+    """(batas bin ms, jumlah) dengan bin logaritmik — latency biasanya berekor panjang."""
+    flush()
+    samples = db.stage_samples(since, stage=stage).get(stage)
+    if not samples:
+        return np.array([]), np.array([])
+    _, ms, ok = samples
+    ms = np.asarray(ms, dtype=float)[np.asarray(ok, dtype=bool)]
+    if ms.size == 0:
+        return np.array([]), np.array([])
+    lo = max(ms.min(), 0.01)
+    edges = np.geomspace(lo, max(ms.max(), lo * 1.01), bins + 1)
+    counts, edges = np.histogram(ms, bins=edges)
+    return edges, counts
+
+
+def series(since: float, bucket_seconds: int, stages=None) -> List[Dict]:
+    """Per (bucket waktu, tahap): jumlah, error, p95 ms — untuk grafik dari waktu ke waktu."""
+    flush()
+    out = []
+    for stage, (started, ms, ok) in db.stage_samples(since).items():
+        if stages is not None and stage not in stages:
+            continue
+        started = np.asarray(started, dtype=float)
+        ms = np.asarray(ms, dtype=float)
+        ok = np.asarray(ok, dtype=bool)
+        buckets = (started // bucket_seconds).astype(np.int64)
+        for b in np.unique(buckets):
+            sel = buckets == b
+            good = ms[sel & ok]
+            out.append({
+                "time": float(b * bucket_seconds),
+                "stage": stage,
+                "count": int(sel.sum()),
+                "errors": int((sel & ~ok).sum()),
+                "p95_ms": float(np.percentile(good, 95)) if good.size else float("nan"),
+            })
+    return out
+
+
+def timings_for_letter(letter_id: int) -> List[Dict]:
+    """Semua tahap satu surat (termasuk yang masih di buffer proses ini)."""
+    flush()
+    return db.stage_timings_for_letter(letter_id)
@@ -1,6 +1,238 @@
 # utils/ocr.py
+#
+# Klien OCR.Space:
+# - requests.Session per (api_key, url) → koneksi keep-alive dipakai ulang,
+#   tidak ada TCP+TLS handshake baru untuk setiap surat.
+# - Retry otomatis (5xx, 429, koneksi putus, timeout) dengan exponential
+#   backoff + jitter.
+# - Circuit breaker: kalau OCR.Space gagal terus, request berikutnya langsung
+#   ditolak selama beberapa detik alih-alih menunggu timeout satu per satu.
+# - Varian async (httpx.AsyncClient) untuk batch dengan banyak request
+#   sekaligus: lihat AsyncOCRSpaceClient / ocr_files_concurrently.
 
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import get_secret
+
+OCR_URL = "https://api.ocr.space/parse/image"
+MAX_OCR_SIZE = 1024 * 1024  # 1 MB, batas OCR.Space
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """OCR.Space sedang dianggap down; request ditolak tanpa dikirim."""
+
+
+class CircuitBreaker:
+    """
+    closed → (failure_threshold kegagalan beruntun) → open
+    open   → (reset_timeout detik) → half-open: 1 request percobaan
+    half-open sukses → closed, gagal → open lagi
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half-open" and self._trial_running):
+                wait = self.reset_timeout - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(
+                    f"OCR.Space sementara tidak tersedia (circuit open, coba lagi ±{max(wait, 0):.0f} detik)."
+                )
+            if state == "half-open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class RetryableOCRError(RuntimeError):
+    pass
+
+
+class OCRServiceError(RuntimeError):
+    """Error yang dilaporkan OCR.Space sendiri (file rusak, quota, dsb.): layanan sehat, tidak di-retry."""
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff dengan full jitter: acak 0..min(cap, base*2^attempt)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _form_data(language: str) -> Dict:
+    return {
+        "language": language,
+        "isTable": False,
+        "scale": True,
+        "OCREngine": 2,
+    }
+
+
+def _parse_response(status_code: int, payload_fn) -> str:
+    if status_code in RETRY_STATUS:
+        raise RetryableOCRError(f"OCR HTTP {status_code}")
+    try:
+        data = payload_fn()
+    except ValueError as e:
+        raise RuntimeError(f"OCR response bukan JSON (HTTP {status_code}).") from e
+
+    if data.get("IsErroredOnProcessing"):
+        msg = data.get("ErrorMessage") or []
+        if isinstance(msg, str):
+            msg = [msg]
+        raise OCRServiceError(f"OCR error: {'; '.join(msg)}")
+
+    results = data.get("ParsedResults") or []
+    text = "\n".join([r.get("ParsedText", "") for r in results])
+    return text.strip()
+
+
+def _read_file(file_path: str) -> Tuple[str, bytes]:
+    with open(file_path, "rb") as f:
+        return os.path.basename(file_path), f.read()
+
+
+# -------------------------------------------------
+# 1. Klien sinkron (requests.Session + keep-alive)
+# -------------------------------------------------
+class OCRSpaceClient:
+    def __init__(
+        self,
+        api_key: str,
+        url: str = OCR_URL,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 20.0,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["apikey"] = api_key
+
+    def ocr_file(self, file_path: str, language: str = "eng") -> str:
+        name, content = _read_file(file_path)
+        return self.ocr_bytes(content, name, language)
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1, self.backoff_base, self.backoff_max))
+
+            self.breaker.before_call()
+            try:
+                res = self.session.post(
+                    self.url,
+                    files={"file": (filename, content)},
+                    data=_form_data(language),
+                    timeout=self.timeout,
+                )
+                text = _parse_response(res.status_code, res.json)
+            except requests.exceptions.Timeout as e:
+                last_error = RuntimeError(f"OCR timeout (melewati {self.timeout:g} detik).")
+                last_error.__cause__ = e
+            except (requests.exceptions.ConnectionError, RetryableOCRError) as e:
+                last_error = RuntimeError(f"OCR request error: {e}")
+                last_error.__cause__ = e
+            except OCRServiceError:
+                # error dari OCR.Space sendiri (file rusak, quota, dsb.) → tidak di-retry
+                self.breaker.record_success()
+                raise
+            except RuntimeError:
+                # mis. halaman error HTML dari proxy/gateway → layanan bermasalah
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                raise RuntimeError(f"OCR request error: {e}") from e
+            else:
+                self.breaker.record_success()
+                return text
+
+            self.breaker.record_failure()
+
+        raise last_error
+
+    def close(self):
+        self.session.close()
+
+
+_clients: Dict[Tuple, OCRSpaceClient] = {}
+_clients_lock = threading.Lock()
+
+
+def client_config() -> Dict:
+    return {
+        "url": get_secret("OCR_SPACE_URL", OCR_URL),
+        "max_retries": int(get_secret("OCR_MAX_RETRIES", 3)),
+        "backoff_base": float(get_secret("OCR_BACKOFF_BASE", 1.0)),
+    }
+
+
+def get_client(api_key: str, timeout: float = 30) -> OCRSpaceClient:
+    """Klien bersama per proses (satu pool koneksi per api_key/timeout/konfigurasi)."""
+    cfg = client_config()
+    # seluruh konfigurasi ikut di key → OCR_MAX_RETRIES/OCR_BACKOFF_BASE baru langsung berlaku
+    key = (api_key, timeout, *sorted(cfg.items()))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OCRSpaceClient(api_key, timeout=timeout, **cfg)
+                _clients[key] = client
+    return client
+
 
 def ocr_space_file(
     file_path: str,
@@ -10,35 +242,119 @@ def ocr_space_file(
 ) -> str:
     """
     Panggil OCR.Space untuk melakukan OCR pada file di file_path.
-    Timeout default 30 detik. Kalau gagal / timeout, akan raise RuntimeError.
+    Timeout default 30 detik. Kalau gagal / timeout (setelah retry), akan raise RuntimeError.
     """
-    url = "https://api.ocr.space/parse/image"
+    return get_client(api_key, timeout).ocr_file(file_path, language=language)
 
-    try:
-        with open(file_path, "rb") as f:
-            res = requests.post(
-                url,
-                files={"file": f},
-                data={
-                    "language": language,
-                    "isTable": False,
-                    "scale": True,
-                    "OCREngine": 2,
-                },
-                headers={"apikey": api_key},
-                timeout=timeout,
-            )
-    except requests.exceptions.Timeout as e:
-        raise RuntimeError("OCR timeout (melewati 30 detik).") from e
-    except Exception as e:
-        raise RuntimeError(f"OCR request error: {e}") from e
-
-    data = res.json()
 
-    if data.get("IsErroredOnProcessing"):
-        msg = "; ".join(data.get("ErrorMessage") or [])
-        raise RuntimeError(f"OCR error: {msg}")
+# -------------------------------------------------
+# 2. Klien async (httpx.AsyncClient) untuk banyak request sekaligus
+# -------------------------------------------------
+class AsyncOCRSpaceClient:
+    """
+    Pakai di dalam event loop:
 
-    results = data.get("ParsedResults") or []
-    text = "\n".join([r.get("ParsedText", "") for r in results])
-    return text.strip()
+        async with AsyncOCRSpaceClient(api_key) as client:
+            text = await client.ocr_file("surat.pdf")
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        url: str = OCR_URL,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 20.0,
+        max_connections: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            headers={"apikey": api_key},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def ocr_file(self, file_path: str, language: str = "eng") -> str:
+        name, content = await asyncio.to_thread(_read_file, file_path)
+        return await self.ocr_bytes(content, name, language)
+
+    async def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1, self.backoff_base, self.backoff_max))
+
+            self.breaker.before_call()
+            try:
+                res = await self.client.post(
+                    self.url,
+                    files={"file": (filename, content)},
+                    data={k: str(v) for k, v in _form_data(language).items()},
+                )
+                text = _parse_response(res.status_code, res.json)
+            except httpx.TimeoutException as e:
+                last_error = RuntimeError(f"OCR timeout (melewati {self.timeout:g} detik).")
+                last_error.__cause__ = e
+            except (httpx.TransportError, RetryableOCRError) as e:
+                last_error = RuntimeError(f"OCR request error: {e}")
+                last_error.__cause__ = e
+            except OCRServiceError:
+                self.breaker.record_success()
+                raise
+            except RuntimeError:
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                raise RuntimeError(f"OCR request error: {e}") from e
+            else:
+                self.breaker.record_success()
+                return text
+
+            self.breaker.record_failure()
+
+        raise last_error
+
+
+async def ocr_many_async(
+    file_paths: List[str],
+    api_key: str,
+    language: str = "eng",
+    concurrency: int = 8,
+    **client_kwargs,
+) -> List:
+    """OCR banyak file dengan maksimal `concurrency` request in-flight. Hasil: teks atau Exception."""
+    sem = asyncio.Semaphore(concurrency)
+    cfg = {**client_config(), **client_kwargs}
+
+    async with AsyncOCRSpaceClient(api_key, max_connections=concurrency, **cfg) as client:
+
+        async def one(path):
+            async with sem:
+                return await client.ocr_file(path, language=language)
+
+        return await asyncio.gather(*(one(p) for p in file_paths), return_exceptions=True)
+
+
+def ocr_files_concurrently(file_paths: List[str], api_key: str, language: str = "eng",
+                           concurrency: int = 8, **client_kwargs) -> List:
+    """Pembungkus sinkron ocr_many_async (untuk dipanggil dari thread script / worker)."""
+    return asyncio.run(
+        ocr_many_async(file_paths, api_key, language, concurrency, **client_kwargs)
+    )
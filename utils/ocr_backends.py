@@ -0,0 +1,204 @@
+# utils/ocr_backends.py
+#
+# Backend OCR yang bisa dipilih lewat config (OCR_BACKENDS, urutan = prioritas):
+#   ocrspace  : OCR.Space (utils/ocr.py — keep-alive, retry, circuit breaker)
+#   tesseract : engine lokal/offline, subprocess `tesseract` dengan jumlah
+#               proses paralel terbatas (TESSERACT_WORKERS)
+#   fake      : deterministik tanpa jaringan, untuk uji & benchmark
+#
+# Contoh: OCR_BACKENDS="ocrspace,tesseract" → pakai OCR.Space, kalau gagal
+# (quota habis, timeout, circuit open) otomatis jatuh ke Tesseract.
+# Backend yang tidak bisa dipakai di mesin ini (API key kosong, binary
+# tesseract tidak ada) dilewati.
+
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils import metrics
+from utils.config import get_secret
+from utils.ocr import MAX_OCR_SIZE, _read_file, get_client
+
+DEFAULT_BACKENDS = "ocrspace"
+
+
+class OCRBackend:
+    """Antarmuka backend: ocr_bytes wajib; ocr_file membaca file lalu memanggil ocr_bytes."""
+
+    name = "base"
+    max_bytes: Optional[int] = None      # batas ukuran input (None = bebas)
+
+    def available(self) -> bool:
+        return True
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        raise NotImplementedError
+
+    def ocr_file(self, file_path: str, language: str = "eng") -> str:
+        name, content = _read_file(file_path)
+        return self.ocr_bytes(content, name, language)
+
+
+# -------------------------------------------------
+# 1. Implementasi
+# -------------------------------------------------
+class OCRSpaceBackend(OCRBackend):
+    name = "ocrspace"
+    max_bytes = MAX_OCR_SIZE
+
+    def __init__(self, api_key: Optional[str], timeout: float = 30):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        with metrics.timer("api.ocrspace"):
+            return get_client(self.api_key, self.timeout).ocr_bytes(content, filename, language=language)
+
+
+class TesseractBackend(OCRBackend):
+    """
+    `tesseract stdin stdout` per gambar. Tiap proses dibatasi 1 thread OpenMP;
+    paralelisme diatur dengan menjalankan beberapa proses sekaligus (lebih
+    efisien daripada satu proses multi-thread untuk banyak halaman kecil).
+    Bahasa memakai kode Tesseract (TESSERACT_LANG, default ind+eng), bukan
+    kode OCR.Space yang dioper pemanggil.
+    """
+
+    name = "tesseract"
+
+    def __init__(self, lang: str = "ind+eng", workers: Optional[int] = None,
+                 timeout: float = 120, binary: str = "tesseract"):
+        self.lang = lang
+        self.timeout = timeout
+        self.binary = shutil.which(binary)
+        self._slots = threading.BoundedSemaphore(workers or os.cpu_count() or 1)
+
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        if not self.binary:
+            raise RuntimeError("Binary tesseract tidak ditemukan di PATH.")
+        with self._slots, metrics.timer("api.tesseract"):
+            try:
+                proc = subprocess.run(
+                    [self.binary, "stdin", "stdout", "-l", self.lang, "--psm", "3"],
+                    input=content,
+                    capture_output=True,
+                    timeout=self.timeout,
+                    env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+                )
+            except subprocess.TimeoutExpired as e:
+                raise RuntimeError(f"Tesseract timeout (melewati {self.timeout:g} detik).") from e
+        if proc.returncode != 0:
+            err = proc.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(f"Tesseract error: {err[-1] if err else proc.returncode}")
+        return proc.stdout.decode("utf-8", "replace").strip()
+
+
+class FakeBackend(OCRBackend):
+    """Teks deterministik dari hash isi file (+ latency buatan); fail=True → selalu gagal."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, fail: bool = False, text: Optional[str] = None):
+        self.latency = latency
+        self.fail = fail
+        self.text = text
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("Fake OCR gagal (disengaja).")
+        if self.text is not None:
+            return self.text
+        digest = hashlib.sha1(content).hexdigest()
+        return (
+            f"Nomor: {int(digest[:6], 16) % 1000:03d}/{int(digest[6:10], 16) % 9999}\n"
+            f"Hal: Surat {filename}\n"
+            f"Isi {len(content)} byte, sidik {digest[:12]}."
+        )
+
+
+class FallbackBackend(OCRBackend):
+    """Coba backend berurutan; error satu backend → lanjut ke berikutnya."""
+
+    name = "fallback"
+
+    def __init__(self, backends: List[OCRBackend]):
+        self.backends = backends
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        limits = [b.max_bytes for b in self.backends if b.max_bytes]
+        return min(limits) if limits else None
+
+    def available(self) -> bool:
+        return bool(self.backends)
+
+    def ocr_bytes(self, content: bytes, filename: str, language: str = "eng") -> str:
+        if not self.backends:
+            raise RuntimeError(
+                "Tidak ada backend OCR yang bisa dipakai (cek OCR_SPACE_API_KEY / OCR_BACKENDS)."
+            )
+        errors = []
+        for backend in self.backends:
+            if backend.max_bytes and len(content) > backend.max_bytes:
+                errors.append(f"{backend.name}: file melebihi {backend.max_bytes // 1024} KB")
+                continue
+            try:
+                text = backend.ocr_bytes(content, filename, language)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+                continue
+            return text
+        raise RuntimeError("Semua backend OCR gagal — " + " | ".join(errors))
+
+
+# -------------------------------------------------
+# 2. Pemilihan backend dari config
+# -------------------------------------------------
+def create_backend(name: str, api_key: Optional[str] = None) -> OCRBackend:
+    name = name.strip().lower()
+    if name == "ocrspace":
+        return OCRSpaceBackend(api_key or get_secret("OCR_SPACE_API_KEY"))
+    if name == "tesseract":
+        return TesseractBackend(
+            lang=get_secret("TESSERACT_LANG", "ind+eng"),
+            workers=int(get_secret("TESSERACT_WORKERS", os.cpu_count() or 1)),
+            timeout=float(get_secret("TESSERACT_TIMEOUT", 120)),
+        )
+    if name == "fake":
+        return FakeBackend(latency=float(get_secret("FAKE_OCR_LATENCY", 0)))
+    raise ValueError(f"Backend OCR tidak dikenal: {name}")
+
+
+_backends: Dict[Tuple, FallbackBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def backend_names() -> List[str]:
+    return [n.strip().lower() for n in str(get_secret("OCR_BACKENDS", DEFAULT_BACKENDS)).split(",") if n.strip()]
+
+
+def get_backend(api_key: Optional[str] = None) -> FallbackBackend:
+    """Rantai backend sesuai OCR_BACKENDS (dibuat sekali per proses per config)."""
+    names = tuple(backend_names())
+    key = (names, api_key)
+    chain = _backends.get(key)
+    if chain is None:
+        with _backends_lock:
+            chain = _backends.get(key)
+            if chain is None:
+                backends = [create_backend(n, api_key) for n in names]
+                chain = FallbackBackend([b for b in backends if b.available()])
+                _backends[key] = chain
+    return chain
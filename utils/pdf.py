@@ -0,0 +1,113 @@
+# utils/pdf.py
+#
+# OCR PDF multi-halaman per halaman (bukan satu file utuh ke OCR.Space, yang
+# kena batas 1 MB / timeout / teks terpotong untuk PDF besar):
+#   - halaman yang sudah punya text layer (PDF digital, atau scan yang sudah
+#     di-OCR scanner) → teks diambil lokal, tanpa request OCR
+#   - halaman gambar saja → dirender ke gambar, dipra-proses seperti upload
+#     gambar (utils/preprocess.py), lalu di-OCR (utils/ocr_backends.py)
+#     paralel dengan concurrency terbatas → total waktu ≈ halaman paling
+#     lambat, bukan jumlah semua halaman
+#   - teks disusun ulang sesuai urutan halaman
+#
+# Butuh pypdfium2 (opsional, `pip install pypdfium2`). Tanpa library itu
+# available() False dan PDF dikirim utuh ke OCR seperti sebelumnya.
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Tuple
+
+from utils import preprocess
+from utils.config import get_secret
+
+PDF_MIME = "application/pdf"
+RENDER_DPI = 200
+TEXT_LAYER_MIN_CHARS = 25      # lebih sedikit → anggap halaman gambar (header/nomor halaman saja)
+PAGE_SEPARATOR = "\n\n"
+
+
+def available() -> bool:
+    try:
+        import pypdfium2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def pdf_config() -> Dict:
+    return {
+        "concurrency": int(get_secret("PDF_OCR_CONCURRENCY", 4)),
+        "dpi": int(get_secret("PDF_RENDER_DPI", RENDER_DPI)),
+    }
+
+
+def _has_text_layer(text: str) -> bool:
+    return sum(ch.isalnum() for ch in text) >= TEXT_LAYER_MIN_CHARS
+
+
+def _ocr_page(image, page_no: int, backend, max_bytes: int, options: Dict,
+              language: str, limiter) -> str:
+    data, _ = preprocess.preprocess_image(image, max_bytes, options)
+    ext = "png" if options.get("binarize") else "jpg"
+    with limiter or nullcontext():
+        return backend.ocr_bytes(data, f"halaman_{page_no}.{ext}", language=language)
+
+
+def extract_text(file_path: str, backend, max_bytes: int,
+                 language: str = "eng", limiter=None) -> Tuple[str, Dict]:
+    """
+    Teks seluruh PDF, urut halaman. Kembalikan (teks, statistik).
+    backend: OCRBackend (utils/ocr_backends.py), hanya dipanggil untuk halaman gambar.
+    limiter: context manager opsional per request OCR (mis. TokenBucket batch).
+    """
+    import pypdfium2 as pdfium
+
+    started = time.perf_counter()
+    cfg = pdf_config()
+    options = preprocess.preprocess_config()
+    texts: Dict[int, str] = {}
+    futures = {}
+
+    # pdfium tidak thread-safe → baca & render di thread ini saja; yang paralel
+    # hanya pra-proses + request OCR (render halaman berikutnya jalan sambil
+    # halaman sebelumnya menunggu OCR)
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, cfg["concurrency"]),
+                                thread_name_prefix="tirtaflow-pdf") as ex:
+            for i in range(len(pdf)):
+                page = pdf[i]
+                try:
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range().strip()
+                    textpage.close()
+                    if _has_text_layer(text):
+                        texts[i] = text
+                        continue
+                    image = page.render(scale=cfg["dpi"] / 72, grayscale=True).to_pil()
+                finally:
+                    page.close()
+                # copy_context: timer OCR di thread halaman tercatat untuk surat yang sama
+                futures[i] = ex.submit(
+                    contextvars.copy_context().run,
+                    _ocr_page, image, i + 1, backend, max_bytes, options, language, limiter,
+                )
+
+            for i, fut in futures.items():
+                try:
+                    texts[i] = (fut.result() or "").strip()
+                except Exception as e:
+                    raise RuntimeError(f"OCR halaman {i + 1} gagal: {e}") from e
+        pages = len(pdf)
+    finally:
+        pdf.close()
+
+    stats = {
+        "pages": pages,
+        "text_pages": pages - len(futures),
+        "ocr_pages": len(futures),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    return PAGE_SEPARATOR.join(texts[i] for i in sorted(texts) if texts[i]), stats
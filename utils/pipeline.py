@@ -0,0 +1,210 @@
+# utils/pipeline.py
+#
+# Pipeline surat masuk yang dijalankan worker background (utils/jobs.py):
+#   file tersimpan → pra-proses gambar / PDF per halaman → OCR (OCR_BACKENDS) → analisa Groq → update tabel letters
+#
+# Status surat selama proses:
+#   Pending → OCR Diproses → OCR Selesai → Analisa AI → Analisa Selesai
+#   (OCR Gagal kalau OCR tetap gagal setelah semua retry)
+
+import os
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+
+import db
+from utils import cache, dedup, metrics, pdf, preprocess, storage
+from utils.ai import TokenUsage, analyse_text_with_groq, get_model, stream_enabled
+from utils.config import get_secret
+from utils.jobs import enqueue, register
+from utils.ocr import MAX_OCR_SIZE
+from utils.ocr_backends import get_backend
+
+JOB_KIND = "ocr_ai"
+
+STATUS_PENDING = "Pending"
+STATUS_OCR_RUNNING = "OCR Diproses"
+STATUS_OCR_DONE = "OCR Selesai"
+STATUS_OCR_FAILED = "OCR Gagal"
+STATUS_AI_RUNNING = "Analisa AI"
+STATUS_DONE = "Analisa Selesai"
+
+IMAGE_TYPES = ("image/jpeg", "image/jpg", "image/png")
+
+# Field AI yang sedang di-stream per surat (worker jalan di proses Streamlit
+# yang sama → halaman Upload bisa menampilkannya sebelum tersimpan ke DB)
+_live_fields = {}
+_live_lock = threading.Lock()
+
+
+def live_fields(letter_id: int) -> dict:
+    with _live_lock:
+        return dict(_live_fields.get(letter_id, {}))
+
+
+def _set_live_field(letter_id: int, key: str, value):
+    with _live_lock:
+        _live_fields.setdefault(letter_id, {})[key] = value
+
+
+@metrics.timed("preprocess")
+def prepare_ocr_input(file_path: str, mime: str, digest: str = None) -> str:
+    """
+    Pra-proses gambar (EXIF, grayscale, deskew, kompres <1MB; lihat utils/preprocess.py)
+    di process pool; kembalikan path untuk OCR. Kalau digest (hash blob) diberikan,
+    hasilnya disimpan sebagai turunan blob dan dipakai ulang.
+    """
+    if mime not in IMAGE_TYPES:
+        # PDF tanpa pypdfium2 → kirim file asli (lihat run_ocr)
+        return file_path
+
+    options = preprocess.preprocess_config()
+    enhance = options["grayscale"] or options["deskew"] or options["binarize"]
+    if not enhance and os.path.getsize(file_path) <= MAX_OCR_SIZE:
+        # gambar kecil & pra-proses dimatikan → pakai file asli
+        return file_path
+
+    suffix = preprocess.output_suffix(options)
+    if digest:
+        temp_path = storage.derived_path(digest, suffix)
+        if temp_path.exists():
+            return str(temp_path)
+    else:
+        src = Path(file_path)
+        temp_path = src.with_name(f"compressed_{src.name}.{suffix}")
+
+    preprocess.run(file_path, temp_path, MAX_OCR_SIZE, options)
+    return str(temp_path)
+
+
+@metrics.timed("ocr")
+def run_ocr(file_path: str, mime: str, digest: str = None, api_key: str = None,
+            limiter=None) -> str:
+    """
+    Teks OCR satu file lewat rantai backend OCR_BACKENDS (utils/ocr_backends.py).
+    PDF dipecah per halaman (utils/pdf.py): text layer diambil lokal, halaman
+    gambar di-OCR paralel. Gambar → pra-proses → OCR.
+    limiter: context manager opsional per request OCR (rate limit batch).
+    """
+    backend = get_backend(api_key)
+    if mime == pdf.PDF_MIME and pdf.available():
+        text, _ = pdf.extract_text(file_path, backend, MAX_OCR_SIZE, language="eng", limiter=limiter)
+        return text
+
+    ocr_input_path = prepare_ocr_input(file_path, mime, digest)
+    with limiter or nullcontext():
+        return backend.ocr_file(ocr_input_path, language="eng")
+
+
+def submit_letter(letter_id: int, file_path: str, mime: str, digest: str = None) -> int:
+    """
+    Jadwalkan OCR + AI untuk surat yang sudah tersimpan dengan status Pending.
+    digest = hash isi file kalau pemanggil sudah cek cache (lihat utils/cache.py).
+    """
+    return enqueue(
+        JOB_KIND,
+        payload={"file_path": file_path, "mime": mime, "content_hash": digest},
+        letter_id=letter_id,
+    )
+
+
+def flag_duplicates(letter_id: int, ocr_text: str):
+    """Index teks OCR ke MinHash/LSH; gagal di sini tidak boleh menggagalkan pipeline."""
+    try:
+        return dedup.check_letter(letter_id, ocr_text)
+    except Exception:
+        return []
+
+
+@register(JOB_KIND)
+def process_letter_job(job: dict):
+    # semua timer di dalamnya (pra-proses, OCR, AI, API) tercatat untuk surat ini
+    with metrics.letter(job["letter_id"]), metrics.timer("job.ocr_ai"):
+        _process_letter(job)
+
+
+def _process_letter(job: dict):
+    letter_id = job["letter_id"]
+    payload = job["payload"]
+    last_attempt = job["attempts"] >= job["max_attempts"]
+
+    letter = db.get_letter_by_id(letter_id)
+    if letter is None:
+        # surat sudah dihapus → tidak ada yang perlu diproses
+        return
+
+    # ── Cache per hash isi file: upload ulang file identik tidak bayar OCR/AI lagi ──
+    digest = payload.get("content_hash")
+    cached = cache.lookup(digest, count=False) if digest else None
+    if digest is None:
+        digest = cache.content_hash(path=payload["file_path"])
+        cached = cache.lookup(digest)
+
+    ocr_text = letter.get("ocr_text")
+    if cached and cached["has_ai"]:
+        ai_result = cache.as_ai_result(cached)
+        db.update_letter(
+            letter_id,
+            ocr_text=cached["ocr_text"],
+            ai_nomor_pengirim=ai_result["nomor_surat_pengirim"],
+            ai_maksud=ai_result["maksud_surat"],
+            ai_rekomendasi=ai_result["rekomendasi_divisi"],
+            status=STATUS_DONE,
+        )
+        flag_duplicates(letter_id, cached["ocr_text"])
+        return
+    if cached and not ocr_text:
+        ocr_text = cached["ocr_text"]
+        db.update_letter(letter_id, ocr_text=ocr_text, status=STATUS_OCR_DONE)
+        flag_duplicates(letter_id, ocr_text)
+
+    # ── OCR (dilewati kalau percobaan sebelumnya / cache sudah punya teks) ──
+    if not ocr_text:
+        db.update_letter(letter_id, status=STATUS_OCR_RUNNING)
+        try:
+            ocr_text = run_ocr(
+                payload["file_path"],
+                payload.get("mime"),
+                digest,
+                api_key=get_secret("OCR_SPACE_API_KEY"),
+            )
+        except Exception:
+            db.update_letter(
+                letter_id,
+                status=STATUS_OCR_FAILED if last_attempt else STATUS_PENDING,
+            )
+            raise
+
+        if not ocr_text:
+            # OCR sukses tapi teks kosong → tidak ada yang bisa dianalisa
+            db.update_letter(letter_id, ocr_text="", status=STATUS_PENDING)
+            return
+
+        db.update_letter(letter_id, ocr_text=ocr_text, status=STATUS_OCR_DONE)
+        cache.store(digest, ocr_text)
+        flag_duplicates(letter_id, ocr_text)
+
+    # ── AI Analysis ──
+    db.update_letter(letter_id, status=STATUS_AI_RUNNING)
+    usage = TokenUsage()
+    on_field = (lambda k, v: _set_live_field(letter_id, k, v)) if stream_enabled() else None
+    try:
+        ai_result = analyse_text_with_groq(ocr_text, usage=usage, on_field=on_field)
+    except Exception:
+        db.update_letter(letter_id, status=STATUS_OCR_DONE)
+        with _live_lock:
+            _live_fields.pop(letter_id, None)
+        raise
+
+    db.record_ai_usage(letter_id, usage.as_dict(), model=get_model())
+
+    cache.store(digest, ocr_text, ai_result)
+    db.update_letter(
+        letter_id,
+        ai_nomor_pengirim=ai_result.get("nomor_surat_pengirim"),
+        ai_maksud=ai_result.get("maksud_surat"),
+        ai_rekomendasi=ai_result.get("rekomendasi_divisi"),
+        status=STATUS_DONE,
+    )
+    with _live_lock:
+        _live_fields.pop(letter_id, None)
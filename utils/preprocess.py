@@ -0,0 +1,239 @@
+# utils/preprocess.py
+#
+# Pra-proses gambar surat sebelum OCR:
+#   1. orientasi EXIF (foto HP sering tersimpan miring 90°)
+#   2. grayscale, opsional binarisasi (ambang Otsu)
+#   3. deskew: sudut kemiringan dicari lewat projection profile di thumbnail
+#   4. resize ke MAX_DIM lalu kompres di bawah batas ukuran OCR:
+#      satu kali encode kalau sudah muat, selain itu binary search kualitas
+#      JPEG (bukan turun 10 demi 10 dengan encode penuh tiap langkah).
+#
+# Semua kerja CPU jalan di process pool (run()) supaya tidak berebut GIL
+# dengan server Streamlit / worker thread lain.
+
+import io
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+MAX_DIM = 1500
+QUALITY_MAX = 85
+QUALITY_MIN = 30
+QUALITY_TOLERANCE = 8        # binary search berhenti kalau sisa rentang kualitas ≤ ini
+MAX_SKEW_DEG = 5.0
+SKEW_THUMB = 800             # sisi terpanjang thumbnail untuk estimasi sudut
+
+
+def preprocess_config() -> Dict:
+    """Opsi pra-proses dari secrets/env (OCR_GRAYSCALE, OCR_DESKEW, OCR_BINARIZE, PREPROCESS_WORKERS)."""
+    # import di sini: worker process pool tidak perlu ikut memuat streamlit
+    from utils.config import get_secret
+
+    def flag(name, default):
+        return str(get_secret(name, default)).strip().lower() in ("1", "true", "yes", "on")
+
+    return {
+        "grayscale": flag("OCR_GRAYSCALE", "1"),
+        "deskew": flag("OCR_DESKEW", "1"),
+        "binarize": flag("OCR_BINARIZE", "0"),
+        "workers": int(get_secret("PREPROCESS_WORKERS", 2)),
+    }
+
+
+def output_suffix(options: Dict) -> str:
+    """Akhiran file turunan; ikut berubah kalau opsi berubah (cache turunan tidak basi)."""
+    flags = "".join(
+        ch for ch, key in (("g", "grayscale"), ("d", "deskew"), ("b", "binarize")) if options.get(key)
+    )
+    ext = "png" if options.get("binarize") else "jpg"
+    return f"ocr-{flags or 'raw'}.{ext}"
+
+
+# -------------------------------------------------
+# 1. Langkah-langkah gambar
+# -------------------------------------------------
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    cum_w = np.cumsum(hist)
+    cum_mean = np.cumsum(hist * np.arange(256))
+    w0, w1 = cum_w, total - cum_w
+    valid = (w0 > 0) & (w1 > 0)
+    between = np.zeros(256)
+    mean0 = cum_mean[valid] / w0[valid]
+    mean1 = (cum_mean[-1] - cum_mean[valid]) / w1[valid]
+    between[valid] = w0[valid] * w1[valid] * (mean0 - mean1) ** 2
+    return int(np.argmax(between))
+
+
+def binarize(img: Image.Image) -> Image.Image:
+    gray = img.convert("L")
+    t = otsu_threshold(np.asarray(gray))
+    return gray.point(lambda v: 255 if v > t else 0, mode="1")
+
+
+def _profile_score(mask: Image.Image, angle: float) -> float:
+    rotated = np.asarray(mask.rotate(angle, resample=Image.NEAREST, expand=False, fillcolor=0))
+    rows = rotated.sum(axis=1, dtype=np.float64)
+    # baris teks yang lurus → profil "bergerigi" tajam → beda antar baris besar
+    return float(np.square(np.diff(rows)).sum())
+
+
+def estimate_skew(img: Image.Image, max_angle: float = MAX_SKEW_DEG) -> float:
+    """Sudut koreksi (derajat, untuk Image.rotate) yang membuat baris teks paling horizontal."""
+    gray = img.convert("L")
+    gray.thumbnail((SKEW_THUMB, SKEW_THUMB))
+    arr = np.asarray(gray)
+    t = otsu_threshold(arr)
+    mask = Image.fromarray(np.where(arr <= t, 255, 0).astype(np.uint8))
+
+    # kasar 1°, lalu halus 0.2° di sekitar yang terbaik
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 1.0)
+    best = max(coarse, key=lambda a: _profile_score(mask, a))
+    fine = np.arange(best - 1.0, best + 1.0 + 1e-9, 0.2)
+    return float(max(fine, key=lambda a: _profile_score(mask, a)))
+
+
+def deskew(img: Image.Image, angle: float) -> Image.Image:
+    if abs(angle) < 0.1:
+        return img
+    fill = 255 if img.mode in ("L", "1") else (255, 255, 255)
+    return img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+
+
+def encode_jpeg_under(img: Image.Image, max_bytes: int,
+                      q_hi: int = QUALITY_MAX, q_lo: int = QUALITY_MIN) -> Tuple[bytes, int, int]:
+    """
+    JPEG dengan kualitas setinggi mungkin yang masih ≤ max_bytes.
+    Kembalikan (data, quality, jumlah encode). Kalau di q_lo pun masih
+    kebesaran, gambar diperkecil lalu dicoba lagi.
+    """
+    encodes = 0
+
+    def encode(im, q):
+        nonlocal encodes
+        encodes += 1
+        buf = io.BytesIO()
+        im.save(buf, format="JPEG", quality=q, optimize=True)
+        return buf.getvalue()
+
+    while True:
+        data = encode(img, q_hi)
+        if len(data) <= max_bytes:
+            return data, q_hi, encodes
+
+        best, best_q = None, None
+        lo, hi = q_lo, q_hi - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            candidate = encode(img, mid)
+            if len(candidate) <= max_bytes:
+                best, best_q = candidate, mid
+                if hi - mid <= QUALITY_TOLERANCE:
+                    break
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        if best is not None:
+            return best, best_q, encodes
+
+        # q_lo pun tidak muat → perkecil sebanding akar rasio ukuran
+        scale = max(0.5, (max_bytes / len(candidate)) ** 0.5 * 0.95)
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+
+def encode_png_under(img: Image.Image, max_bytes: int) -> Tuple[bytes, int]:
+    encodes = 0
+    while True:
+        encodes += 1
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+        if buf.tell() <= max_bytes or max(img.size) < 200:
+            return buf.getvalue(), encodes
+        img = img.resize((int(img.width * 0.8), int(img.height * 0.8)), Image.NEAREST)
+
+
+# -------------------------------------------------
+# 2. Pipeline satu file (fungsi top-level → bisa dipanggil di process pool)
+# -------------------------------------------------
+def preprocess_image(img: Image.Image, max_bytes: int, options: Dict) -> Tuple[bytes, Dict]:
+    started = time.perf_counter()
+    info = {"skew": 0.0}
+
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("L") if options.get("grayscale") or options.get("binarize") else img.convert("RGB")
+
+    if max(img.size) > MAX_DIM:
+        img.thumbnail((MAX_DIM, MAX_DIM), Image.LANCZOS)
+
+    if options.get("deskew"):
+        info["skew"] = estimate_skew(img)
+        img = deskew(img, info["skew"])
+
+    if options.get("binarize"):
+        data, info["encodes"] = encode_png_under(binarize(img), max_bytes)
+        info["quality"] = None
+    else:
+        data, info["quality"], info["encodes"] = encode_jpeg_under(img, max_bytes)
+
+    info["size"] = img.size
+    info["bytes"] = len(data)
+    info["seconds"] = round(time.perf_counter() - started, 3)
+    return data, info
+
+
+def preprocess_file(src: str, dst: str, max_bytes: int, options: Dict) -> Dict:
+    """Baca src, pra-proses, tulis atomik ke dst. Kembalikan info (skew, quality, encodes, ...)."""
+    from utils.storage import atomic_write
+
+    with Image.open(src) as img:
+        data, info = preprocess_image(img, max_bytes, options)
+    atomic_write(Path(dst), data)
+    return info
+
+
+# -------------------------------------------------
+# 3. Process pool
+# -------------------------------------------------
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: aman dipakai dari proses yang punya banyak thread (Streamlit)
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def run(src: str, dst: str, max_bytes: int, options: Optional[Dict] = None,
+        timeout: float = 120) -> Dict:
+    """Jalankan preprocess_file di process pool (blocking untuk thread pemanggil saja)."""
+    options = options or preprocess_config()
+    try:
+        future = _get_executor(options.get("workers", 2)).submit(
+            preprocess_file, str(src), str(dst), max_bytes, options
+        )
+        return future.result(timeout=timeout)
+    except BrokenProcessPool:
+        # worker mati (OOM dsb.) → buat pool baru lain kali, kerjakan di proses ini sekarang
+        _reset_executor()
+        return preprocess_file(str(src), str(dst), max_bytes, options)
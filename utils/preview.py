@@ -0,0 +1,288 @@
+# utils/preview.py
+#
+# Gambar pratinjau surat (WebP kecil), disimpan sebagai turunan blob:
+#   data/blobs/derived/ab/abcd….thumb.webp     ← thumbnail daftar (±240 px)
+#   data/blobs/derived/ab/abcd….preview.webp   ← pratinjau halaman Detail (±1000 px)
+#
+# - Gambar: EXIF transpose lalu diperkecil. PDF: halaman pertama dirender
+#   lewat pypdfium2 (opsional; tanpa library itu PDF tidak punya pratinjau).
+# - Dibuat sekali saat pertama diminta, berikutnya langsung dibaca dari disk.
+# - Surat lama di data/letters (belum punya content_hash) memakai kunci dari
+#   path + ukuran + mtime file, jadi tidak perlu membaca seluruh isi file.
+# - Setelah upload, job "preview" membuat semua turunan di process pool (satu
+#   decode untuk semua ukuran); `python -m utils.preview backfill` mengisi
+#   turunan untuk surat yang sudah ada.
+
+import argparse
+import hashlib
+import io
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+import db
+from utils import metrics, storage
+from utils.jobs import enqueue, register
+
+JOB_KIND = "preview"
+
+PDF_MIME = "application/pdf"
+
+# jenis turunan → lebar maksimum (tinggi maks 1.5×) dan kualitas WebP
+KINDS = {
+    "thumb": {"width": 240, "quality": 60},
+    "preview": {"width": 1000, "quality": 75},
+}
+
+
+def sniff_mime(path: Path) -> Optional[str]:
+    """MIME dari isi file (blob store tidak menyimpan ekstensi)."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head.startswith(b"%PDF"):
+        return PDF_MIME
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def derivative_key(letter: dict, src: Path) -> str:
+    """content_hash surat, atau (surat lama) hash dari path + ukuran + mtime."""
+    if letter.get("content_hash"):
+        return letter["content_hash"]
+    st = src.stat()
+    return hashlib.sha256(f"{src.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+
+def derivative_path(letter: dict, kind: str) -> Optional[Path]:
+    """Lokasi turunan `kind` untuk surat, atau None kalau file aslinya tidak ada."""
+    if kind not in KINDS:
+        raise ValueError(f"Jenis pratinjau tidak dikenal: {kind}")
+    src = storage.letter_file_path(letter)
+    if src is None:
+        return None
+    return storage.derived_path(derivative_key(letter, src), f"{kind}.webp")
+
+
+def first_page(src: Path, width: int):
+    """Halaman pertama sebagai PIL Image (RGB/L), atau None kalau formatnya tidak didukung."""
+    from PIL import Image, ImageOps
+
+    mime = sniff_mime(src)
+    if mime == PDF_MIME:
+        try:
+            import pypdfium2 as pdfium
+        except Exception:
+            return None
+        pdf = pdfium.PdfDocument(str(src))
+        try:
+            page = pdf[0]
+            try:
+                # render langsung di resolusi target, bukan 200 DPI lalu diperkecil
+                scale = width / page.get_width()
+                return page.render(scale=scale).to_pil()
+            finally:
+                page.close()
+        finally:
+            pdf.close()
+
+    if mime is None or not mime.startswith("image/"):
+        return None
+    with Image.open(src) as img:
+        # draft(): decoder JPEG langsung menurunkan resolusi (jauh lebih cepat untuk foto besar)
+        img.draft("RGB", (width, int(width * 1.5)))
+        img = ImageOps.exif_transpose(img)
+        return img.convert("RGB") if img.mode not in ("RGB", "L") else img.copy()
+
+
+def _encode(img, kind: str) -> bytes:
+    """Perkecil img (in-place) ke ukuran `kind` lalu encode WebP."""
+    cfg = KINDS[kind]
+    img.thumbnail((cfg["width"], int(cfg["width"] * 1.5)))
+    buf = io.BytesIO()
+    img.save(buf, format="WEBP", quality=cfg["quality"], method=4)
+    return buf.getvalue()
+
+
+def render(src: Path, kind: str) -> Optional[bytes]:
+    """Bytes WebP untuk turunan `kind` dari file src (None kalau tidak bisa dipratinjau)."""
+    img = first_page(src, KINDS[kind]["width"])
+    return _encode(img, kind) if img is not None else None
+
+
+def render_all(src: str, targets: Dict[str, str]) -> Dict[str, int]:
+    """
+    Tulis semua turunan {kind: path tujuan} dari satu kali decode file src.
+    Dijalankan di process pool; kembalikan {kind: ukuran byte} (kosong kalau
+    format tidak bisa dipratinjau).
+    """
+    if not targets:
+        return {}
+    width = max(KINDS[k]["width"] for k in targets)
+    img = first_page(Path(src), width)
+    if img is None:
+        return {}
+    sizes = {}
+    # besar → kecil: gambar yang sudah diperkecil jadi sumber ukuran berikutnya
+    for kind in sorted(targets, key=lambda k: -KINDS[k]["width"]):
+        data = _encode(img, kind)
+        storage.atomic_write(Path(targets[kind]), data)
+        sizes[kind] = len(data)
+    return sizes
+
+
+def ensure(letter: dict, kind: str = "preview") -> Optional[Path]:
+    """Path turunan di disk; dibuat dulu kalau belum ada. None kalau tidak tersedia."""
+    dst = derivative_path(letter, kind)
+    if dst is None:
+        return None
+    if dst.exists():
+        return dst
+    data = render(storage.letter_file_path(letter), kind)
+    if data is None:
+        return None
+    storage.atomic_write(dst, data)
+    return dst
+
+
+def cached(letter: dict, kind: str = "thumb") -> Optional[Path]:
+    """Seperti ensure() tapi tidak pernah membuat apa-apa (untuk daftar/tabel)."""
+    dst = derivative_path(letter, kind)
+    return dst if dst is not None and dst.exists() else None
+
+
+# -------------------------------------------------
+# Process pool + job setelah upload
+# -------------------------------------------------
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def preview_workers() -> int:
+    return max(1, int(os.getenv("PREVIEW_WORKERS", "1")))
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: aman dipakai dari proses yang punya banyak thread (Streamlit)
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _targets(letter: dict, force: bool = False) -> Optional[tuple]:
+    """(path asli, {kind: path turunan yang belum ada}) atau None kalau file hilang."""
+    src = storage.letter_file_path(letter)
+    if src is None:
+        return None
+    key = derivative_key(letter, src)
+    targets = {}
+    for kind in KINDS:
+        dst = storage.derived_path(key, f"{kind}.webp")
+        if force or not dst.exists():
+            targets[kind] = str(dst)
+    return str(src), targets
+
+
+def generate(letter: dict, force: bool = False, timeout: float = 120) -> Dict[str, int]:
+    """Buat semua turunan surat yang belum ada, di process pool (blocking untuk pemanggil)."""
+    found = _targets(letter, force)
+    if found is None or not found[1]:
+        return {}
+    src, targets = found
+    try:
+        return _get_executor(preview_workers()).submit(render_all, src, targets).result(timeout=timeout)
+    except BrokenProcessPool:
+        # worker mati (OOM, PDF rusak yang membuat pdfium crash) → coba di proses ini
+        _reset_executor()
+        return render_all(src, targets)
+
+
+def submit(letter_id: int) -> int:
+    """Jadwalkan pembuatan thumbnail + pratinjau untuk surat yang baru disimpan."""
+    return enqueue(JOB_KIND, letter_id=letter_id, max_attempts=2)
+
+
+@register(JOB_KIND)
+def preview_job(job: dict):
+    letter = db.get_letter_by_id(job["letter_id"])
+    if letter is not None:
+        with metrics.timer("preview", letter_id=letter["id"]):
+            generate(letter)
+
+
+def backfill(workers: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """
+    Turunan untuk semua surat yang sudah ada (blob store maupun data/letters).
+    Semua file dikirim ke pool sekaligus → worker tidak pernah menganggur.
+    """
+    stats = {"letters": 0, "generated": 0, "skipped": 0, "missing": 0, "unsupported": 0,
+             "failed": 0, "bytes": 0, "source_bytes": 0}
+    with db.get_conn() as conn:
+        letters = [dict(r) for r in conn.execute(
+            "SELECT id, filename, content_hash FROM letters ORDER BY id"
+        ).fetchall()]
+
+    started = time.perf_counter()
+    futures = {}
+    seen = set()
+    ex = _get_executor(workers or preview_workers())
+    for letter in letters:
+        stats["letters"] += 1
+        found = _targets(letter, force)
+        if found is None:
+            stats["missing"] += 1
+            continue
+        src, targets = found
+        # file identik (blob sama) cukup dibuat sekali
+        if not targets or src in seen:
+            stats["skipped"] += 1
+            continue
+        seen.add(src)
+        futures[ex.submit(render_all, src, targets)] = src
+
+    for fut in as_completed(futures):
+        try:
+            sizes = fut.result()
+        except Exception:
+            stats["failed"] += 1
+            continue
+        if not sizes:
+            stats["unsupported"] += 1
+            continue
+        stats["generated"] += 1
+        stats["bytes"] += sum(sizes.values())
+        stats["source_bytes"] += os.path.getsize(futures[fut])
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Thumbnail & pratinjau surat Tirtaflow")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    bf = sub.add_parser("backfill", help="buat turunan untuk semua surat yang sudah ada")
+    bf.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    bf.add_argument("--force", action="store_true", help="buat ulang walaupun sudah ada")
+    args = ap.parse_args()
+
+    db.init_db()
+    print(backfill(workers=args.workers, force=args.force))
@@ -0,0 +1,44 @@
+# utils/ratelimit.py
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Rate limiter token bucket yang thread-safe.
+
+    rate_per_min = jumlah request per menit yang diizinkan rata-rata,
+    burst = jumlah request yang boleh langsung jalan berurutan.
+    """
+
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.rate = max(rate_per_min, 0.001) / 60.0  # token per detik
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Tunggu sampai token tersedia, lalu ambil."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
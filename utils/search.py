@@ -0,0 +1,139 @@
+# utils/search.py
+#
+# Pencarian full-text surat (FTS5, lihat migrasi 8 di db.py).
+#
+# Tokenizer unicode61 di SQLite tidak mengenal imbuhan Bahasa Indonesia, jadi
+# normalisasi dilakukan di sisi query:
+# - kata umum (yang, dan, di, ...) dibuang;
+# - tiap kata dicari sebagai dirinya sendiri ATAU awalan dari bentuk dasarnya:
+#   "pengaduan" → pengaduan OR pengadu* OR adu*  (cocok: aduan, diadukan, ...);
+# - nomor surat seperti 000.1.5/854 dicari sebagai frasa "000 1 5 854";
+# - teks dalam tanda kutip dicari persis sebagai frasa.
+
+import html
+import re
+from typing import List, Optional
+
+import db
+
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "untuk", "dengan", "pada", "ini", "itu",
+    "dalam", "atas", "oleh", "atau", "akan", "juga", "sebagai", "tentang",
+    "kepada", "bagi", "para", "tersebut", "adalah", "agar", "serta",
+}
+
+# urutan penting: partikel → kata ganti milik → akhiran turunan
+_PARTICLES = ("lah", "kah", "tah", "pun")
+_POSSESSIVES = ("nya", "ku", "mu")
+_SUFFIXES = ("kan", "an", "i")
+_PREFIXES = (
+    "memper", "menge", "meng", "meny", "mem", "men", "me",
+    "penge", "peng", "peny", "pem", "pen", "per", "pe",
+    "ber", "ter", "di", "ke", "se",
+)
+# peluluhan: meN-/peN- + vokal bisa berasal dari k/p/s/t yang luluh
+# (mengirim → kirim, memukul → pukul, menyampaikan → sampai, menulis → tulis)
+_NASAL_RESTORE = {"meng": "k", "peng": "k", "mem": "p", "pem": "p",
+                  "meny": "s", "peny": "s", "men": "t", "pen": "t"}
+MIN_ROOT = 3
+
+MARK = ("\x02", "\x03")  # penanda highlight dari SQLite, diganti ke HTML saat render
+
+_TOKEN_RE = re.compile(r'"([^"]+)"|([\w./-]+)', re.UNICODE)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_VOWELS = set("aeiou")
+
+
+def _strip_suffix(word: str) -> str:
+    for group in (_PARTICLES, _POSSESSIVES, _SUFFIXES):
+        for suf in group:
+            if word.endswith(suf) and len(word) - len(suf) >= MIN_ROOT + 1:
+                word = word[: -len(suf)]
+                break
+    return word
+
+
+def _roots(word: str, derived: bool) -> List[str]:
+    """
+    Kandidat kata dasar setelah awalan dibuang. Tanpa akhiran (derived=False)
+    sisa kata harus lebih panjang supaya "keruh" tidak menjadi "ruh".
+    """
+    min_len = MIN_ROOT if derived else MIN_ROOT + 1
+    for pre in _PREFIXES:
+        rest = word[len(pre):]
+        if word.startswith(pre) and len(rest) >= min_len:
+            roots = [rest]
+            if pre == "meny" or pre == "peny":
+                roots = ["s" + rest]
+            elif pre in _NASAL_RESTORE and rest[0] in _VOWELS:
+                roots.append(_NASAL_RESTORE[pre] + rest)
+            return roots
+    return []
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _word_expr(word: str) -> str:
+    """kata → ("kata" OR "dasar"* ...) ; bentuk yang sama tidak diulang."""
+    word = word.lower()
+    base = _strip_suffix(word)
+    forms = [base, *_roots(base, derived=base != word)]
+
+    alts = [] if base == word else [_quote(word)]
+    for form in forms:
+        expr = _quote(form) + "*"
+        if len(form) >= MIN_ROOT and expr not in alts:
+            alts.append(expr)
+    if not alts:
+        alts = [_quote(word)]
+    return alts[0] if len(alts) == 1 else "(" + " OR ".join(alts) + ")"
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Ubah input bebas pengguna menjadi ekspresi MATCH FTS5 yang aman (None kalau kosong)."""
+    parts: List[str] = []
+    words: List[str] = []
+
+    for phrase, token in _TOKEN_RE.findall(text or ""):
+        if phrase:
+            tokens = _WORD_RE.findall(phrase.lower())
+            if tokens:
+                parts.append(_quote(" ".join(tokens)))
+            continue
+
+        tokens = _WORD_RE.findall(token.lower())
+        if len(tokens) > 1 or (tokens and any(ch.isdigit() for ch in tokens[0])):
+            # nomor surat / kode → frasa berurutan
+            parts.append(_quote(" ".join(tokens)))
+        elif tokens:
+            words.append(tokens[0])
+
+    content = [w for w in words if w not in STOPWORDS] or words
+    parts.extend(_word_expr(w) for w in content)
+    return " AND ".join(parts) if parts else None
+
+
+def search(text: str, assigned_division=None, limit: int = 20, offset: int = 0,
+           rank_window: Optional[int] = db.SEARCH_RANK_WINDOW):
+    """Cari surat; hasil kosong kalau query tidak berisi kata apa pun."""
+    match = build_match_query(text)
+    if match is None:
+        return []
+    return db.search_letters(match, assigned_division, limit=limit, offset=offset, mark=MARK,
+                             rank_window=rank_window)
+
+
+def count_matches(text: str, assigned_division=None, cap: Optional[int] = None) -> int:
+    """Jumlah surat yang cocok (berhenti di `cap` kalau diisi)."""
+    match = build_match_query(text)
+    if match is None:
+        return 0
+    return db.count_search_matches(match, assigned_division, cap=cap)
+
+
+def render_highlight(text: Optional[str]) -> str:
+    """Escape HTML lalu ganti penanda highlight dengan <mark>."""
+    escaped = html.escape(text or "")
+    return escaped.replace(MARK[0], "<mark>").replace(MARK[1], "</mark>")
@@ -0,0 +1,231 @@
+# utils/storage.py
+#
+# Penyimpanan file surat berbasis isi (content-addressed):
+#   data/blobs/ab/cd/abcd…(sha256)         ← file asli, 1 salinan per isi
+#   data/blobs/derived/ab/abcd….ocr.jpg    ← turunan (mis. kompres untuk OCR)
+#
+# - File identik hanya disimpan sekali; tabel `blobs` mencatat refcount
+#   (berapa surat yang memakai blob tsb).
+# - Penulisan atomik: tulis ke file sementara di folder yang sama lalu
+#   os.replace → tidak ada file setengah jadi, tidak ada tabrakan nama.
+# - Surat lama (sebelum blob store) masih di data/letters/<filename>;
+#   `python -m utils.storage import-legacy` memindahkannya ke blob store.
+
+import argparse
+import hashlib
+import mimetypes
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import db
+
+BLOB_DIR = Path("data/blobs")
+DERIVED_DIR = BLOB_DIR / "derived"
+LEGACY_DIR = Path("data/letters")
+
+
+# -------------------------------------------------
+# 1. Path & penulisan atomik
+# -------------------------------------------------
+def path_for(digest: str) -> Path:
+    """Lokasi blob (di-shard 2 level supaya satu folder tidak berisi ribuan file)."""
+    return BLOB_DIR / digest[:2] / digest[2:4] / digest
+
+
+def derived_path(digest: str, suffix: str) -> Path:
+    """Lokasi file turunan dari blob, mis. derived_path(h, 'ocr.jpg')."""
+    return DERIVED_DIR / digest[:2] / f"{digest}.{suffix}"
+
+
+def atomic_write(path: Path, data: bytes):
+    """Tulis ke file sementara di folder tujuan lalu rename (atomik di filesystem yang sama)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# -------------------------------------------------
+# 2. API blob
+# -------------------------------------------------
+def put_bytes(data: bytes, mime: Optional[str] = None) -> str:
+    """
+    Simpan isi file (kalau belum ada) dan tambah 1 referensi.
+    Kembalikan sha256 — dipakai sebagai letters.content_hash.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+
+    # refcount + tulis file dalam satu write lock yang sama dengan gc():
+    # gc() tidak bisa menghapus file di antara keduanya, dan file yang baru
+    # dihapus gc() (row blobs ikut hilang) ditulis ulang di sini
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            """
+            INSERT INTO blobs (content_hash, size_bytes, mime, refcount, created_at)
+            VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                refcount = refcount + 1,
+                mime = COALESCE(blobs.mime, excluded.mime)
+            """,
+            (digest, len(data), mime, datetime.now().isoformat(timespec="seconds")),
+        )
+        path = path_for(digest)
+        if not path.exists():
+            atomic_write(path, data)
+    return digest
+
+
+def put_file(path: str, mime: Optional[str] = None) -> str:
+    with open(path, "rb") as f:
+        return put_bytes(f.read(), mime)
+
+
+def exists(digest: str) -> bool:
+    return path_for(digest).exists()
+
+
+def blob_info(digest: str) -> Optional[dict]:
+    with db.get_conn() as conn:
+        row = conn.execute(
+            "SELECT * FROM blobs WHERE content_hash = ?", (digest,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def release(digest: str):
+    """Kurangi 1 referensi; kalau sudah tidak dipakai, file + turunannya dihapus."""
+    with db.get_conn() as conn:
+        conn.execute(
+            "UPDATE blobs SET refcount = refcount - 1 WHERE content_hash = ?",
+            (digest,),
+        )
+    gc([digest])
+
+
+@contextmanager
+def release_on_error(*digests):
+    """
+    Lepas referensi put_bytes() kalau blok di dalamnya gagal (mis. insert
+    surat error) — tanpa ini refcount blob bocor selamanya.
+    """
+    try:
+        yield
+    except BaseException:
+        for digest in digests:
+            try:
+                release(digest)
+            except Exception:
+                # jangan menutupi error aslinya
+                pass
+        raise
+
+
+def gc(digests=None) -> int:
+    """
+    Hapus blob dengan refcount <= 0 (semua, atau hanya digests tertentu).
+    Satu transaksi BEGIN IMMEDIATE: row dihapus (dicek ulang refcount-nya)
+    baru file di-unlink, sementara put_bytes() menunggu write lock yang sama.
+    """
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if digests is None:
+            rows = conn.execute(
+                "SELECT content_hash FROM blobs WHERE refcount <= 0"
+            ).fetchall()
+        else:
+            marks = ",".join("?" * len(digests))
+            rows = conn.execute(
+                f"SELECT content_hash FROM blobs WHERE refcount <= 0 AND content_hash IN ({marks})",
+                list(digests),
+            ).fetchall()
+
+        removed = 0
+        for r in rows:
+            digest = r["content_hash"]
+            deleted = conn.execute(
+                "DELETE FROM blobs WHERE content_hash = ? AND refcount <= 0", (digest,)
+            ).rowcount
+            if not deleted:
+                continue
+            for p in [path_for(digest), *DERIVED_DIR.glob(f"{digest[:2]}/{digest}.*")]:
+                if p.exists():
+                    p.unlink()
+            removed += 1
+    return removed
+
+
+def letter_file_path(letter: dict) -> Optional[Path]:
+    """Path file asli sebuah surat: blob store, atau lokasi lama data/letters/<filename>."""
+    digest = letter.get("content_hash")
+    if digest and exists(digest):
+        return path_for(digest)
+
+    filename = letter.get("filename")
+    if filename and (LEGACY_DIR / filename).exists():
+        return LEGACY_DIR / filename
+    return None
+
+
+# -------------------------------------------------
+# 3. Migrasi file lama data/letters → blob store
+# -------------------------------------------------
+def import_legacy(delete: bool = False) -> dict:
+    """
+    Pindahkan file surat lama ke blob store dan isi letters.content_hash.
+    delete=True → hapus file lama yang sudah diimpor + salinan compressed_*.
+    """
+    stats = {"imported": 0, "missing": 0, "deleted": 0}
+
+    with db.get_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, filename FROM letters WHERE content_hash IS NULL AND filename IS NOT NULL"
+        ).fetchall()
+
+    imported_files = set()
+    for r in rows:
+        src = LEGACY_DIR / r["filename"]
+        if not src.exists():
+            stats["missing"] += 1
+            continue
+        digest = put_file(str(src), mimetypes.guess_type(src.name)[0])
+        db.update_letter(r["id"], content_hash=digest)
+        imported_files.add(src)
+        stats["imported"] += 1
+
+    if delete:
+        for p in imported_files:
+            p.unlink()
+            stats["deleted"] += 1
+        for p in LEGACY_DIR.glob("compressed_*"):
+            p.unlink()
+            stats["deleted"] += 1
+
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Utilitas blob store Tirtaflow")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import-legacy", help="impor file lama dari data/letters")
+    imp.add_argument("--delete", action="store_true", help="hapus file lama setelah diimpor")
+    sub.add_parser("gc", help="hapus blob yang sudah tidak direferensikan")
+    args = ap.parse_args()
+
+    db.init_db()
+    if args.cmd == "import-legacy":
+        print(import_legacy(delete=args.delete))
+    else:
+        print(f"{gc()} blob dihapus")